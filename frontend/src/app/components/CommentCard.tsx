@@ -1,4 +1,5 @@
 import { ThumbsUp, ThumbsDown, Minus, Calendar, User, MessageSquare } from 'lucide-react';
+import type { ReactNode } from 'react';
 
 export interface Comment {
   id: string;
@@ -10,12 +11,36 @@ export interface Comment {
   team?: string;
   keywords: string[];
   source?: string;
+  // [start, end] offsets of matched terms in content (from /search snippets)
+  highlights?: [number, number][];
 }
 
 interface CommentCardProps {
   comment: Comment;
 }
 
+// Highlight offsets from the API are UTF-16 code units, the same indices slice() uses
+function highlightText(text: string, highlights?: [number, number][]) {
+  if (!highlights || highlights.length === 0) {
+    return text;
+  }
+
+  const parts: ReactNode[] = [];
+  let last = 0;
+  highlights.forEach(([start, end], index) => {
+    if (start < last) return;
+    parts.push(text.slice(last, start));
+    parts.push(
+      <mark key={index} className="bg-yellow-100 text-inherit rounded px-0.5">
+        {text.slice(start, end)}
+      </mark>
+    );
+    last = end;
+  });
+  parts.push(text.slice(last));
+  return parts;
+}
+
 export function CommentCard({ comment }: CommentCardProps) {
   const sentimentConfig = {
     positive: {
@@ -83,7 +108,9 @@ export function CommentCard({ comment }: CommentCardProps) {
         </div>
       </div>
       
-      <p className="text-gray-800 leading-relaxed mb-3 ml-13">{comment.content}</p>
+      <p className="text-gray-800 leading-relaxed mb-3 ml-13">
+        {highlightText(comment.content, comment.highlights)}
+      </p>
       
       {comment.keywords.length > 0 && (
         <div className="flex gap-2 flex-wrap ml-13">
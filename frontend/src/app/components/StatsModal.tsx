@@ -1,6 +1,17 @@
 import { BarChart, Bar, PieChart, Pie, Cell, ResponsiveContainer, Tooltip, XAxis, YAxis, Legend, LineChart, Line } from 'recharts';
 import { X } from 'lucide-react';
 
+// One bucket of GET /timeline
+export interface TimelinePoint {
+  time: string;
+  comments: number;
+  positive: number;
+  negative: number;
+  neutral: number;
+  average_intensity: number | null;
+  emotions: Record<string, number>;
+}
+
 interface StatsModalProps {
   isOpen: boolean;
   onClose: () => void;
@@ -10,9 +21,11 @@ interface StatsModalProps {
     neutral: number;
   };
   totalComments: number;
+  // Buckets from GET /timeline; sample data is shown when omitted
+  timeline?: TimelinePoint[];
 }
 
-export function StatsModal({ isOpen, onClose, sentimentCounts, totalComments }: StatsModalProps) {
+export function StatsModal({ isOpen, onClose, sentimentCounts, totalComments, timeline }: StatsModalProps) {
   if (!isOpen) return null;
 
   const pieData = [
@@ -27,7 +40,7 @@ export function StatsModal({ isOpen, onClose, sentimentCounts, totalComments }:
     { name: 'Neutral', count: sentimentCounts.neutral, fill: '#6b7280' },
   ];
 
-  const timelineData = [
+  const timelineData = timeline ?? [
     { time: '09:00', positive: 45, negative: 23, neutral: 32 },
     { time: '12:00', positive: 67, negative: 34, neutral: 28 },
     { time: '15:00', positive: 89, negative: 45, neutral: 41 },
@@ -0,0 +1,208 @@
+import threading
+from collections import Counter
+from datetime import date
+from typing import List, Dict, Optional, Tuple, Iterable
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 86400
+EPOCH = date(1970, 1, 1)
+
+# Entity label -> pipeline column listing its mentions (uncompacted batches)
+MENTION_COLUMNS = {'PERSON': 'mentioned_players', 'ORG': 'mentioned_teams'}
+
+def day_number(value: str) -> int:
+    """
+    Days since 1970-01-01 for a YYYY-MM-DD date.
+
+    Raises:
+        ValueError: For malformed dates
+    """
+    try:
+        return (date.fromisoformat(value) - EPOCH).days
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid date '{value}'; use YYYY-MM-DD") from e
+
+class _Rollup:
+    """Mergeable aggregates of a set of comments."""
+
+    __slots__ = ('count', 'sentiments', 'emotions', 'score_sum', 'score_count',
+                 'intensity_sum', 'intensity_count', 'authors', 'players', 'teams')
+
+    def __init__(self):
+        self.count = 0
+        self.sentiments = Counter()
+        self.emotions = Counter()
+        self.score_sum = 0.0
+        self.score_count = 0
+        self.intensity_sum = 0.0
+        self.intensity_count = 0
+        self.authors = set()
+        self.players = Counter()
+        self.teams = Counter()
+
+    def merge(self, other: '_Rollup'):
+        self.count += other.count
+        self.sentiments.update(other.sentiments)
+        self.emotions.update(other.emotions)
+        self.score_sum += other.score_sum
+        self.score_count += other.score_count
+        self.intensity_sum += other.intensity_sum
+        self.intensity_count += other.intensity_count
+        self.authors |= other.authors
+        self.players.update(other.players)
+        self.teams.update(other.teams)
+
+    def stats(self, top: int = 10) -> Dict:
+        """The /stats response for these comments."""
+        return {
+            "total_comments": self.count,
+            "unique_authors": len(self.authors),
+            "sentiment_distribution": {
+                "positive": self.sentiments['positive'],
+                "negative": self.sentiments['negative'],
+                "neutral": self.sentiments['neutral']
+            },
+            "top_emotions": dict(self.emotions.most_common(top)),
+            "average_opinion_score": self.score_sum / self.score_count if self.score_count else None,
+            "average_intensity": self.intensity_sum / self.intensity_count if self.intensity_count else None,
+            "most_mentioned_players": dict(self.players.most_common(top)),
+            "most_mentioned_teams": dict(self.teams.most_common(top))
+        }
+
+def _value_counts(values: np.ndarray) -> Dict:
+    if not len(values):
+        return {}
+    uniques, counts = np.unique(values, return_counts=True)
+    return dict(zip(uniques.tolist(), counts.tolist()))
+
+class StatsAggregator:
+    """
+    Corpus statistics kept up to date as batches are ingested.
+
+    Counters, running sums for the means, mention counts and distinct-author
+    sets are kept for the whole corpus and for every (subreddit, day) rollup.
+    Unfiltered /stats reads the totals; a subreddit or date filter merges only
+    the rollups it covers. It is a corpus listener (reset/add).
+    """
+
+    def __init__(self, corpus=None):
+        """
+        Args:
+            corpus: OpinionCorpus whose EntityTable compact batches point into
+        """
+        self.corpus = corpus
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.total = _Rollup()
+            self.rollups: Dict[Tuple[str, int], _Rollup] = {}
+            self._author_codes: Dict[str, int] = {}
+            self._cache: Dict[Tuple, Dict] = {}
+
+    def clone(self, corpus) -> 'StatsAggregator':
+        return StatsAggregator(corpus)
+
+    def adopt(self, other: 'StatsAggregator'):
+        """Take over the aggregates built off to the side."""
+        with self._lock:
+            self.total, self.rollups = other.total, other.rollups
+            self._author_codes, self._cache = other._author_codes, {}
+
+    def _authors(self, values: Iterable) -> np.ndarray:
+        codes = self._author_codes
+        return np.fromiter((codes.setdefault(a, len(codes)) for a in values if isinstance(a, str)),
+                           dtype=np.int64)
+
+    def _mentions(self, batch: pd.DataFrame, positions: np.ndarray, label: str) -> Dict:
+        """Entity mention counts of the batch rows at positions."""
+        if 'entity_start' in batch and self.corpus is not None:
+            return self.corpus.entities.mentions(label, batch['entity_start'].to_numpy()[positions],
+                                                 batch['entity_end'].to_numpy()[positions]).to_dict()
+        column = MENTION_COLUMNS[label]
+        if column in batch:
+            return Counter(name for names in batch[column].iloc[positions] for name in names or [])
+        return {}
+
+    def _rollup(self, batch: pd.DataFrame, positions: np.ndarray, columns: Dict) -> _Rollup:
+        rollup = _Rollup()
+        rollup.count = len(positions)
+        if 'bert_sentiment' in columns:
+            rollup.sentiments.update(_value_counts(columns['bert_sentiment'][positions]))
+        if 'primary_emotion' in columns:
+            rollup.emotions.update(_value_counts(columns['primary_emotion'][positions]))
+        for column, attr in (('opinion_score', 'score'), ('opinion_intensity', 'intensity')):
+            if column in columns:
+                values = columns[column][positions]
+                values = values[~np.isnan(values)]
+                setattr(rollup, f'{attr}_sum', float(values.sum(dtype=np.float64)))
+                setattr(rollup, f'{attr}_count', len(values))
+        if 'author' in columns:
+            rollup.authors.update(columns['author'][positions].tolist())
+        rollup.players.update(self._mentions(batch, positions, 'PERSON'))
+        rollup.teams.update(self._mentions(batch, positions, 'ORG'))
+        return rollup
+
+    def add(self, batch: pd.DataFrame, start_row: int):
+        """Fold a batch into the totals and its (subreddit, day) rollups."""
+        if batch.empty:
+            return
+        with self._lock:
+            columns = {}
+            for column in ('bert_sentiment', 'primary_emotion'):
+                if column in batch:
+                    columns[column] = batch[column].astype(object).where(batch[column].notna(), '').to_numpy()
+            for column in ('opinion_score', 'opinion_intensity'):
+                if column in batch:
+                    columns[column] = batch[column].to_numpy(dtype=np.float64)
+            if 'author' in batch:
+                columns['author'] = self._authors(batch['author'].astype(object).where(batch['author'].notna(), ''))
+
+            subreddits = (batch['subreddit'].astype(object).fillna('').astype(str).to_numpy()
+                          if 'subreddit' in batch else np.full(len(batch), '', dtype=object))
+            days = (batch['timestamp'].to_numpy(dtype=np.int64) // SECONDS_PER_DAY
+                    if 'timestamp' in batch else np.zeros(len(batch), dtype=np.int64))
+            keys = pd.DataFrame({'subreddit': subreddits, 'day': days})
+
+            self.total.merge(self._rollup(batch, np.arange(len(batch)), columns))
+            for (subreddit, day), positions in keys.groupby(['subreddit', 'day'], sort=False).indices.items():
+                key = (subreddit, int(day))
+                rollup = self.rollups.get(key)
+                if rollup is None:
+                    rollup = self.rollups[key] = _Rollup()
+                rollup.merge(self._rollup(batch, positions, columns))
+            self._cache = {}
+
+    def stats(self, subreddits: Optional[List[str]] = None, start_date: Optional[str] = None,
+              end_date: Optional[str] = None, top: int = 10) -> Dict:
+        """
+        The /stats response, optionally for some subreddits and an inclusive date range.
+
+        Raises:
+            ValueError: For malformed dates
+        """
+        start = day_number(start_date) if start_date else None
+        end = day_number(end_date) if end_date else None
+        key = (tuple(sorted(subreddits)) if subreddits else None, start, end, top)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+
+            if key[:3] == (None, None, None):
+                result = self.total.stats(top)
+            else:
+                wanted = set(subreddits) if subreddits else None
+                merged = _Rollup()
+                for (subreddit, day), rollup in self.rollups.items():
+                    if wanted is not None and subreddit not in wanted:
+                        continue
+                    if (start is not None and day < start) or (end is not None and day > end):
+                        continue
+                    merged.merge(rollup)
+                result = merged.stats(top)
+            self._cache[key] = result
+            return result
@@ -1,12 +1,28 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import pandas as pd
 from datetime import datetime
-import json
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 from opinion_pipeline import OpinionSearchPipeline
+from jobs import Job, JobManager, JobQueueFull
+from corpus import OpinionCorpus
+from ingest import NDJSONDecoder, ChunkBuilder
+from result_store import ParquetResultStore, REQUIRED_COLUMNS
+from search_backend import SQLiteBackend
+from serialization import dumps, opinion_records, check_fields
+from result_cache import RankedResults, ResultSetCache
+from snippets import make_snippets
+from facets import facet_counts, check_facets
+from suggest import SuggestIndex
+from aggregates import StatsAggregator
+from timeline import SentimentTimeline
+from text_index import InvertedIndex
 
 app = FastAPI(
     title="Football Opinion Search API",
@@ -25,7 +41,49 @@ app.add_middleware(
 
 # Global pipeline instance
 pipeline = None
-opinions_df = None
+
+# SEARCH_BACKEND=sqlite keeps the opinions in an on-disk FTS5 database instead
+# of memory; /search runs there and the indexes below are rebuilt from it on startup
+search_backend = None
+if os.environ.get('SEARCH_BACKEND', 'memory') == 'sqlite':
+    search_backend = SQLiteBackend(os.environ.get('SEARCH_DB', 'opinions.db'))
+corpus = OpinionCorpus(search_backend)
+
+# Analysis runs in background jobs so the event loop stays free for reads;
+# two run at once so their model calls can share inference batches
+job_manager = JobManager(max_workers=2, max_pending=16)
+
+# /ingest chunks are analyzed in their own pool, and result store reads and
+# corpus writes in another, so neither waits behind queued /analyze jobs
+analysis_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="analysis")
+io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="io")
+
+# Analyzed opinions are persisted to Parquet when OPINION_STORE_DIR is set
+result_store = ParquetResultStore(os.environ['OPINION_STORE_DIR']) if os.environ.get('OPINION_STORE_DIR') else None
+
+
+# Positional term index with field postings and a SymSpell dictionary of the
+# vocabulary, for fuzzy, expanded and query-syntax searches (only the
+# dictionary when a search backend holds the rows)
+text_index = InvertedIndex(corpus, max_distance=2, vocabulary_only=search_backend is not None)
+corpus.subscribe(text_index)
+
+# Ranked result sets, so repeat searches and later pages don't re-run the search;
+# emptied whenever the corpus changes
+result_cache = ResultSetCache(ttl=60.0, max_entries=1024, max_bytes=64 * 2**20)
+corpus.subscribe(result_cache)
+
+# Autocomplete over entities, terms and past searches, updated on every ingest
+suggest_index = SuggestIndex(corpus)
+corpus.subscribe(suggest_index)
+
+# /stats counters and rollups per (subreddit, day), updated on every ingest
+stats_aggregator = StatsAggregator(corpus)
+corpus.subscribe(stats_aggregator)
+
+# Minute/hour/day sentiment rollups per team, player and subreddit for /timeline
+sentiment_timeline = SentimentTimeline(corpus)
+corpus.subscribe(sentiment_timeline)
 
 class RedditPost(BaseModel):
     """Schema for Reddit post input."""
@@ -58,15 +116,50 @@ class SearchRequest(BaseModel):
     sentiment: Optional[str] = None
     emotion: Optional[str] = None
     min_intensity: Optional[float] = 0.0
+    scoring_profile: Optional[str] = None
+    emotion_scores: Optional[Dict[str, str]] = None
+    fuzzy: bool = False
+    expand: bool = False
+    query_syntax: bool = False
+    snippets: bool = False
+    snippet_length: int = 160
+    facets: Optional[List[str]] = None
+    facet_limit: Optional[int] = 10
+    fields: Optional[List[str]] = None
     limit: Optional[int] = 50
+    cursor: Optional[str] = None
+    stream: bool = False
+
+class StoreQuery(BaseModel):
+    """Schema for loading a subset of the result store."""
+    subreddits: Optional[List[str]] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    columns: Optional[List[str]] = None
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize pipeline on startup."""
     global pipeline
     pipeline = OpinionSearchPipeline(use_gpu=True)
+    pipeline.start_inference_service(max_batch_size=64, max_wait_ms=5.0)
+    if search_backend is not None:
+        corpus.load()
+        print(f"✓ Loaded {len(corpus)} opinions from {search_backend.path}")
+    elif result_store is not None and result_store.exists():
+        corpus.replace(result_store.read())
+        print(f"✓ Loaded {len(corpus)} opinions from {result_store.root}")
     print("✓ API ready!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background jobs and inference workers."""
+    job_manager.shutdown()
+    analysis_executor.shutdown(wait=False, cancel_futures=True)
+    io_executor.shutdown(wait=False, cancel_futures=True)
+    if pipeline is not None and pipeline.inference is not None:
+        pipeline.inference.close()
+
 @app.get("/")
 async def root():
     """API health check."""
@@ -77,37 +170,220 @@ async def root():
         "timestamp": datetime.now().isoformat()
     }
 
-@app.post("/analyze")
+def _run_analysis(job: Job, posts: List[RedditPost]) -> Dict:
+    """Job body: run the pipeline and append the analyzed opinions to the corpus."""
+    df = pipeline.process_batch(posts, progress=job.report)
+    if df.empty:
+        return {"status": "success", "processed_comments": 0, "added_comments": 0}
+    
+    if result_store is not None:
+        result_store.write(corpus.new_rows(df))
+    added = corpus.append(df)
+    
+    return {
+        "status": "success",
+        "processed_comments": len(df),
+        "added_comments": added,
+        "unique_posts": int(df['post_id'].nunique()),
+        "sentiment_distribution": {
+            "positive": int((df['bert_sentiment'] == 'positive').sum()),
+            "negative": int((df['bert_sentiment'] == 'negative').sum()),
+            "neutral": int((df['bert_sentiment'] == 'neutral').sum())
+        },
+        "top_emotions": df['primary_emotion'].value_counts().head(5).to_dict()
+    }
+
+@app.post("/analyze", status_code=202)
 async def analyze_posts(data: RedditInput):
     """
     Analyze Reddit posts and extract opinions.
     
-    Processes input JSON through the complete ML pipeline.
+    Queues the input for the ML pipeline and returns a job ID immediately.
+    Poll /jobs/{job_id} for progress and results.
     """
-    global opinions_df
+    # The validated posts go to the pipeline in memory
+    try:
+        job = job_manager.submit(_run_analysis, data.posts, stages=OpinionSearchPipeline.STAGES)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     
-    # Save input to temporary file
-    temp_file = f"temp_input_{datetime.now().timestamp()}.json"
-    with open(temp_file, 'w') as f:
-        json.dump(data.dict(), f)
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs")
+async def list_jobs():
+    """List recent analysis jobs without their results."""
+    return {"jobs": [job.to_dict(include_result=False) for job in job_manager.list()]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status, per-stage progress and, once completed, the results."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued job, or stop a running one at its next stage."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job.to_dict(include_result=False)
+
+@app.post("/ingest")
+async def ingest_stream(request: Request, chunk_size: int = Query(500, ge=1, le=10000)):
+    """
+    Stream newline-delimited JSON posts or comments into the corpus.
+    
+    The body is parsed as it arrives (Content-Encoding gzip or zstd is
+    supported) and every chunk_size comments are analyzed and appended before
+    more of the body is read, so a fast sender is slowed to the pipeline's pace.
+    """
+    try:
+        decoder = NDJSONDecoder(request.headers.get('content-encoding'))
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    
+    builder = ChunkBuilder(chunk_size=chunk_size)
+    loop = asyncio.get_running_loop()
+    stats = {"chunks": 0, "processed_comments": 0, "added_comments": 0}
+    
+    async def process(posts):
+        df = await loop.run_in_executor(analysis_executor, pipeline.process_batch, posts)
+        stats["chunks"] += 1
+        stats["processed_comments"] += len(df)
+        if result_store is not None:
+            await loop.run_in_executor(io_executor, lambda: result_store.write(corpus.new_rows(df)))
+        # Compacting and indexing the chunk stays off the event loop too
+        stats["added_comments"] += await loop.run_in_executor(io_executor, corpus.append, df)
     
-    # Process through pipeline
     try:
-        opinions_df = pipeline.process_batch(temp_file)
+        async for data in request.stream():
+            for record in decoder.feed(data):
+                posts = builder.add(record)
+                if posts:
+                    await process(posts)
         
-        return {
-            "status": "success",
-            "processed_comments": len(opinions_df),
-            "unique_posts": opinions_df['post_id'].nunique(),
-            "sentiment_distribution": {
-                "positive": int((opinions_df['bert_sentiment'] == 'positive').sum()),
-                "negative": int((opinions_df['bert_sentiment'] == 'negative').sum()),
-                "neutral": int((opinions_df['bert_sentiment'] == 'neutral').sum())
-            },
-            "top_emotions": opinions_df['primary_emotion'].value_counts().head(5).to_dict()
-        }
+        for record in decoder.flush():
+            posts = builder.add(record)
+            if posts:
+                await process(posts)
+        posts = builder.flush()
+        if posts:
+            await process(posts)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(
+            status_code=500,
+            detail=f"Ingest stopped after {stats['added_comments']} comments: {e}"
+        )
+    
+    return {
+        "status": "success",
+        "lines": decoder.lines,
+        "records": builder.records,
+        "malformed_lines": decoder.malformed,
+        **stats,
+        "total_comments": len(corpus)
+    }
+
+@app.post("/store/load")
+async def load_from_store(request: StoreQuery):
+    """
+    Replace the corpus with a subset of the Parquet result store.
+    
+    Only the matching subreddit/match-date partitions and the requested
+    columns are read; the columns search filters, scoring profiles, facets
+    and statistics need are always included.
+    """
+    if result_store is None:
+        raise HTTPException(status_code=400, detail="No result store configured (set OPINION_STORE_DIR)")
+    
+    columns = request.columns
+    if columns is not None:
+        columns = REQUIRED_COLUMNS + [c for c in columns if c not in REQUIRED_COLUMNS]
+    
+    loop = asyncio.get_running_loop()
+    try:
+        df = await loop.run_in_executor(
+            io_executor,
+            lambda: result_store.read(
+                columns=columns,
+                subreddits=request.subreddits,
+                start_date=request.start_date,
+                end_date=request.end_date
+            )
+        )
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Compacting and re-indexing the subset stays off the event loop
+    await loop.run_in_executor(io_executor, corpus.replace, df)
+    return {"status": "success", "loaded_comments": len(df), "columns": list(df.columns)}
+
+def _ranked_results(source, generation: int, request: SearchRequest) -> RankedResults:
+    """All matches of a search in rank order, reused from the cache when possible."""
+    query = (request.query or '').strip()
+    key = (
+        'ranked',
+        generation,
+        # Operators are case-sensitive in query syntax
+        query if request.query_syntax else query.lower(),
+        request.sentiment,
+        request.emotion,
+        float(request.min_intensity or 0.0),
+        request.scoring_profile or 'default',
+        tuple(sorted((request.emotion_scores or {}).items())),
+        request.fuzzy,
+        request.expand,
+        request.query_syntax
+    )
+    ranked = result_cache.get(key)
+    if ranked is None:
+        row_ids, scores = pipeline.rank_opinions(
+            source,
+            query=request.query,
+            sentiment=request.sentiment,
+            emotion=request.emotion,
+            min_intensity=request.min_intensity,
+            scoring_profile=request.scoring_profile,
+            emotion_scores=request.emotion_scores,
+            fuzzy=request.fuzzy,
+            expand=request.expand,
+            query_syntax=request.query_syntax,
+            text_index=text_index
+        )
+        ranked = RankedResults(row_ids, scores)
+        result_cache.put(key, ranked)
+    return ranked
+
+def _fetch_rows(source, row_ids, scores, highlight: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Result rows in rank order with the scores they were ranked by.
+    
+    highlight (terms, length) adds snippet and highlights columns.
+    """
+    if isinstance(source, pd.DataFrame):
+        rows = source.loc[row_ids]
+    else:
+        rows = source.fetch(row_ids.tolist())
+    rows = rows.assign(opinion_score=scores)
+    if highlight is not None:
+        # Offsets come from the text index for corpus rows; backend rows are scanned
+        index = text_index if isinstance(source, pd.DataFrame) else None
+        snippets, highlights = make_snippets(rows['text'].tolist(), highlight['terms'], row_ids,
+                                             index=index, length=highlight['length'])
+        rows = rows.assign(snippet=snippets, highlights=highlights)
+    return rows
+
+def _stream_opinions(source, entities, row_ids, scores, fields, highlight=None,
+                     chunk_size: int = 1000):
+    """NDJSON lines, one opinion each, converted chunk by chunk."""
+    for start in range(0, len(row_ids), chunk_size):
+        rows = _fetch_rows(source, row_ids[start:start + chunk_size], scores[start:start + chunk_size],
+                           highlight)
+        yield b''.join(dumps(record) + b'\n' for record in opinion_records(rows, entities, fields))
 
 @app.post("/search")
 async def search_opinions(request: SearchRequest):
@@ -119,51 +395,105 @@ async def search_opinions(request: SearchRequest):
     - sentiment: Filter by sentiment (positive/negative/neutral)
     - emotion: Filter by emotion
     - min_intensity: Minimum opinion intensity (0-1)
-    - limit: Maximum results to return
+    - emotion_scores: Per-emotion probability conditions, e.g. {"anger": ">0.6", "joy": "<0.1"}
+    - scoring_profile: Ranking formula (default/time_decayed/confidence_gated/engagement)
+    - fuzzy: Match each query word against close spellings (typos, missing accents)
+    - expand: Also match slang and team/player aliases ("fr" for "for real", "MUFC" for "man united")
+    - query_syntax: Parse query as +haaland -injury, "penalty decision", "haaland goal"~5,
+      OR/NOT/parentheses and team:/player:/author:/subreddit: fields
+    - fields: Opinion fields to return (all when omitted)
+    - limit: Maximum results to return (null for all)
+    - cursor: next_cursor of the previous page
+    - stream: Return the results as NDJSON, one opinion per line
+    - facets: Count matches per value of sentiment/emotion/subreddit/team/player
+      (top facet_limit values each)
+    - snippets: Return a snippet of about snippet_length chars around the matches,
+      with [start, end] highlight offsets, instead of the full text
     """
-    global opinions_df
+    # df, entities and generation of one published version, so results are
+    # never cached under a generation they weren't computed from
+    df, entities, generation = corpus.snapshot()
+    source = df if search_backend is None else search_backend
     
-    if opinions_df is None or opinions_df.empty:
+    if len(corpus) == 0:
         raise HTTPException(
             status_code=400, 
             detail="No data analyzed yet. Please call /analyze first."
         )
     
+    page_key = ('page', generation, dumps(request.dict()))
+    
     # Search
-    results = pipeline.search_opinions(
-        opinions_df,
-        query=request.query,
-        sentiment=request.sentiment,
-        emotion=request.emotion,
-        min_intensity=request.min_intensity
-    )
+    try:
+        fields = check_fields(request.fields)
+        check_facets(request.facets)
+        if request.snippets and request.fields is None:
+            fields = [f for f in fields if f != 'text'] + ['snippet', 'highlights']
+        ranked = _ranked_results(source, generation, request)
+        highlight = None
+        if 'snippet' in fields or 'highlights' in fields:
+            if request.snippet_length < 20:
+                raise ValueError("snippet_length must be at least 20")
+            terms = pipeline.highlight_terms(request.query, fuzzy=request.fuzzy, expand=request.expand,
+                                             query_syntax=request.query_syntax, text_index=text_index)
+            highlight = {'terms': terms, 'length': request.snippet_length}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Limit results
-    results = results.head(request.limit)
-    
-    # Format response
-    opinions = []
-    for _, row in results.iterrows():
-        opinions.append({
-            "comment_id": row['comment_id'],
-            "text": row['text'],
-            "author": row['author'],
-            "sentiment": row['bert_sentiment'],
-            "confidence": float(row['bert_confidence']),
-            "emotion": row['primary_emotion'],
-            "opinion_score": float(row['opinion_score']),
-            "entities": row['entities'],
-            "mentioned_players": row['mentioned_players'],
-            "mentioned_teams": row['mentioned_teams'],
-            "timestamp": int(row['timestamp']),
-            "engagement_score": int(row['engagement_score'])
-        })
+    # Searches that found something feed /suggest
+    if request.query and request.cursor is None and len(ranked):
+        suggest_index.record_query(request.query)
     
-    return {
-        "total_results": len(results),
+    # Repeat requests get the encoded page straight from the cache
+    if not request.stream:
+        content = result_cache.get(page_key)
+        if content is not None:
+            return Response(content=content, media_type="application/json")
+    
+    try:
+        row_ids, scores, next_cursor = ranked.page(request.cursor, request.limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if request.stream:
+        return StreamingResponse(
+            _stream_opinions(source, entities, row_ids, scores, fields, highlight),
+            media_type="application/x-ndjson"
+        )
+    
+    # Convert the page column-wise and send it pre-encoded
+    opinions = opinion_records(_fetch_rows(source, row_ids, scores, highlight), entities, fields)
+    response = {
+        "total_results": len(opinions),
+        "total_matches": len(ranked),
+        "next_cursor": next_cursor,
         "query": request.dict(),
         "opinions": opinions
     }
+    if request.facets:
+        # Counted over every match, not just this page
+        filters = None
+        if search_backend is not None:
+            filters = pipeline.backend_filters(request.query, request.sentiment, request.emotion,
+                                               request.min_intensity, request.emotion_scores,
+                                               fuzzy=request.fuzzy, expand=request.expand,
+                                               text_index=text_index)
+        response["facets"] = facet_counts(source, ranked.row_ids, request.facets,
+                                          entities=entities, limit=request.facet_limit, filters=filters)
+    content = dumps(response)
+    result_cache.put(page_key, content)
+    
+    return Response(content=content, media_type="application/json")
+
+@app.get("/search/cache/stats")
+async def get_search_cache_stats():
+    """Result cache size, hit rate and invalidations."""
+    return result_cache.stats()
+
+@app.get("/suggest")
+async def suggest(prefix: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50)):
+    """Complete a partial query with players, teams, frequent terms and popular searches."""
+    return {"prefix": prefix, "suggestions": suggest_index.suggest(prefix, limit=limit)}
 
 @app.get("/topics")
 async def get_topics():
@@ -180,37 +510,58 @@ async def get_topics():
     
     return {
         "total_topics": len(topic_info),
+        "refitting": pipeline.topic_manager.is_refitting(),
         "topics": topic_info.to_dict('records')
     }
 
+@app.get("/inference/stats")
+async def get_inference_stats():
+    """Batching statistics per model."""
+    if pipeline is None or pipeline.inference is None:
+        return {}
+    return pipeline.inference.stats()
+
 @app.get("/stats")
-async def get_statistics():
-    """Get overall statistics of analyzed data."""
-    global opinions_df
-    
-    if opinions_df is None or opinions_df.empty:
+async def get_statistics(subreddit: Optional[List[str]] = Query(None),
+                         start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """
+    Get overall statistics of analyzed data.
+
+    Served from aggregates maintained on ingest. Optional filters:
+    - subreddit: One or more subreddits (repeat the parameter)
+    - start_date, end_date: Inclusive YYYY-MM-DD range of comment dates (UTC)
+    """
+    if corpus.empty:
         raise HTTPException(status_code=400, detail="No data available")
-    
-    stats = {
-        "total_comments": len(opinions_df),
-        "unique_authors": opinions_df['author'].nunique(),
-        "sentiment_distribution": {
-            "positive": int((opinions_df['bert_sentiment'] == 'positive').sum()),
-            "negative": int((opinions_df['bert_sentiment'] == 'negative').sum()),
-            "neutral": int((opinions_df['bert_sentiment'] == 'neutral').sum())
-        },
-        "top_emotions": opinions_df['primary_emotion'].value_counts().head(10).to_dict(),
-        "average_opinion_score": float(opinions_df['opinion_score'].mean()),
-        "average_intensity": float(opinions_df['opinion_intensity'].mean()),
-        "most_mentioned_players": pd.Series(
-            [p for players in opinions_df['mentioned_players'] for p in players]
-        ).value_counts().head(10).to_dict(),
-        "most_mentioned_teams": pd.Series(
-            [t for teams in opinions_df['mentioned_teams'] for t in teams]
-        ).value_counts().head(10).to_dict()
-    }
-    
-    return stats
+
+    try:
+        return stats_aggregator.stats(subreddits=subreddit, start_date=start_date, end_date=end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/timeline")
+async def get_timeline(resolution: str = 'hour', team: Optional[str] = None, player: Optional[str] = None,
+                       subreddit: Optional[str] = None, start_date: Optional[str] = None,
+                       end_date: Optional[str] = None):
+    """
+    Sentiment, emotion and intensity per time bucket.
+
+    Served from rollups maintained on ingest. Query parameters:
+    - resolution: minute, hour or day
+    - team, player or subreddit: Series to return (all comments when omitted)
+    - start_date, end_date: Inclusive YYYY-MM-DD range (UTC)
+    """
+    keys = {field: value for field, value in (('team', team), ('player', player), ('subreddit', subreddit))
+            if value}
+    if len(keys) > 1:
+        raise HTTPException(status_code=400, detail="Pass at most one of team, player or subreddit")
+    field, value = next(iter(keys.items()), (None, None))
+
+    try:
+        buckets = sentiment_timeline.timeline(resolution, field, value, start_date=start_date, end_date=end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"resolution": resolution, **keys, "buckets": buckets}
 
 if __name__ == "__main__":
     import uvicorn
@@ -7,9 +7,115 @@ from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification
 )
-from typing import List, Dict
+from torch.utils.data import Dataset, Sampler
+from typing import List, Dict, Optional
+import hashlib
+import os
 import numpy as np
 
+class TokenizedDataset(Dataset):
+    """Pre-tokenized, unpadded examples stored as one flat token array plus offsets."""
+
+    def __init__(self, token_ids: np.ndarray, offsets: np.ndarray, labels: List[int]):
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.labels = labels
+        self.lengths = np.diff(offsets)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        return self.token_ids[self.offsets[idx]:self.offsets[idx + 1]], self.labels[idx]
+
+class PadCollator:
+    """Pads each batch only to its own longest example."""
+
+    def __init__(self, pad_token_id: int):
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, batch):
+        max_len = max(len(ids) for ids, _ in batch)
+        input_ids = torch.full((len(batch), max_len), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), max_len), dtype=torch.long)
+        for i, (ids, _) in enumerate(batch):
+            input_ids[i, :len(ids)] = torch.from_numpy(ids.astype(np.int64))
+            attention_mask[i, :len(ids)] = 1
+        labels = torch.tensor([label for _, label in batch], dtype=torch.long)
+        return {'input_ids': input_ids, 'attention_mask': attention_mask, 'labels': labels}
+
+class LengthGroupedBatchSampler(Sampler):
+    """
+    Shuffled batches of similar length, deterministic per (seed, epoch).
+
+    Indices are shuffled, split into mega-batches, sorted by length inside each
+    mega-batch and cut into batches, so padding stays small while batch order
+    remains random. Determinism lets a resumed run skip the batches it already did.
+    """
+
+    def __init__(self, lengths: np.ndarray, batch_size: int, group_by_length: bool = True,
+                 mega_batch_factor: int = 50, seed: int = 42):
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.group_by_length = group_by_length
+        self.mega_batch_size = batch_size * mega_batch_factor
+        self.seed = seed
+        self.epoch = 0
+        self.skip = 0
+
+    def set_epoch(self, epoch: int, skip: int = 0):
+        self.epoch = epoch
+        self.skip = skip
+
+    def batches(self) -> List[np.ndarray]:
+        rng = np.random.default_rng(self.seed + self.epoch)
+        order = rng.permutation(len(self.lengths))
+
+        if not self.group_by_length:
+            return [order[i:i+self.batch_size] for i in range(0, len(order), self.batch_size)]
+
+        batches = []
+        for i in range(0, len(order), self.mega_batch_size):
+            mega = order[i:i+self.mega_batch_size]
+            mega = mega[np.argsort(-self.lengths[mega], kind='stable')]
+            batches.extend(mega[j:j+self.batch_size] for j in range(0, len(mega), self.batch_size))
+        return [batches[k] for k in rng.permutation(len(batches))]
+
+    def __iter__(self):
+        for batch in self.batches()[self.skip:]:
+            yield batch.tolist()
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size - self.skip
+
+def load_labelled_csv(path: str, text_column: str = 'A', label_column: str = 'B'):
+    """
+    Load manually labelled comments, e.g. the classify.csv export.
+
+    Labels may be negative/neutral/positive (any case) or ids 0/1/2.
+    Rows without a label are skipped.
+
+    Returns:
+        (texts, label_ids)
+    """
+    import pandas as pd
+
+    label_ids = {'negative': 0, 'neutral': 1, 'positive': 2}
+    df = pd.read_csv(path, encoding='utf-8-sig').dropna(subset=[text_column, label_column])
+
+    texts, labels = [], []
+    for text, label in zip(df[text_column], df[label_column]):
+        label = str(label).strip().lower()
+        if label in label_ids:
+            labels.append(label_ids[label])
+        elif label.replace('.0', '') in ('0', '1', '2'):
+            labels.append(int(float(label)))
+        else:
+            continue
+        texts.append(str(text))
+
+    return texts, labels
+
 class BertSentimentAnalyzer:
     def __init__(self, model_name: str = "bert-base-uncased", use_gpu: bool = True):
 
@@ -71,46 +177,155 @@ class BertSentimentAnalyzer:
                     }
                 })
 
-            return results
+        return results
         
-    def fine_tune(self, train_texts: List[str], train_labels: List[int], epochs: int=3, learning_rate: float=2e-5):
-        from torch.utils.data import Dataset, DataLoader
-        from transformers import AdamW
+    def tokenize_cached(self, texts: List[str], max_length: int = 512,
+                        cache_dir: Optional[str] = None):
+        """
+        Tokenize texts once without padding.
+
+        With cache_dir, the result is stored as a flat int32 token array plus
+        offsets, keyed by tokenizer, max_length and text content.
+
+        Returns:
+            (token_ids, offsets) numpy arrays
+        """
+        cache_path = None
+        if cache_dir:
+            key = hashlib.sha1()
+            key.update(f"{self.tokenizer.name_or_path}|{max_length}|{len(texts)}".encode('utf-8'))
+            for text in texts:
+                key.update(text.encode('utf-8'))
+                key.update(b'\x00')
+            cache_path = os.path.join(cache_dir, f"tokens-{key.hexdigest()[:16]}.npz")
+            if os.path.exists(cache_path):
+                cached = np.load(cache_path)
+                print(f"Loaded tokenized dataset from {cache_path}")
+                return cached['token_ids'], cached['offsets']
+
+        encoded = self.tokenizer(texts, truncation=True, max_length=max_length)['input_ids']
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(ids) for ids in encoded], out=offsets[1:])
+        token_ids = np.fromiter((t for ids in encoded for t in ids), dtype=np.int32, count=offsets[-1])
+
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(cache_path, token_ids=token_ids, offsets=offsets)
+            print(f"Saved tokenized dataset to {cache_path}")
+
+        return token_ids, offsets
 
-        class SentimentDataset(Dataset):
-            def __init__(self, texts, labels, tokenizer):
-                self.encodings = tokenizer(texts, truncation=True, padding=True, max_length=512)
-                self.labels = labels
+    def fine_tune(self, train_texts: List[str], train_labels: List[int], epochs: int=3, learning_rate: float=2e-5,
+                  batch_size: int = 16, max_length: int = 512, gradient_accumulation_steps: int = 1,
+                  group_by_length: bool = True, cache_dir: Optional[str] = None,
+                  checkpoint_dir: Optional[str] = None, checkpoint_every: int = 200,
+                  num_workers: int = 0, num_threads: Optional[int] = None, seed: int = 42):
+        """
+        Fine-tune on labelled texts.
+
+        Args:
+            train_texts: Training texts
+            train_labels: Label ids (0=negative, 1=neutral, 2=positive)
+            batch_size: Examples per forward pass
+            max_length: Truncation length in tokens
+            gradient_accumulation_steps: Forward passes per optimizer step
+            group_by_length: Batch examples of similar length to reduce padding
+            cache_dir: Directory for the pre-tokenized dataset cache
+            checkpoint_dir: Directory for resumable checkpoints (resumes if one exists
+                for the same data and arguments, otherwise starts over)
+            checkpoint_every: Optimizer steps between checkpoints
+            num_workers: DataLoader worker processes
+            num_threads: torch intra-op threads (None keeps the current setting)
+            seed: Seed for batch order
+        """
+        from torch.utils.data import DataLoader
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        token_ids, offsets = self.tokenize_cached(train_texts, max_length, cache_dir)
+        dataset = TokenizedDataset(token_ids, offsets, list(train_labels))
+        sampler = LengthGroupedBatchSampler(dataset.lengths, batch_size, group_by_length, seed=seed)
+        dataloader = DataLoader(
+            dataset,
+            batch_sampler=sampler,
+            collate_fn=PadCollator(self.tokenizer.pad_token_id),
+            num_workers=num_workers,
+            persistent_workers=False
+        )
 
-            def __getitem__(self, idx):
-                item = {key: torch.tensor(val[idx])
-                        for key, val in self.encodings.items()}
-                item['labels'] = torch.tensor(self.labels[idx], dtype=torch.long)
-                return item
+        optimizer = torch.optim.AdamW(self.model.parameters(), lr=learning_rate)
 
-        dataset = SentimentDataset(train_texts, train_labels, self.tokenizer)
-        dataloader = DataLoader(dataset, batch_size=16, shuffle=True)
+        # A checkpoint's batch position only means something for the same
+        # examples, labels and batching
+        fingerprint = hashlib.sha1()
+        fingerprint.update(f"{self.tokenizer.name_or_path}|{max_length}|{batch_size}|"
+                           f"{gradient_accumulation_steps}|{group_by_length}|{seed}|{learning_rate}".encode('utf-8'))
+        fingerprint.update(np.ascontiguousarray(token_ids).tobytes())
+        fingerprint.update(np.ascontiguousarray(offsets).tobytes())
+        fingerprint.update(np.asarray(train_labels, dtype=np.int64).tobytes())
+        fingerprint = fingerprint.hexdigest()
 
-        optimizer = AdamW(self.model.parameters(), lr=learning_rate)
+        # Resume from the last checkpoint
+        start_epoch, start_batch, total_loss = 0, 0, 0.0
+        checkpoint_path = os.path.join(checkpoint_dir, "checkpoint.pt") if checkpoint_dir else None
+        state = None
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            state = torch.load(checkpoint_path, map_location=self.device)
+            if state.get('fingerprint') != fingerprint:
+                print(f"Checkpoint in {checkpoint_dir} is for different data or arguments; starting over")
+                state = None
+        if state is not None:
+            self.model.load_state_dict(state['model'])
+            optimizer.load_state_dict(state['optimizer'])
+            start_epoch, start_batch, total_loss = state['epoch'], state['batch'], state['total_loss']
+            print(f"Resuming from epoch {start_epoch+1}, batch {start_batch}")
+
+        def save_checkpoint(epoch, batch, loss):
+            if not checkpoint_path:
+                return
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            torch.save({
+                'model': self.model.state_dict(),
+                'optimizer': optimizer.state_dict(),
+                'epoch': epoch,
+                'batch': batch,
+                'total_loss': loss,
+                'fingerprint': fingerprint
+            }, checkpoint_path + ".tmp")
+            os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+        n_batches = len(sampler.batches())
 
         #Training Loop
         self.model.train()
-        for epoch in range(epochs):
-            total_loss = 0
-            for batch in dataloader:
-                optimizer.zero_grad()
+        for epoch in range(start_epoch, epochs):
+            skip = start_batch if epoch == start_epoch else 0
+            if skip == 0:
+                total_loss = 0.0
+            sampler.set_epoch(epoch, skip=skip)
+            optimizer.zero_grad()
 
+            for i, batch in enumerate(dataloader, start=skip):
                 input_ids = batch['input_ids'].to(self.device)
                 attention_mask = batch['attention_mask'].to(self.device)
                 labels = batch['labels'].to(self.device)
                 outputs = self.model(input_ids, attention_mask=attention_mask, labels=labels)
                 loss = outputs.loss
                 total_loss += loss.item()
-                loss.backward()
-                optimizer.step()
-            
-            avg_loss = total_loss / len(dataloader)
+                (loss / gradient_accumulation_steps).backward()
+
+                done = i + 1
+                if done % gradient_accumulation_steps == 0 or done == n_batches:
+                    optimizer.step()
+                    optimizer.zero_grad()
+
+                    if (done // gradient_accumulation_steps) % checkpoint_every == 0:
+                        save_checkpoint(epoch, done, total_loss)
+
+            avg_loss = total_loss / n_batches
             print(f"Epoch {epoch+1}/{epochs}, Loss: {avg_loss:.4f}")
+            save_checkpoint(epoch + 1, 0, 0.0)
 
         self.model.eval()
 
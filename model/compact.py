@@ -0,0 +1,402 @@
+import sys
+from typing import List, Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+SENTIMENTS = ['negative', 'neutral', 'positive']
+
+# Low-cardinality string columns kept as categoricals
+CATEGORICAL_COLUMNS = ['bert_sentiment', 'vader_sentiment', 'primary_emotion', 'subreddit',
+                       'team_affiliation', 'post_id', 'post_title']
+
+FLOAT32_COLUMNS = ['bert_confidence', 'vader_compound', 'opinion_intensity',
+                   'opinion_score', 'topic_probability']
+
+INT_COLUMNS = {
+    'comment_length': np.int32,
+    'word_count': np.int32,
+    'engagement_score': np.int32,
+    'hour': np.int8,
+    'day_of_week': np.int8,
+    'topic': np.int32,
+}
+
+# Entity labels that feed the legacy persons/orgs/events lists
+ENTITY_GROUPS = {'PERSON': 'persons', 'ORG': 'orgs', 'EVENT': 'events'}
+
+def _grow(array: np.ndarray, needed: int) -> np.ndarray:
+    """Return array with capacity for needed items, doubling when it is full."""
+    if needed <= len(array):
+        return array
+    grown = np.empty(max(needed, 2 * len(array), 1024), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, end) for each pair, without a Python loop."""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    row_offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + np.arange(total) - row_offsets
+
+class EntityTable:
+    """
+    Named entities of all rows as integer-coded ragged arrays.
+
+    Each occurrence is a code into `texts` plus a code into `labels`; row i owns
+    occurrences [entity_start[i], entity_end[i]). Arrays grow by doubling and
+    are only appended to, so views handed to readers stay valid.
+    """
+
+    def __init__(self):
+        self.texts: List[str] = []
+        self.labels: List[str] = []
+        self._text_codes: Dict[str, int] = {}
+        self._label_codes: Dict[str, int] = {}
+        self._texts_arr = np.zeros(0, dtype=np.int32)
+        self._labels_arr = np.zeros(0, dtype=np.int16)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def text_codes(self) -> np.ndarray:
+        return self._texts_arr[:self._size]
+
+    @property
+    def label_codes(self) -> np.ndarray:
+        return self._labels_arr[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        return (self._texts_arr.nbytes + self._labels_arr.nbytes +
+                sum(sys.getsizeof(t) for t in self.texts) + sys.getsizeof(self.texts))
+
+    @staticmethod
+    def _code(value: str, values: List[str], codes: Dict[str, int]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def extend(self, entities: Iterable[Optional[Dict]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Append the entities of consecutive rows.
+
+        Args:
+            entities: Per-row dicts as produced by extract_entities (all_entities is used)
+
+        Returns:
+            (starts, ends) occurrence ranges, one per row
+        """
+        starts, ends, texts, labels = [], [], [], []
+        position = self._size
+        for row in entities:
+            starts.append(position)
+            for entity in (row or {}).get('all_entities') or []:
+                texts.append(self._code(entity['text'], self.texts, self._text_codes))
+                labels.append(self._code(entity['label'], self.labels, self._label_codes))
+                position += 1
+            ends.append(position)
+
+        texts_arr = _grow(self._texts_arr, position)
+        labels_arr = _grow(self._labels_arr, position)
+        texts_arr[self._size:position] = texts
+        labels_arr[self._size:position] = labels
+        self._texts_arr, self._labels_arr, self._size = texts_arr, labels_arr, position
+
+        return np.asarray(starts, dtype=np.int32), np.asarray(ends, dtype=np.int32)
+
+    def row(self, start: int, end: int) -> Dict:
+        """Entities of one row in the extract_entities dict shape."""
+        entities = {'persons': [], 'orgs': [], 'events': [], 'all_entities': []}
+        for text_code, label_code in zip(self._texts_arr[start:end], self._labels_arr[start:end]):
+            text, label = self.texts[text_code], self.labels[label_code]
+            entities['all_entities'].append({'text': text, 'label': label})
+            if label in ENTITY_GROUPS:
+                entities[ENTITY_GROUPS[label]].append(text)
+        return entities
+
+    def mentions(self, label: str, starts: np.ndarray = None, ends: np.ndarray = None) -> pd.Series:
+        """
+        Mention counts of entities with a label, most frequent first.
+
+        Args:
+            label: spaCy label, e.g. PERSON for players or ORG for teams
+            starts, ends: Restrict to these rows' ranges (all rows when omitted)
+        """
+        if label not in self._label_codes:
+            return pd.Series(dtype=np.int64)
+
+        texts, labels = self.text_codes, self.label_codes
+        if starts is not None:
+            positions = _ranges(np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64))
+            texts, labels = texts[positions], labels[positions]
+
+        counts = np.bincount(texts[labels == self._label_codes[label]], minlength=len(self.texts))
+        nonzero = np.flatnonzero(counts)
+        order = nonzero[np.argsort(-counts[nonzero], kind='stable')]
+        return pd.Series(counts[order], index=[self.texts[i] for i in order])
+
+    def row_counts(self, label: str, starts: np.ndarray, ends: np.ndarray) -> pd.Series:
+        """
+        Number of rows mentioning each entity with a label, most frequent first.
+
+        Like mentions, but an entity named twice in one row counts once.
+        """
+        if label not in self._label_codes or len(self.texts) == 0:
+            return pd.Series(dtype=np.int64)
+
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        positions = _ranges(starts, ends)
+        rows = np.repeat(np.arange(len(starts)), ends - starts)
+        keep = self.label_codes[positions] == self._label_codes[label]
+        # Keys are already grouped by row, so a stable sort is nearly free
+        pairs = np.sort(rows[keep] * len(self.texts) + self.text_codes[positions[keep]], kind='stable')
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))] if len(pairs) else pairs
+
+        counts = np.bincount(pairs % len(self.texts), minlength=len(self.texts))
+        nonzero = np.flatnonzero(counts)
+        order = nonzero[np.argsort(-counts[nonzero], kind='stable')]
+        return pd.Series(counts[order], index=[self.texts[i] for i in order])
+
+def compact_opinions(df: pd.DataFrame, entities: EntityTable) -> pd.DataFrame:
+    """
+    Convert pipeline output to the compact in-memory layout.
+
+    - sentiment, emotion, subreddit, flair and post columns become categoricals
+    - scores become float32, counters narrow integers
+    - bert_scores becomes bert_negative/bert_neutral/bert_positive columns
+    - emotion_<label> probabilities are float16 (a legacy top-3 emotions list
+      is turned into those columns, NaN for the emotions it didn't keep)
+    - entities are appended to the EntityTable; rows keep entity_start/entity_end
+      (mentioned_players/mentioned_teams are the PERSON/ORG entities)
+    - original_text shares the text object when cleaning didn't change it
+
+    Columns that are absent are skipped, so partial loads can be compacted too.
+    """
+    df = df.copy()
+
+    for column in ('bert_sentiment', 'vader_sentiment'):
+        if column in df:
+            df[column] = pd.Categorical(df[column], categories=SENTIMENTS)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+
+    for column in FLOAT32_COLUMNS:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(np.float32)
+    for column, dtype in INT_COLUMNS.items():
+        if column in df:
+            df[column] = df[column].fillna(0).astype(dtype)
+
+    if 'bert_scores' in df:
+        scores = df.pop('bert_scores')
+        for label in SENTIMENTS:
+            df[f'bert_{label}'] = np.array([s[label] for s in scores], dtype=np.float32)
+
+    emotion_columns = [c for c in df.columns if c.startswith('emotion_')]
+    if 'emotions' in df:
+        # Older results only kept the top-3 list; the other scores are unknown
+        emotions = df.pop('emotions')
+        if not emotion_columns:
+            scores = {}
+            for row, top in enumerate(emotions):
+                for e in (top if top is not None else []):
+                    scores.setdefault(f"emotion_{e['emotion']}", np.full(len(df), np.nan))[row] = e['score']
+            df = pd.concat([df, pd.DataFrame(scores, index=df.index)], axis=1)
+            emotion_columns = list(scores)
+    for column in emotion_columns:
+        if df[column].dtype != np.float16:
+            df[column] = df[column].astype(np.float16)
+
+    if 'entities' in df:
+        starts, ends = entities.extend(df.pop('entities'))
+        df['entity_start'] = starts
+        df['entity_end'] = ends
+        df = df.drop(columns=['mentioned_players', 'mentioned_teams'], errors='ignore')
+
+    if 'text' in df and 'original_text' in df:
+        text = df['text'].to_numpy(dtype=object)
+        original = df['original_text'].to_numpy(dtype=object)
+        df['original_text'] = np.where(text == original, text, original)
+
+    return df
+
+def _codes_dtype(n_categories: int) -> type:
+    """Smallest code dtype pandas uses for n_categories (so wrapping codes doesn't copy them)."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+def _missing(dtype: np.dtype):
+    """Fill value for rows of a batch that lack a column."""
+    if dtype.kind == 'f':
+        return np.nan
+    if dtype.kind in 'mM':
+        return np.datetime64('NaT')
+    if dtype.kind == 'O':
+        return None
+    return 0
+
+class ColumnBuffers:
+    """
+    Compact opinion rows in capacity-doubling column buffers.
+
+    Appending writes the new rows after the old ones, so a batch costs
+    O(batch) amortized instead of copying the whole table. frame() wraps the
+    filled part of every buffer in a DataFrame without copying. Frames handed
+    out earlier stay valid: the rows they cover are never written again, and
+    a grown buffer is a new array. Categorical columns keep an append-only
+    category list, so existing codes never change.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._buffers: Dict[str, np.ndarray] = {}
+        self._categories: Dict[str, List] = {}
+        self._category_codes: Dict[str, Dict] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _column(self, name: str, values) -> np.ndarray:
+        """values as an array in the buffer's representation (codes for categoricals)."""
+        if name in self._categories:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype('category')
+            categories, codes = self._categories[name], self._category_codes[name]
+            mapping = np.empty(len(values.cat.categories) + 1, dtype=np.int64)
+            mapping[-1] = -1
+            for i, category in enumerate(values.cat.categories):
+                if category not in codes:
+                    codes[category] = len(categories)
+                    categories.append(category)
+                mapping[i] = codes[category]
+            # Code -1 (missing) indexes the trailing -1
+            return mapping[values.cat.codes.to_numpy()]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return values.to_numpy(dtype=object)
+        return values.to_numpy()
+
+    def _reserve(self, name: str, dtype: np.dtype, needed: int):
+        """Make the buffer hold needed rows of dtype, upcasting it if needed."""
+        buffer = self._buffers[name]
+        if buffer.dtype != dtype:
+            if name in self._categories:
+                dtype = np.dtype(_codes_dtype(len(self._categories[name])))
+            elif buffer.dtype.kind == 'O' or dtype.kind in 'OmM' or buffer.dtype.kind in 'mM':
+                dtype = np.dtype(object)
+            else:
+                dtype = np.result_type(buffer.dtype, dtype)
+            if buffer.dtype != dtype:
+                buffer = buffer.astype(dtype)
+        self._buffers[name] = _grow(buffer, needed)
+
+    def append(self, df: pd.DataFrame):
+        """Append a compact batch; columns new to the table are missing in the older rows."""
+        n = len(df)
+        if not n:
+            return
+        end = self.size + n
+
+        for name in df.columns:
+            if name not in self._buffers:
+                if isinstance(df[name].dtype, pd.CategoricalDtype):
+                    self._categories[name], self._category_codes[name] = [], {}
+                    buffer = np.full(self.size, -1, dtype=np.int8)
+                else:
+                    dtype = df[name].to_numpy().dtype
+                    buffer = np.full(self.size, _missing(dtype), dtype=dtype)
+                self._buffers[name] = buffer
+            values = self._column(name, df[name])
+            dtype = (np.dtype(_codes_dtype(len(self._categories[name])))
+                     if name in self._categories else values.dtype)
+            self._reserve(name, dtype, end)
+            self._buffers[name][self.size:end] = values
+
+        for name, buffer in self._buffers.items():
+            if name not in df.columns:
+                self._reserve(name, buffer.dtype, end)
+                buffer = self._buffers[name]
+                buffer[self.size:end] = -1 if name in self._categories else _missing(buffer.dtype)
+
+        self.size = end
+
+    def frame(self) -> pd.DataFrame:
+        """The rows appended so far, as a DataFrame over the buffers (no copy)."""
+        columns = {}
+        for name, buffer in self._buffers.items():
+            if name in self._categories:
+                dtype = pd.CategoricalDtype(self._categories[name])
+                columns[name] = pd.Categorical.from_codes(buffer[:self.size], dtype=dtype, validate=False)
+            else:
+                columns[name] = buffer[:self.size]
+        return pd.DataFrame(columns, index=pd.RangeIndex(self.size), copy=False)
+
+def deep_memory(df: pd.DataFrame, *extra) -> int:
+    """
+    Bytes held by a table, following nested dicts and lists.
+
+    Python objects shared between cells are counted once, unlike
+    DataFrame.memory_usage(deep=True). Extra objects with an nbytes
+    attribute (e.g. an EntityTable) are added.
+    """
+    seen = set()
+
+    def size(obj) -> int:
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        total = sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            total += sum(size(k) + size(v) for k, v in obj.items())
+        elif isinstance(obj, (list, tuple)):
+            total += sum(size(v) for v in obj)
+        return total
+
+    total = int(df.index.nbytes)
+    for column in df.columns:
+        series = df[column]
+        if series.dtype == object:
+            values = series.to_numpy()
+            total += values.nbytes + sum(size(v) for v in values)
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            total += series.cat.codes.nbytes + int(series.cat.categories.memory_usage(deep=True))
+        else:
+            total += series.to_numpy().nbytes
+    return total + sum(getattr(obj, 'nbytes', 0) for obj in extra)
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+    import json
+    from ingest import posts_from_records
+    from opinion_pipeline import OpinionSearchPipeline
+
+    parser = argparse.ArgumentParser(description="Report the memory footprint of the compact opinions layout")
+    parser.add_argument('--data', default='../football_opinions.json')
+    args = parser.parse_args()
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+
+    pipeline = OpinionSearchPipeline(use_gpu=True)
+    df = pipeline.process_batch(posts_from_records(records))
+
+    entities = EntityTable()
+    compact = compact_opinions(df, entities)
+
+    before = deep_memory(df)
+    after = deep_memory(compact, entities)
+    print(f"{len(df)} comments")
+    print(f"Before: {before / 1e6:.2f} MB ({before / len(df):.0f} bytes/comment)")
+    print(f"After:  {after / 1e6:.2f} MB ({after / len(df):.0f} bytes/comment)")
@@ -0,0 +1,188 @@
+import threading
+from types import SimpleNamespace
+from typing import Tuple
+import pandas as pd
+from compact import EntityTable, ColumnBuffers, compact_opinions
+
+class OpinionCorpus:
+    """
+    The published table of analyzed opinions.
+
+    Rows are only ever appended, so a row's position is a stable id until the
+    corpus is replaced. Every change bumps the generation number.
+
+    Listeners (indexes, aggregates) follow every change:
+    - add(batch, start_row) for appended rows
+    - clone(corpus) and adopt(other) when the corpus is replaced: an empty
+      copy bound to the new entity table is filled off to the side, then
+      adopted in one step
+    - reset() and add(df, 0) on subscribe
+
+    Writers build the new rows and the listeners' state first, then publish
+    df, entities and generation together; readers take them with snapshot().
+    Rows are kept in the compact layout from compact.py, in column buffers
+    that grow in place; entities live in `entities` and rows point into it
+    with entity_start/entity_end.
+
+    With a backend (e.g. SQLiteBackend) rows are written there instead and
+    df stays empty; listeners get the uncompacted batches, and load()
+    rebuilds them from the stored rows.
+    """
+
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend: SearchBackend that stores the rows instead of memory
+        """
+        self.backend = backend
+        self.df = pd.DataFrame()
+        self.entities = EntityTable()
+        self.generation = 0
+        self._columns = ColumnBuffers()
+        self._ids = set()
+        self._size = 0
+        self._listeners = []
+        # _lock guards the published (df, entities, generation); _write_lock
+        # lets one writer at a time build the next version
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.df) if self.backend is None else self._size
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def snapshot(self) -> Tuple[pd.DataFrame, EntityTable, int]:
+        """(df, entities, generation) of one published version."""
+        with self._lock:
+            return self.df, self.entities, self.generation
+
+    def subscribe(self, listener):
+        """
+        Register an object with the reset/add/clone/adopt listener methods.
+
+        With a backend, stored rows reach the listener on the next load(),
+        which feeds every listener in a single scan.
+        """
+        with self._write_lock:
+            self._listeners.append(listener)
+            listener.reset()
+            if self.backend is None and not self.df.empty:
+                listener.add(self.df, 0)
+
+    def _stage(self, entities: EntityTable, batches) -> Tuple[list, int]:
+        """Listener copies filled with batches off to the side, and the row count."""
+        staging = SimpleNamespace(entities=entities)
+        staged = [listener.clone(staging) for listener in self._listeners]
+        size = 0
+        for batch in batches:
+            if batch.empty:
+                continue
+            batch = batch.reset_index(drop=True)
+            for fresh in staged:
+                fresh.add(batch, size)
+            size += len(batch)
+        return staged, size
+
+    def _publish(self, staged: list, frame: pd.DataFrame, entities: EntityTable, size: int):
+        with self._lock:
+            for listener, fresh in zip(self._listeners, staged):
+                listener.adopt(fresh)
+            self.df, self.entities, self._size = frame, entities, size
+            self.generation += 1
+
+    def replace(self, df: pd.DataFrame):
+        """Publish df as the whole corpus."""
+        with self._write_lock:
+            if not df.empty:
+                df = df.drop_duplicates('comment_id').reset_index(drop=True)
+            entities = EntityTable()
+
+            if self.backend is not None:
+                # Listeners are rebuilt before the stored rows change
+                staged, size = self._stage(entities, [df])
+                self.backend.clear()
+                self.backend.add(df)
+                self._publish(staged, pd.DataFrame(), entities, size)
+                return
+
+            columns = ColumnBuffers()
+            ids = set()
+            if not df.empty:
+                columns.append(compact_opinions(df, entities))
+                ids = set(df['comment_id'])
+            frame = columns.frame()
+
+            # Listeners are rebuilt against the new entity table before anything is published
+            staged, size = self._stage(entities, [frame])
+            self._publish(staged, frame, entities, size)
+            self._columns, self._ids = columns, ids
+
+    def load(self):
+        """Rebuild the listeners from the rows already stored in the backend."""
+        if self.backend is None:
+            return
+        with self._write_lock:
+            entities = EntityTable()
+            staged, size = self._stage(entities, self.backend.scan())
+            self._publish(staged, pd.DataFrame(), entities, size)
+
+    def new_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        """The rows of df whose comment_id is not in the corpus yet."""
+        if df.empty:
+            return df
+        with self._write_lock:
+            return self._unseen(df)
+
+    def _unseen(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.backend is not None:
+            return self.backend.new_rows(df)
+        # Set lookups per row: Series.isin would copy the whole id set every batch
+        ids = self._ids
+        unseen = [comment_id not in ids for comment_id in df['comment_id'].tolist()]
+        return df[unseen].drop_duplicates('comment_id')
+
+    def append(self, df: pd.DataFrame) -> int:
+        """
+        Append newly analyzed opinions.
+
+        Comments already in the corpus are skipped. Returns the number of rows added.
+        """
+        if df.empty:
+            return 0
+
+        with self._write_lock:
+            new = self._unseen(df)
+            if new.empty:
+                return 0
+
+            if self.backend is not None:
+                new = new.reset_index(drop=True)
+                start = self._size
+                self.backend.add(new)
+                for listener in self._listeners:
+                    listener.add(new, start)
+                with self._lock:
+                    self._size += len(new)
+                    self.generation += 1
+                return len(new)
+
+            start = len(self._columns)
+            new = compact_opinions(new.reset_index(drop=True), self.entities)
+            new.index = new.index + start
+            self._columns.append(new)
+            frame = self._columns.frame()
+            self._ids.update(new['comment_id'])
+
+            # Listeners take the rows before they are published; readers of
+            # the previous snapshot ignore row ids past its end
+            for listener in self._listeners:
+                listener.add(new, start)
+
+            with self._lock:
+                self.df = frame
+                self.generation += 1
+
+        return len(new)
@@ -1,7 +1,7 @@
 import json
 import re
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 import pandas as pd
 import nltk
 from nltk.tokenize import word_tokenize
@@ -51,44 +51,63 @@ class DataProcessor:
         }
         return features
     
-    def process_posts(self, data: Dict) -> pd.DataFrame:
-        processed_data = []
-
-        for post in data.get('posts', []):
-            post_id = post['post_id']
-            subreddit = post['subreddit']
-            post_title = post['title']
-            post_time = post['created_utc']
+    @staticmethod
+    def _field(obj: Any, name: str, default: Any = None) -> Any:
+        """Read a field from a dict or an object such as a pydantic model."""
+        if isinstance(obj, dict):
+            return obj.get(name, default)
+        return getattr(obj, name, default)
 
-            for comment in post.get('comments', []):
-                clean_text = self.clean_text(comment['body'])
+    def process_posts(self, data: Dict) -> pd.DataFrame:
+        return self.process_records(data.get('posts', []))
+
+    def process_records(self, posts: Iterable[Any]) -> pd.DataFrame:
+        """
+        Build the comments table straight from in-memory posts.
+
+        Posts may be dicts or objects with the same fields (e.g. the API's
+        request models); columns are filled directly, with the per-comment
+        features from extract_features.
+        """
+        columns = {name: [] for name in (
+            'post_id', 'subreddit', 'post_title', 'post_time', 'comment_id', 'author',
+            'text', 'original_text', 'comment_length', 'word_count', 'has_flair',
+            'team_affiliation', 'engagement_score', 'timestamp', 'is_reply'
+        )}
+        field = self._field
+
+        for post in posts:
+            post_id = field(post, 'post_id')
+            subreddit = field(post, 'subreddit')
+            post_title = field(post, 'title')
+            post_time = field(post, 'created_utc')
+
+            for comment in field(post, 'comments', None) or []:
+                body = comment['body']
+                clean_text = self.clean_text(body)
 
                 #Skip short or empty comments
                 if not clean_text or len(clean_text) < 10:
                     continue 
 
-                features = self.extract_features(comment)
-
-                record = {
-                    'post_id': post_id,
-                    'subreddit': subreddit,
-                    'post_title': post_title,
-                    'post_time': post_time,
-                    'comment_id': comment['id'],
-                    'author': comment['author'],
-                    'text': clean_text,
-                    'original_text': comment['body'],
-                    **features
-                }
-
-                processed_data.append(record)
-
-        df = pd.DataFrame(processed_data)
-
-        if not df.empty:
-            df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
-            df['hour'] = df['datetime'].dt.hour
-            df['day_of_week'] = df['datetime'].dt.dayofweek
+                columns['post_id'].append(post_id)
+                columns['subreddit'].append(subreddit)
+                columns['post_title'].append(post_title)
+                columns['post_time'].append(post_time)
+                columns['comment_id'].append(comment['id'])
+                columns['author'].append(comment['author'])
+                columns['text'].append(clean_text)
+                columns['original_text'].append(body)
+                for name, value in self.extract_features(comment).items():
+                    columns[name].append(value)
+
+        if not columns['comment_id']:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(columns)
+        df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
+        df['hour'] = df['datetime'].dt.hour
+        df['day_of_week'] = df['datetime'].dt.dayofweek
 
         return df
     
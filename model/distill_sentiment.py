@@ -0,0 +1,213 @@
+import argparse
+import ast
+import json
+import os
+import time
+from typing import List, Dict
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from bert_sentiment import BertSentimentAnalyzer
+
+LABELS = ['negative', 'neutral', 'positive']
+
+def vader_distribution(compound: np.ndarray) -> np.ndarray:
+    """Map VADER compound scores (-1 to 1) to negative/neutral/positive probabilities."""
+    compound = np.clip(np.asarray(compound, dtype=np.float64), -1.0, 1.0)
+    return np.stack([
+        np.maximum(-compound, 0),
+        1 - np.abs(compound),
+        np.maximum(compound, 0)
+    ], axis=1)
+
+def soft_targets(bert_scores: List[Dict], vader_compound: List[float], bert_weight: float = 0.7) -> np.ndarray:
+    """
+    Blend stored BERT probabilities with the VADER compound score.
+
+    Args:
+        bert_scores: Per-comment dicts with negative/neutral/positive probabilities
+        vader_compound: Per-comment VADER compound scores
+        bert_weight: Weight of the BERT distribution (VADER gets the rest)
+
+    Returns:
+        (n, 3) array of target probabilities in LABELS order
+    """
+    bert = np.array([[s[label] for label in LABELS] for s in bert_scores], dtype=np.float64)
+    targets = bert_weight * bert + (1 - bert_weight) * vader_distribution(vader_compound)
+    return targets / targets.sum(axis=1, keepdims=True)
+
+def load_soft_labels(path: str) -> pd.DataFrame:
+    """Load text, bert_scores and vader_compound from the pipeline's Parquet store or a CSV export."""
+    columns = ['text', 'bert_scores', 'vader_compound']
+    if os.path.isdir(path):
+        from result_store import ParquetResultStore
+        df = ParquetResultStore(path).read(columns=columns)
+    else:
+        df = pd.read_csv(path, usecols=columns)
+        df['bert_scores'] = df['bert_scores'].apply(ast.literal_eval)
+    return df.dropna(subset=['text'])
+
+def label_with_teacher(texts: List[str], teacher: BertSentimentAnalyzer, batch_size: int = 32) -> pd.DataFrame:
+    """Produce the same soft labels the pipeline stores, for texts not analyzed yet."""
+    from vader_sentiment import VADERAnalyzer
+
+    bert_results = teacher.predict(texts, batch_size=batch_size)
+    vader_results = VADERAnalyzer().analyze(texts)
+    return pd.DataFrame({
+        'text': texts,
+        'bert_scores': [r['scores'] for r in bert_results],
+        'vader_compound': [r['compound'] for r in vader_results]
+    })
+
+def distill(texts: List[str], targets: np.ndarray, output_dir: str,
+            student_name: str = "nreimers/MiniLM-L6-H384-uncased",
+            epochs: int = 3, batch_size: int = 32, learning_rate: float = 5e-5,
+            temperature: float = 2.0, max_length: int = 128, use_gpu: bool = True) -> str:
+    """
+    Train a small student model on soft targets and save it as a drop-in model_name.
+
+    Args:
+        texts: Training texts
+        targets: (n, 3) target probabilities from soft_targets
+        output_dir: Where the student model and tokenizer are saved
+        student_name: Hugging Face name of the small pretrained encoder
+        temperature: Softening applied to both targets and student logits
+
+    Returns:
+        output_dir, usable as BertSentimentAnalyzer(model_name=output_dir)
+    """
+    device = torch.device('cuda' if use_gpu and torch.cuda.is_available() else 'cpu')
+
+    tokenizer = AutoTokenizer.from_pretrained(student_name)
+    student = AutoModelForSequenceClassification.from_pretrained(
+        student_name,
+        num_labels=len(LABELS),
+        id2label=dict(enumerate(LABELS)),
+        label2id={label: i for i, label in enumerate(LABELS)}
+    )
+    student.to(device)
+
+    # Soften the teacher distribution the same way the student logits are softened
+    soft = np.power(np.clip(targets, 1e-8, 1.0), 1.0 / temperature)
+    soft = torch.tensor(soft / soft.sum(axis=1, keepdims=True), dtype=torch.float32)
+
+    optimizer = torch.optim.AdamW(student.parameters(), lr=learning_rate)
+    order = np.arange(len(texts))
+
+    student.train()
+    for epoch in range(epochs):
+        np.random.shuffle(order)
+        total_loss = 0
+        n_batches = 0
+        for i in range(0, len(order), batch_size):
+            idx = order[i:i+batch_size]
+            encoded = tokenizer(
+                [texts[j] for j in idx],
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+                return_tensors='pt'
+            ).to(device)
+
+            logits = student(**encoded).logits
+            log_probs = F.log_softmax(logits / temperature, dim=1)
+            loss = F.kl_div(log_probs, soft[idx].to(device), reduction='batchmean') * temperature ** 2
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+            total_loss += loss.item()
+            n_batches += 1
+
+        print(f"Epoch {epoch+1}/{epochs}, Loss: {total_loss / max(n_batches, 1):.4f}")
+
+    student.eval()
+    os.makedirs(output_dir, exist_ok=True)
+    student.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    print(f"✓ Saved student model to {output_dir}")
+
+    return output_dir
+
+def benchmark(teacher: BertSentimentAnalyzer, student: BertSentimentAnalyzer,
+              texts: List[str], targets: np.ndarray, batch_size: int = 32) -> Dict:
+    """
+    Compare CPU latency and agreement of teacher and student.
+
+    Agreement is measured as matching argmax labels, against the teacher's
+    predictions and against the blended soft targets.
+    """
+    results = {}
+    predictions = {}
+    for name, analyzer in (('teacher', teacher), ('student', student)):
+        analyzer.predict(texts[:batch_size], batch_size=batch_size)  # warm-up
+        start = time.perf_counter()
+        output = analyzer.predict(texts, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+
+        predictions[name] = np.array([LABELS.index(r['sentiment']) for r in output])
+        results[name] = {
+            'parameters': sum(p.numel() for p in analyzer.model.parameters()),
+            'ms_per_comment': elapsed * 1000 / len(texts),
+            'comments_per_second': len(texts) / elapsed,
+            'agreement_with_targets': float((predictions[name] == targets.argmax(axis=1)).mean())
+        }
+
+    results['student']['agreement_with_teacher'] = float(
+        (predictions['student'] == predictions['teacher']).mean()
+    )
+    results['speedup'] = results['teacher']['ms_per_comment'] / results['student']['ms_per_comment']
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill BERT + VADER sentiment into a small student model")
+    parser.add_argument('--data', default='../football_opinions.json', help="Comments to label and benchmark on")
+    parser.add_argument('--opinions', help="Pipeline output (Parquet store directory or CSV) with stored soft labels (skips teacher labelling)")
+    parser.add_argument('--teacher', default='bert-base-uncased')
+    parser.add_argument('--student', default='nreimers/MiniLM-L6-H384-uncased')
+    parser.add_argument('--output', default='sentiment_student')
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=4, help="torch CPU threads for the benchmark")
+    args = parser.parse_args()
+
+    teacher = BertSentimentAnalyzer(model_name=args.teacher, use_gpu=True)
+
+    if args.opinions:
+        labelled = load_soft_labels(args.opinions)
+    else:
+        from data_processor import DataProcessor
+        processor = DataProcessor()
+        with open(args.data, 'r', encoding='utf-8') as f:
+            comments = json.load(f)
+        texts = [processor.clean_text(c.get('text') or c.get('body', '')) for c in comments]
+        texts = [t for t in texts if len(t) >= 10]
+        print(f"Labelling {len(texts)} comments with the teacher...")
+        labelled = label_with_teacher(texts, teacher)
+
+    texts = labelled['text'].tolist()
+    targets = soft_targets(labelled['bert_scores'].tolist(), labelled['vader_compound'].tolist())
+
+    # Hold out the last 20% for the benchmark
+    split = int(len(texts) * 0.8)
+    distill(texts[:split], targets[:split], args.output, student_name=args.student, epochs=args.epochs)
+
+    # Benchmark both models on CPU
+    torch.set_num_threads(args.threads)
+    # Reuse the labelling teacher: reloading would re-initialise an untrained head
+    teacher.device = torch.device('cpu')
+    teacher.model.to(teacher.device)
+    student_cpu = BertSentimentAnalyzer(model_name=args.output, use_gpu=False)
+    report = benchmark(teacher, student_cpu, texts[split:], targets[split:])
+
+    print(f"\n📊 Benchmark on {len(texts) - split} held-out comments ({args.threads} CPU threads):")
+    for name in ('teacher', 'student'):
+        r = report[name]
+        print(f"{name:>8}: {r['parameters'] / 1e6:.1f}M params, {r['ms_per_comment']:.2f} ms/comment, "
+              f"{r['comments_per_second']:.0f} comments/s, agreement with targets {r['agreement_with_targets']:.3f}")
+    print(f"Student agreement with teacher: {report['student']['agreement_with_teacher']:.3f}")
+    print(f"Speedup: {report['speedup']:.1f}x")
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+from typing import List, Callable, Optional
+import numpy as np
+
+class EmbeddingStore:
+    """Memory-mapped sentence embedding matrix keyed by comment_id."""
+
+    def __init__(self, path: str, dim: int, dtype: str = "float16",
+                 encoder: Optional[Callable] = None, initial_capacity: int = 1024):
+        """
+        Open or create an embedding store.
+
+        Args:
+            path: Directory holding the matrix, id list and metadata
+            dim: Embedding dimension
+            dtype: Storage dtype (float16 or float32)
+            encoder: Function mapping a list of texts to an (n, dim) array
+            initial_capacity: Rows allocated when creating a new store
+        """
+        self.path = path
+        self.encoder = encoder
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self._matrix_path = os.path.join(path, "embeddings.bin")
+        self._ids_path = os.path.join(path, "ids.txt")
+        self._meta_path = os.path.join(path, "meta.json")
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta['dim'] != dim:
+                raise ValueError(f"Store at {path} has dim {meta['dim']}, expected {dim}")
+            self.dim = meta['dim']
+            self.dtype = np.dtype(meta['dtype'])
+            self.capacity = meta['capacity']
+        else:
+            self.dim = dim
+            self.dtype = np.dtype(dtype)
+            self.capacity = initial_capacity
+            np.memmap(self._matrix_path, dtype=self.dtype, mode='w+',
+                      shape=(self.capacity, self.dim)).flush()
+            open(self._ids_path, 'w').close()
+            self._write_meta()
+
+        # Row index is rebuilt from the append-only id list
+        self.ids = []
+        with open(self._ids_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                self.ids.append(line.rstrip('\n'))
+        self.index = {comment_id: row for row, comment_id in enumerate(self.ids)}
+
+        self._matrix = self._open()
+
+    def _open(self) -> np.memmap:
+        return np.memmap(self._matrix_path, dtype=self.dtype, mode='r+',
+                         shape=(self.capacity, self.dim))
+
+    def _write_meta(self):
+        with open(self._meta_path, 'w') as f:
+            json.dump({'dim': self.dim, 'dtype': self.dtype.name, 'capacity': self.capacity}, f)
+
+    def _grow(self, needed: int):
+        """Double capacity until needed rows fit, extending the file in place."""
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+
+        self._matrix.flush()
+        del self._matrix
+        with open(self._matrix_path, 'r+b') as f:
+            f.truncate(capacity * self.dim * self.dtype.itemsize)
+        self.capacity = capacity
+        self._write_meta()
+        self._matrix = self._open()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, comment_id: str) -> bool:
+        return comment_id in self.index
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Zero-copy view of all stored embeddings, in row order."""
+        return self._matrix[:len(self.ids)]
+
+    def append(self, comment_ids: List[str], embeddings: np.ndarray) -> List[int]:
+        """
+        Append embeddings for new comment ids.
+
+        Ids already in the store keep their existing row.
+
+        Returns:
+            Row index for every given id
+        """
+        embeddings = np.asarray(embeddings)
+        with self._lock:
+            new_ids, new_rows = [], []
+            for i, comment_id in enumerate(comment_ids):
+                if comment_id not in self.index:
+                    self.index[comment_id] = len(self.ids) + len(new_ids)
+                    new_ids.append(comment_id)
+                    new_rows.append(i)
+
+            if new_ids:
+                start = len(self.ids)
+                self._grow(start + len(new_ids))
+                self._matrix[start:start + len(new_ids)] = embeddings[new_rows].astype(self.dtype)
+                self._matrix.flush()
+
+                with open(self._ids_path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(f"{comment_id}\n" for comment_id in new_ids))
+                self.ids.extend(new_ids)
+
+            return [self.index[comment_id] for comment_id in comment_ids]
+
+    def rows(self, comment_ids: List[str]) -> np.ndarray:
+        """Row indices for ids, -1 where missing."""
+        return np.array([self.index.get(comment_id, -1) for comment_id in comment_ids], dtype=np.int64)
+
+    def get(self, comment_ids: List[str]) -> np.ndarray:
+        """
+        Look up embeddings by id.
+
+        A single contiguous run of rows is returned as a view of the memory map,
+        anything else as a copy. Raises KeyError for unknown ids.
+        """
+        rows = self.rows(comment_ids)
+        if len(rows) and rows.min() < 0:
+            missing = [c for c, r in zip(comment_ids, rows) if r < 0]
+            raise KeyError(f"{len(missing)} ids not in embedding store, e.g. {missing[0]}")
+
+        if len(rows) and rows[-1] - rows[0] == len(rows) - 1 and np.all(np.diff(rows) == 1):
+            return self._matrix[rows[0]:rows[-1] + 1]
+        return self._matrix[rows]
+
+    def encode(self, comment_ids: List[str], texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """
+        Get embeddings for comments, encoding only those not stored yet.
+
+        Args:
+            comment_ids: Ids of the comments
+            texts: Texts aligned with comment_ids, used for misses
+            batch_size: Encoder batch size
+
+        Returns:
+            (n, dim) array aligned with comment_ids
+        """
+        if self.encoder is None:
+            raise ValueError("EmbeddingStore has no encoder")
+
+        misses = [i for i, comment_id in enumerate(comment_ids) if comment_id not in self.index]
+        if misses:
+            for i in range(0, len(misses), batch_size):
+                batch = misses[i:i+batch_size]
+                embeddings = self.encoder([texts[j] for j in batch])
+                self.append([comment_ids[j] for j in batch], embeddings)
+
+        return self.get(comment_ids)
@@ -0,0 +1,95 @@
+from typing import List, Dict, Optional, Union
+import numpy as np
+import pandas as pd
+from search_backend import SearchBackend
+from compact import ENTITY_GROUPS
+
+# Facet -> column counted for it
+FACET_COLUMNS = {'sentiment': 'bert_sentiment', 'emotion': 'primary_emotion', 'subreddit': 'subreddit'}
+
+# Facet -> entity label counted for it
+ENTITY_FACETS = {'team': 'ORG', 'player': 'PERSON'}
+
+FACETS = list(FACET_COLUMNS) + list(ENTITY_FACETS)
+
+def check_facets(facets: Optional[List[str]]) -> List[str]:
+    """
+    Validate requested facets.
+
+    Raises:
+        ValueError: For unknown facets
+    """
+    unknown = [f for f in facets or [] if f not in FACETS]
+    if unknown:
+        raise ValueError(f"Unknown facets: {', '.join(unknown)}. Available: {', '.join(FACETS)}")
+    return list(dict.fromkeys(facets or []))
+
+def _top(counts: pd.Series, limit: Optional[int]) -> Dict[str, int]:
+    counts = counts[counts > 0]
+    if limit is not None:
+        counts = counts.iloc[:limit]
+    return {str(value): int(count) for value, count in counts.items()}
+
+def _column_counts(column: pd.Series, positions: np.ndarray) -> pd.Series:
+    """Value counts of column at positions, most frequent first."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # One bincount over the category codes of the matches
+        codes = column.cat.codes.to_numpy()[positions]
+        counts = np.bincount(codes[codes >= 0], minlength=len(column.cat.categories))
+        counts = pd.Series(counts, index=column.cat.categories)
+        return counts.sort_values(ascending=False, kind='stable')
+    return column.iloc[positions].value_counts()
+
+def facet_counts(source: Union[pd.DataFrame, SearchBackend], row_ids: np.ndarray,
+                 facets: List[str], entities=None, limit: Optional[int] = 10,
+                 filters: Optional[Dict] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Counts per facet value over a match set.
+
+    For the in-memory corpus, categorical columns are counted with one
+    bincount over the category codes of the matching rows. Teams and players
+    are counted over the EntityTable codes in the rows' entity ranges. Search
+    backends run one GROUP BY per facet under the search's own conditions.
+
+    Args:
+        source: Corpus DataFrame, or a SearchBackend
+        row_ids: Matching row ids (e.g. RankedResults.row_ids); unused for backends
+        facets: Facet names from FACETS
+        entities: The corpus EntityTable (compact rows)
+        limit: Values kept per facet, most frequent first (None for all)
+        filters: The search's backend conditions (OpinionSearchPipeline.backend_filters)
+
+    Returns:
+        {facet: {value: matching comments}}
+    """
+    facets = check_facets(facets)
+    result = {}
+
+    if isinstance(source, SearchBackend):
+        for facet in facets:
+            if facet in FACET_COLUMNS:
+                counts = source.value_counts(FACET_COLUMNS[facet], **(filters or {}))
+            else:
+                counts = source.list_counts(ENTITY_GROUPS[ENTITY_FACETS[facet]], **(filters or {}))
+            result[facet] = _top(counts, limit)
+        return result
+
+    positions = source.index.get_indexer(row_ids)
+    positions = positions[positions >= 0]
+
+    for facet in facets:
+        counts = pd.Series(dtype=np.int64)
+        if facet in FACET_COLUMNS:
+            if FACET_COLUMNS[facet] in source:
+                counts = _column_counts(source[FACET_COLUMNS[facet]], positions)
+        elif 'entity_start' in source and entities is not None:
+            counts = entities.row_counts(ENTITY_FACETS[facet],
+                                         source['entity_start'].to_numpy()[positions],
+                                         source['entity_end'].to_numpy()[positions])
+        elif 'entities' in source:
+            group = ENTITY_GROUPS[ENTITY_FACETS[facet]]
+            names = [name for row in source['entities'].iloc[positions]
+                     for name in set((row or {}).get(group) or [])]
+            counts = pd.Series(names, dtype=object).value_counts()
+        result[facet] = _top(counts, limit)
+    return result
@@ -0,0 +1,124 @@
+import unicodedata
+from typing import List, Dict, Tuple, Set
+
+# Letters NFKD doesn't decompose
+_FOLD = str.maketrans({'ø': 'o', 'æ': 'ae', 'œ': 'oe', 'ß': 'ss', 'đ': 'd', 'ð': 'd',
+                       'ł': 'l', 'þ': 'th', 'ı': 'i'})
+
+def fold(word: str) -> str:
+    """Lowercase and strip diacritics, so 'Ødegaard' and 'odegaard' compare equal."""
+    decomposed = unicodedata.normalize('NFKD', word.lower().translate(_FOLD))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (adjacent transpositions count as one edit).
+
+    Returns max_distance + 1 as soon as the distance is known to exceed max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1 and
+                    a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+def max_distance_for(term: str, max_distance: int = 2) -> int:
+    """Edits allowed for a term: none up to 2 chars, one up to 4, then max_distance."""
+    if len(term) <= 2:
+        return 0
+    if len(term) <= 4:
+        return min(1, max_distance)
+    return max_distance
+
+class SymSpellIndex:
+    """
+    Symmetric-delete spelling index over a vocabulary.
+
+    Every word is stored under all strings reachable by deleting up to
+    max_distance characters from its (folded) prefix. A lookup generates the
+    same deletes for the query and verifies the few words found, so the
+    vocabulary is never scanned.
+    """
+
+    def __init__(self, max_distance: int = 2, prefix_length: int = 7):
+        """
+        Args:
+            max_distance: Largest edit distance supported
+            prefix_length: Characters of each word used for delete variants
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.counts: Dict[str, int] = {}
+        self._folded: Dict[str, Set[str]] = {}
+        self._deletes: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def _variants(self, word: str, max_distance: int) -> Set[str]:
+        """word and every string made by deleting up to max_distance characters."""
+        variants = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+            variants |= frontier
+        return variants
+
+    def add(self, word: str, count: int = 1):
+        """Add a vocabulary word, or raise its count."""
+        if word in self.counts:
+            self.counts[word] += count
+            return
+        self.counts[word] = count
+
+        folded = fold(word)
+        if folded in self._folded:
+            self._folded[folded].add(word)
+            return
+        self._folded[folded] = {word}
+        for variant in self._variants(folded[:self.prefix_length], self.max_distance):
+            self._deletes.setdefault(variant, set()).add(folded)
+
+    def lookup(self, term: str, max_distance: int = None) -> List[Tuple[str, int]]:
+        """
+        Vocabulary words within max_distance edits of term.
+
+        Returns:
+            (word, distance) pairs, closest and most frequent first
+        """
+        if max_distance is None:
+            max_distance = max_distance_for(term, self.max_distance)
+        max_distance = min(max_distance, self.max_distance)
+
+        query = fold(term)
+        prefix = query[:self.prefix_length]
+        matches = {}
+        for variant in self._variants(prefix, max_distance):
+            for folded in self._deletes.get(variant, ()):
+                if folded in matches:
+                    continue
+                distance = edit_distance(query, folded, max_distance)
+                if distance <= max_distance:
+                    matches[folded] = distance
+
+        results = [(word, distance) for folded, distance in matches.items()
+                   for word in self._folded[folded]]
+        results.sort(key=lambda item: (item[1], -self.counts[item[0]], item[0]))
+        return results
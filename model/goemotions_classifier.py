@@ -6,15 +6,6 @@ import numpy as np
 class GoEmotionsClassifier:
     """28-emotion classification using GoEmotions (Reddit-trained)."""
     
-    EMOTIONS = [
-        'admiration', 'amusement', 'anger', 'annoyance', 'approval', 
-        'caring', 'confusion', 'curiosity', 'desire', 'disappointment',
-        'disapproval', 'disgust', 'embarrassment', 'excitement', 'fear',
-        'gratitude', 'grief', 'joy', 'love', 'nervousness', 'optimism',
-        'pride', 'realization', 'relief', 'remorse', 'sadness', 
-        'surprise', 'neutral'
-    ]
-    
     def __init__(self, model_name: str = "SamLowe/roberta-base-go_emotions", threshold: float = 0.3):
         """
         Initialize GoEmotions classifier.
@@ -30,24 +21,30 @@ class GoEmotionsClassifier:
         self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
         self.model.to(self.device)
         self.model.eval()
+        
+        # Emotion names in the order of the model's output columns
+        id2label = self.model.config.id2label
+        self.EMOTIONS = [id2label[i] for i in range(len(id2label))]
     
-    def predict(self, texts: List[str], top_k: int = 3) -> List[Dict]:
+    def predict_scores(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
         """
-        Predict emotions for texts.
+        Probabilities of all emotions for texts.
         
         Args:
             texts: List of text strings
-            top_k: Number of top emotions to return
+            batch_size: Texts per forward pass
             
         Returns:
-            List of dicts with detected emotions and scores
+            (len(texts), len(EMOTIONS)) float32 array, columns in EMOTIONS order
         """
-        results = []
+        scores = np.zeros((len(texts), len(self.EMOTIONS)), dtype=np.float32)
         
-        for text in texts:
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            
             # Tokenize
             encoded = self.tokenizer(
-                text,
+                batch,
                 padding=True,
                 truncation=True,
                 max_length=512,
@@ -62,8 +59,34 @@ class GoEmotionsClassifier:
                 outputs = self.model(input_ids, attention_mask=attention_mask)
                 probs = torch.sigmoid(outputs.logits)  # Multi-label classification
             
-            probs_np = probs.cpu().numpy()[0]
+            scores[start:start + len(batch)] = probs.cpu().numpy()
+        
+        return scores
+    
+    def primary_emotions(self, scores: np.ndarray) -> List[str]:
+        """Top emotion per row, or 'neutral' when none reaches the threshold."""
+        if len(scores) == 0:
+            return []
+        top = scores.argmax(axis=1)
+        labels = np.asarray(self.EMOTIONS, dtype=object)[top]
+        labels[scores[np.arange(len(scores)), top] < self.threshold] = 'neutral'
+        return labels.tolist()
+    
+    def predict(self, texts: List[str], top_k: int = 3, batch_size: int = 32) -> List[Dict]:
+        """
+        Predict emotions for texts.
+        
+        Args:
+            texts: List of text strings
+            top_k: Number of top emotions to return
+            batch_size: Texts per forward pass
             
+        Returns:
+            List of dicts with detected emotions and scores
+        """
+        results = []
+        
+        for probs_np in self.predict_scores(texts, batch_size=batch_size):
             # Get emotions above threshold
             detected_emotions = []
             for idx, score in enumerate(probs_np):
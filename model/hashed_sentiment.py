@@ -0,0 +1,261 @@
+import json
+import os
+import time
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+# Byte lookup tables: ASCII lowercasing, and which bytes belong to words
+# (ASCII letters, digits, underscore and every byte of a multi-byte UTF-8 character)
+_LOWER = np.arange(256, dtype=np.uint8)
+_LOWER[65:91] += 32
+_WORD = np.zeros(256, dtype=bool)
+_WORD[48:58] = True
+_WORD[97:123] = True
+_WORD[95] = True
+_WORD[128:] = True
+
+_FNV_PRIME = np.uint64(1099511628211)
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """64-bit finalizer so nearby polynomial hashes spread over the feature space."""
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xff51afd7ed558ccd)
+    h ^= h >> np.uint64(33)
+    return h
+
+def hash_word_ngrams(texts: List[str], n_features: int, ngram_range: Tuple[int, int] = (1, 2)) -> sp.csr_matrix:
+    """
+    Hash word n-grams of a batch into a (len(texts), n_features) count matrix.
+
+    Works on the UTF-8 bytes of the whole batch at once with numpy, so no
+    per-token Python strings are created. Words are runs of 2+ word bytes,
+    matching sklearn's default token pattern for ASCII text.
+    """
+    n_docs = len(texts)
+    joined = "\x00".join(texts)
+    if joined.count("\x00") > n_docs - 1:
+        joined = "\x00".join(t.replace("\x00", " ") for t in texts)
+
+    buf = _LOWER[np.frombuffer(joined.encode('utf-8'), dtype=np.uint8)]
+    is_word = _WORD[buf]
+
+    # Word boundaries
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], is_word, [False])).view(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = ends - starts >= 2
+    starts, lengths = starts[keep], (ends - starts)[keep]
+    if len(starts) == 0:
+        return sp.csr_matrix((n_docs, n_features), dtype=np.float32)
+
+    # Polynomial hash of every word: sum(byte * P^offset) over the word's bytes
+    offsets = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    pos = np.arange(int(lengths.sum())) - np.repeat(offsets, lengths)
+    powers = np.ones(int(lengths.max()), dtype=np.uint64)
+    np.cumprod(np.full(len(powers) - 1, _FNV_PRIME, dtype=np.uint64), out=powers[1:])
+    byte_idx = pos + np.repeat(starts, lengths)
+    word_hash = np.add.reduceat(buf[byte_idx].astype(np.uint64) * powers[pos], offsets)
+    word_hash = _mix(word_hash + lengths.astype(np.uint64))
+
+    # Document of every word, from the separator positions
+    doc = np.searchsorted(np.flatnonzero(buf == 0), starts)
+
+    cols, rows = [], []
+    low, high = ngram_range
+    gram_hash = word_hash
+    for n in range(1, high + 1):
+        if n > 1:
+            # Extend (n-1)-grams by the next word, dropping those that cross documents
+            same_doc = doc[n - 1:] == doc[:len(doc) - n + 1]
+            gram_hash = _mix(gram_hash[:-1] * np.uint64(31) + word_hash[n - 1:] + np.uint64(n))
+            gram_hash = np.where(same_doc, gram_hash, np.uint64(0))
+        if n >= low:
+            valid = gram_hash != 0 if n > 1 else slice(None)
+            cols.append(gram_hash[valid] % np.uint64(n_features))
+            rows.append(doc[:len(gram_hash)][valid])
+
+    cols = np.concatenate(cols).astype(np.int32)
+    rows = np.concatenate(rows)
+    return sp.csr_matrix(
+        (np.ones(len(cols), dtype=np.float32), (rows, cols)),
+        shape=(n_docs, n_features)
+    )
+
+class HashedNgramSentimentAnalyzer:
+    """CPU-only sentiment from a linear model over hashed word/char n-grams."""
+
+    label_map = {0: 'negative', 1: 'neutral', 2: 'positive'}
+
+    def __init__(self, n_features: int = 2 ** 20,
+                 word_ngrams: Tuple[int, int] = (1, 2),
+                 char_ngrams: Optional[Tuple[int, int]] = None,
+                 alpha: float = 1e-5):
+        """
+        Initialize the engine.
+
+        Features are hashed into a fixed-size space, so there is no vocabulary
+        to build or store.
+
+        Args:
+            n_features: Size of the hashed feature space
+            word_ngrams: Word n-gram range
+            char_ngrams: Character n-gram range within word boundaries (None to disable,
+                slower but more robust to misspellings)
+            alpha: L2 regularization strength
+        """
+        self.n_features = n_features
+        self.word_ngrams = tuple(word_ngrams)
+        self.char_ngrams = tuple(char_ngrams) if char_ngrams else None
+        self.alpha = alpha
+
+        self.char_vectorizer = HashingVectorizer(
+            analyzer='char_wb',
+            n_features=n_features,
+            ngram_range=self.char_ngrams,
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32
+        ) if self.char_ngrams else None
+
+        # (n_labels, n_features) weights, transposed for X @ coef_T
+        self.coef_T = None
+        self.intercept = None
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        """Hash texts into L2-normalized sparse feature rows."""
+        X = hash_word_ngrams(texts, self.n_features, self.word_ngrams)
+        if self.char_vectorizer is not None:
+            X = X + self.char_vectorizer.transform(texts)
+
+        X = X.tocsr()
+        norms = np.sqrt(np.add.reduceat(np.append(X.data ** 2, 0), X.indptr[:-1]))
+        norms[np.diff(X.indptr) == 0] = 1.0
+        X.data /= np.repeat(norms, np.diff(X.indptr)).astype(np.float32)
+        return X
+
+    def fit(self, texts: List[str], labels: List, sample_weight: Optional[np.ndarray] = None,
+            epochs: int = 5, chunk_size: int = 100000) -> 'HashedNgramSentimentAnalyzer':
+        """
+        Train on labelled texts.
+
+        Args:
+            texts: Training texts
+            labels: Sentiment strings or label ids (0=negative, 1=neutral, 2=positive)
+            sample_weight: Optional per-example weights, e.g. model confidence
+            epochs: Passes over the data
+            chunk_size: Texts hashed and fed to partial_fit at a time
+        """
+        label_ids = {v: k for k, v in self.label_map.items()}
+        y = np.array([label_ids.get(label, label) for label in labels], dtype=np.int64)
+        classes = np.array(sorted(self.label_map))
+
+        clf = SGDClassifier(loss='log_loss', alpha=self.alpha, random_state=0)
+        chunks = [
+            (self.transform(texts[i:i+chunk_size]), y[i:i+chunk_size],
+             None if sample_weight is None else np.asarray(sample_weight)[i:i+chunk_size])
+            for i in range(0, len(texts), chunk_size)
+        ]
+        for _ in range(epochs):
+            for X, y_chunk, w_chunk in chunks:
+                clf.partial_fit(X, y_chunk, classes=classes, sample_weight=w_chunk)
+
+        self.coef_T = np.ascontiguousarray(clf.coef_.T, dtype=np.float32)
+        self.intercept = clf.intercept_.astype(np.float32)
+        return self
+
+    def fit_from_opinions(self, df, label_column: str = 'bert_sentiment',
+                          weight_column: Optional[str] = 'bert_confidence', **kwargs) -> 'HashedNgramSentimentAnalyzer':
+        """Train on labels the pipeline already produced for an analyzed opinions table."""
+        weights = df[weight_column].to_numpy() if weight_column else None
+        return self.fit(df['text'].tolist(), df[label_column].tolist(), sample_weight=weights, **kwargs)
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """Class probabilities for a batch, via one sparse matrix product."""
+        if self.coef_T is None:
+            raise ValueError("Model is not trained. Call fit() or load() first.")
+
+        logits = self.transform(texts) @ self.coef_T + self.intercept
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        return probs
+
+    def predict(self, texts: List[str], batch_size: int = 10000) -> List[Dict]:
+        """
+        Predict sentiment for list of texts.
+
+        Same contract as BertSentimentAnalyzer.predict.
+
+        Returns:
+            List of dicts with sentiment, confidence, and scores
+        """
+        results = []
+        for i in range(0, len(texts), batch_size):
+            probs = self.predict_proba(texts[i:i+batch_size])
+            predictions = probs.argmax(axis=1)
+
+            for p, pred in zip(probs.tolist(), predictions.tolist()):
+                results.append({
+                    'sentiment': self.label_map[pred],
+                    'confidence': p[pred],
+                    'scores': {
+                        'negative': p[0],
+                        'neutral': p[1],
+                        'positive': p[2]
+                    }
+                })
+
+        return results
+
+    def save(self, path: str):
+        """Save weights and hashing config to a single .npz file."""
+        config = {
+            'n_features': self.n_features,
+            'word_ngrams': self.word_ngrams,
+            'char_ngrams': self.char_ngrams,
+            'alpha': self.alpha
+        }
+        np.savez_compressed(path, coef_T=self.coef_T, intercept=self.intercept,
+                            config=np.array(json.dumps(config)))
+
+    @classmethod
+    def load(cls, path: str) -> 'HashedNgramSentimentAnalyzer':
+        """Load an engine saved with save()."""
+        data = np.load(path)
+        analyzer = cls(**json.loads(str(data['config'])))
+        analyzer.coef_T = data['coef_T']
+        analyzer.intercept = data['intercept']
+        return analyzer
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Train and benchmark the hashed n-gram sentiment engine")
+    parser.add_argument('--opinions', default='analyzed_opinions', help="Pipeline output (Parquet store directory or CSV) with text and bert_sentiment")
+    parser.add_argument('--output', default='hashed_sentiment.npz')
+    parser.add_argument('--benchmark-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    columns = ['text', 'bert_sentiment', 'bert_confidence']
+    if os.path.isdir(args.opinions):
+        from result_store import ParquetResultStore
+        df = ParquetResultStore(args.opinions).read(columns=columns).dropna()
+    else:
+        df = pd.read_csv(args.opinions, usecols=columns).dropna()
+    analyzer = HashedNgramSentimentAnalyzer().fit_from_opinions(df)
+    analyzer.save(args.output)
+    print(f"✓ Trained on {len(df)} comments, saved to {args.output}")
+
+    texts = df['text'].tolist()
+    texts = (texts * (args.benchmark_size // len(texts) + 1))[:args.benchmark_size]
+
+    start = time.perf_counter()
+    results = analyzer.predict(texts)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {len(texts)} comments in {elapsed:.2f}s ({len(texts) / elapsed:.0f} comments/s)")
@@ -0,0 +1,207 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Callable, Any, Tuple
+
+_STOP = object()
+
+class _Request:
+    """Texts from one caller and the future its results are delivered to."""
+
+    __slots__ = ('texts', 'future', 'results', 'taken', 'delivered', 'lock')
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future = Future()
+        self.results = [None] * len(texts)
+        # Texts handed to batches so far, and texts with results
+        self.taken = 0
+        self.delivered = 0
+        self.lock = threading.Lock()
+
+    def take(self, n: int) -> Tuple[int, int]:
+        """Next slice of at most n texts, as (start, end)."""
+        start = self.taken
+        self.taken = min(start + n, len(self.texts))
+        return start, self.taken
+
+    def remaining(self) -> int:
+        return len(self.texts) - self.taken
+
+    def deliver(self, start: int, results: List[Any]):
+        """Store a slice's results; resolves the future once every slice is in."""
+        with self.lock:
+            self.results[start:start + len(results)] = results
+            self.delivered += len(results)
+            complete = self.delivered == len(self.texts)
+        if complete and not self.future.done():
+            self.future.set_result(self.results)
+
+class MicroBatcher:
+    """Coalesces texts from concurrent callers into batches for one model."""
+
+    def __init__(self, name: str, predict_fn: Callable[[List[str]], List[Any]],
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0,
+                 num_workers: int = 1, max_queue: int = 10000):
+        """
+        Start worker threads for a model.
+
+        Args:
+            name: Model name, used for thread names and stats
+            predict_fn: Function mapping a list of texts to one result per text
+            max_batch_size: Texts per model call; larger requests are split into
+                slices that take turns with other callers' requests
+            max_wait_ms: How long a worker waits for more callers after the first one
+            num_workers: Worker threads calling predict_fn
+            max_queue: Pending requests before submit blocks (backpressure)
+        """
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        # Unbounded so workers can put partly batched requests back; submit
+        # blocks on the slots instead
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._texts = 0
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"{name}-batcher-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts and return a future resolving to their results."""
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result([])
+            return request.future
+        self._slots.acquire()
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, texts: List[str]) -> List[Any]:
+        """Blocking predict through the shared batches."""
+        return self.submit(texts).result()
+
+    async def apredict(self, texts: List[str]) -> List[Any]:
+        """Awaitable predict for use from the event loop."""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _take(self, request: _Request, room: int) -> Tuple[int, int]:
+        """Slice up to room texts off a request; the rest goes back to the end of the queue."""
+        start, end = request.take(room)
+        if request.remaining():
+            self._queue.put(request)
+        else:
+            self._slots.release()
+        return start, end
+
+    def _collect(self, first: _Request) -> List[Tuple[_Request, int, int]]:
+        """Gather request slices until the batch is full or the deadline passes."""
+        batch = [(first, *self._take(first, self.max_batch_size))]
+        size = batch[0][2] - batch[0][1]
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is _STOP:
+                # Handled once the slices queued before it are done
+                self._queue.put(_STOP)
+                break
+            start, end = self._take(request, self.max_batch_size - size)
+            batch.append((request, start, end))
+            size += end - start
+
+        return batch
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is _STOP:
+                # Pass the stop signal on; the rest of a split request may still be queued
+                self._queue.put(_STOP)
+                if self._queue.qsize() > 1:
+                    continue
+                break
+            if request.future.done():
+                # An earlier slice failed; drop the rest
+                self._take(request, request.remaining())
+                continue
+
+            batch = self._collect(request)
+            texts = [text for r, start, end in batch for text in r.texts[start:end]]
+
+            try:
+                results = self.predict_fn(texts)
+            except Exception as e:
+                for r, _, _ in batch:
+                    if not r.future.done():
+                        r.future.set_exception(e)
+            else:
+                offset = 0
+                for r, start, end in batch:
+                    r.deliver(start, results[offset:offset + end - start])
+                    offset += end - start
+
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += sum(1 for _, start, _ in batch if start == 0)
+                self._texts += len(texts)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'batches': self._batches,
+                'requests': self._requests,
+                'texts': self._texts,
+                'avg_batch_size': self._texts / self._batches if self._batches else 0.0,
+                'queued': self._queue.qsize()
+            }
+
+    def close(self):
+        """Stop workers after the queued requests are done."""
+        self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+
+class InferenceService:
+    """In-process inference with one request queue and micro-batcher per model."""
+
+    def __init__(self):
+        self.batchers: Dict[str, MicroBatcher] = {}
+
+    def register(self, name: str, predict_fn: Callable[[List[str]], List[Any]], **kwargs) -> MicroBatcher:
+        """Add a model; kwargs are passed to MicroBatcher."""
+        self.batchers[name] = MicroBatcher(name, predict_fn, **kwargs)
+        return self.batchers[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.batchers
+
+    def predict(self, name: str, texts: List[str]) -> List[Any]:
+        return self.batchers[name].predict(texts)
+
+    async def apredict(self, name: str, texts: List[str]) -> List[Any]:
+        return await self.batchers[name].apredict(texts)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: batcher.stats() for name, batcher in self.batchers.items()}
+
+    def close(self):
+        for batcher in self.batchers.values():
+            batcher.close()
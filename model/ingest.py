@@ -0,0 +1,152 @@
+import hashlib
+import json
+import zlib
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+class NDJSONDecoder:
+    """Incremental newline-delimited JSON parser, optionally gzip or zstd compressed."""
+
+    def __init__(self, content_encoding: Optional[str] = None):
+        """
+        Args:
+            content_encoding: None/identity, gzip or zstd
+
+        Raises:
+            ValueError: For unsupported encodings or when zstandard is not installed
+        """
+        encoding = (content_encoding or 'identity').strip().lower()
+        if encoding in ('identity', ''):
+            self._decompressor = None
+        elif encoding in ('gzip', 'x-gzip'):
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("zstd encoding requires the zstandard package")
+            self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            raise ValueError(f"Unsupported content encoding '{content_encoding}'")
+
+        self._buffer = b''
+        self.lines = 0
+        self.malformed = 0
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        """Decode the complete lines available so far."""
+        if self._decompressor is not None:
+            chunk = self._decompressor.decompress(chunk)
+
+        data = self._buffer + chunk
+        lines = data.split(b'\n')
+        self._buffer = lines.pop()
+        return self._parse(lines)
+
+    def flush(self) -> List[Dict]:
+        """Decode whatever is left after the last newline."""
+        if self._decompressor is not None and hasattr(self._decompressor, 'flush'):
+            self._buffer += self._decompressor.flush()
+        lines, self._buffer = [self._buffer], b''
+        return self._parse(lines)
+
+    def _parse(self, lines: List[bytes]) -> List[Dict]:
+        records = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            self.lines += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                self.malformed += 1
+                continue
+            if isinstance(record, dict):
+                records.append(record)
+            else:
+                self.malformed += 1
+        return records
+
+def comment_hash(post_id, author, created, text) -> str:
+    """Stable id for a comment that came without one, from its post, author, time and text."""
+    key = json.dumps([post_id, author, created, text], ensure_ascii=False, default=str)
+    return 'h_' + hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+def normalize_comment(record: Dict, post_id: Optional[str] = None) -> Dict:
+    """
+    Accept scraper-style comments ('text', 'comment_id') alongside Reddit-style ones.
+
+    Comments without any id get a comment_hash, so they neither collapse
+    into one row nor duplicate on re-ingest.
+    """
+    comment = dict(record)
+    if 'body' not in comment:
+        comment['body'] = comment.get('text') or ''
+    if comment.get('id') is None:
+        comment['id'] = comment.get('comment_id')
+    comment.setdefault('author', '[unknown]')
+    if comment['id'] is None:
+        comment['id'] = comment_hash(post_id if post_id is not None else comment.get('post_id'),
+                                     comment['author'],
+                                     comment.get('created_utc', comment.get('timestamp')),
+                                     comment['body'])
+    return comment
+
+class ChunkBuilder:
+    """
+    Groups streamed post and comment records into fixed-size chunks of posts.
+
+    Post records (with a 'comments' list) are kept as they are. Standalone comment
+    records are attached to a post built from their post_id/subreddit fields.
+    """
+
+    def __init__(self, chunk_size: int = 500):
+        self.chunk_size = chunk_size
+        self._posts = OrderedDict()
+        self._comments = 0
+        self.records = 0
+
+    def add(self, record: Dict) -> Optional[List[Dict]]:
+        """Add a record; returns a full chunk of posts once chunk_size comments are buffered."""
+        self.records += 1
+
+        if isinstance(record.get('comments'), list):
+            post = dict(record)
+            post['comments'] = [normalize_comment(c, post.get('post_id')) for c in record['comments']]
+            self._posts[('post', len(self._posts))] = post
+            self._comments += len(post['comments'])
+        else:
+            comment = normalize_comment(record)
+            key = (comment.get('post_id') or '', comment.get('subreddit') or '')
+            post = self._posts.get(key)
+            if post is None:
+                post = self._posts[key] = {
+                    'post_id': key[0],
+                    'subreddit': key[1],
+                    'title': comment.get('post_title', ''),
+                    'created_utc': comment.get('post_time', comment.get('created_utc', 0)),
+                    'comments': []
+                }
+            post['comments'].append(comment)
+            self._comments += 1
+
+        if self._comments >= self.chunk_size:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[List[Dict]]:
+        """Return the buffered posts, if any."""
+        if not self._posts:
+            return None
+        posts = list(self._posts.values())
+        self._posts = OrderedDict()
+        self._comments = 0
+        return posts
+
+def posts_from_records(records: List[Dict]) -> List[Dict]:
+    """Group a list of post or standalone comment records (e.g. football_opinions.json) into posts."""
+    builder = ChunkBuilder(chunk_size=float('inf'))
+    for record in records:
+        builder.add(record)
+    return builder.flush() or []
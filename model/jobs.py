@@ -0,0 +1,168 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Callable, Optional, Any
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested."""
+
+class JobQueueFull(Exception):
+    """Raised when the job queue is at capacity."""
+
+class Job:
+    """Status, per-stage progress and result of one background job."""
+
+    def __init__(self, stages: Optional[List[str]] = None):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.future = None
+        self.stages = OrderedDict(
+            (stage, {'status': 'pending', 'done': 0, 'total': 0}) for stage in (stages or [])
+        )
+
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, stage: str, done: int, total: int):
+        """
+        Progress callback for the work function.
+
+        Also the cancellation point: raises JobCancelled once cancel was requested.
+        """
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+        with self._lock:
+            # Earlier stages are complete once a later one reports
+            for name, info in self.stages.items():
+                if name == stage:
+                    break
+                if info['status'] != 'done':
+                    info['status'] = 'done'
+            self.stages[stage] = {
+                'status': 'done' if total and done >= total else 'running',
+                'done': done,
+                'total': total
+            }
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'status': self.status,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'stages': {name: dict(info) for name, info in self.stages.items()},
+                'error': self.error
+            }
+        if include_result:
+            data['result'] = self.result
+        return data
+
+class JobManager:
+    """Bounded executor for long-running work, with job lookup and cancellation."""
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 16, max_finished: int = 100):
+        """
+        Args:
+            max_workers: Jobs running at the same time
+            max_pending: Jobs allowed to wait for a worker before submit is refused
+            max_finished: Finished jobs kept for lookup
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.jobs: Dict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if job.status in ('queued', 'running'))
+
+    def submit(self, fn: Callable[..., Any], *args, stages: Optional[List[str]] = None) -> Job:
+        """
+        Queue fn(job, *args) and return its job immediately.
+
+        Raises:
+            JobQueueFull: When max_workers + max_pending jobs are already active
+        """
+        limit = self.max_workers + self.max_pending
+        job = Job(stages)
+        with self._lock:
+            active = sum(1 for j in self.jobs.values() if j.status in ('queued', 'running'))
+            if active >= limit:
+                raise JobQueueFull(f"Too many active jobs (limit {limit})")
+            self.jobs[job.id] = job
+            self._prune()
+        job.future = self.executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], args):
+        if job.cancel_requested:
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+            return
+
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args)
+            job.status = 'completed'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond max_finished."""
+        finished = [job_id for job_id, job in self.jobs.items()
+                    if job.status in ('completed', 'failed', 'cancelled')]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Request cancellation.
+
+        Queued jobs are cancelled right away; running jobs stop at their next
+        progress report. Returns False for unknown or finished jobs.
+        """
+        job = self.get(job_id)
+        if job is None or job.status not in ('queued', 'running'):
+            return False
+
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+        return True
+
+    def shutdown(self):
+        for job in self.list():
+            job._cancel.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
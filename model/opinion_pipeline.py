@@ -1,25 +1,51 @@
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterable, Union, Tuple, Optional
 import spacy
-from bertopic import BERTopic
 from sentence_transformers import SentenceTransformer
 from data_processor import DataProcessor
 from bert_sentiment import BertSentimentAnalyzer
 from vader_sentiment import VADERAnalyzer
 from goemotions_classifier import GoEmotionsClassifier
+from topic_manager import TopicModelManager
+from embedding_store import EmbeddingStore
+from scoring import calculate_opinion_score
+from inference_server import InferenceService
+from search_backend import SearchBackend, COMPARISONS, parse_emotion_filters
+from text_index import tokenize
+from query_expansion import default_expander
+from query_parser import parse_query, evaluate, query_terms
 
 class OpinionSearchPipeline:
     """Complete pipeline for processing Reddit comments into searchable opinions."""
     
-    def __init__(self, use_gpu: bool = True):
-        """Initialize all components."""
+    def __init__(self, use_gpu: bool = True, topic_model_dir: str = "topic_model",
+                 embedding_dir: str = "embeddings", sentiment_model: str = "bert-base-uncased",
+                 sentiment_engine: str = "bert"):
+        """
+        Initialize all components.
+        
+        Args:
+            use_gpu: Run transformer models on GPU when available
+            topic_model_dir: Where the fitted topic model is persisted
+            embedding_dir: Where sentence embeddings are stored
+            sentiment_model: Model name or path for sentiment, e.g. a distilled student
+            sentiment_engine: "bert" for a transformer, "hashed" for a saved
+                HashedNgramSentimentAnalyzer (.npz path in sentiment_model)
+        """
         print("Initializing Opinion Search Pipeline...")
         
         # Data processing
         self.data_processor = DataProcessor()
         
         # Sentiment models
-        self.bert_analyzer = BertSentimentAnalyzer(use_gpu=use_gpu)
+        if sentiment_engine == "hashed":
+            from hashed_sentiment import HashedNgramSentimentAnalyzer
+            self.bert_analyzer = HashedNgramSentimentAnalyzer.load(sentiment_model)
+        elif sentiment_engine == "bert":
+            self.bert_analyzer = BertSentimentAnalyzer(model_name=sentiment_model, use_gpu=use_gpu)
+        else:
+            raise ValueError(f"Unknown sentiment engine '{sentiment_engine}'")
         self.vader_analyzer = VADERAnalyzer()
         self.emotion_classifier = GoEmotionsClassifier()
         
@@ -28,10 +54,55 @@ class OpinionSearchPipeline:
         
         # Topic modeling
         self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.topic_model = None
+        
+        # Shared sentence embeddings, encoded once per comment
+        self.embedding_store = EmbeddingStore(
+            embedding_dir,
+            dim=self.sentence_model.get_sentence_embedding_dimension(),
+            encoder=lambda texts: self.sentence_model.encode(texts, show_progress_bar=False)
+        )
+        
+        self.topic_manager = TopicModelManager(
+            self.sentence_model,
+            model_dir=topic_model_dir,
+            embedding_store=self.embedding_store
+        )
+        self.topic_manager.load()
+        
+        # Optional shared micro-batching for model calls
+        self.inference = None
         
         print("Pipeline initialized successfully!")
     
+    def start_inference_service(self, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        """
+        Route transformer calls through per-model micro-batching queues.
+        
+        Texts from concurrent process_batch calls are coalesced into shared
+        batches on dedicated worker threads.
+        """
+        service = InferenceService()
+        service.register(
+            'bert',
+            lambda texts: self.bert_analyzer.predict(texts, batch_size=max_batch_size),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms
+        )
+        service.register(
+            'emotion',
+            lambda texts: self.emotion_classifier.predict_scores(texts, batch_size=max_batch_size),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms
+        )
+        self.inference = service
+        return service
+    
+    def _predict(self, model: str, texts: List[str], predict_fn) -> List[Dict]:
+        """Run a model through the inference service if one is running."""
+        if self.inference is not None and model in self.inference:
+            return self.inference.predict(model, texts)
+        return predict_fn(texts)
+    
     def extract_entities(self, texts: List[str]) -> List[Dict]:
         """Extract player names, teams, and events using NER."""
         results = []
@@ -64,40 +135,55 @@ class OpinionSearchPipeline:
         
         return results
     
-    def analyze_topics(self, texts: List[str], n_topics: int = 10) -> Dict:
-        """Discover topics in discussions using BERTopic."""
-        # Create embeddings
-        embeddings = self.sentence_model.encode(texts, show_progress_bar=True)
-        
-        # Fit topic model
-        self.topic_model = BERTopic(
-            embedding_model=self.sentence_model,
-            min_topic_size=5,
-            nr_topics=n_topics
-        )
+    @property
+    def topic_model(self):
+        """Currently served BERTopic model (None until the first fit)."""
+        return self.topic_manager.model
+    
+    def analyze_topics(self, texts: List[str], n_topics: int = 10,
+                       comment_ids: List[str] = None) -> Dict:
+        """Assign topics with the persisted BERTopic model, fitting it on first use."""
+        # Create embeddings, reusing stored vectors for comments seen before
+        if comment_ids is not None:
+            embeddings = self.embedding_store.encode(comment_ids, texts)
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+        else:
+            embeddings = self.sentence_model.encode(texts, show_progress_bar=True)
         
-        topics, probs = self.topic_model.fit_transform(texts, embeddings)
+        # Transform with the saved model; refits run in the background
+        self.topic_manager.n_topics = n_topics
+        return self.topic_manager.assign(texts, embeddings, comment_ids=comment_ids)
+    
+    STAGES = ['load', 'bert', 'vader', 'emotion', 'entities', 'topics']
+    
+    def process_batch(self, source: Union[str, Dict, Iterable[Any]],
+                      progress: Callable[[str, int, int], None] = None) -> pd.DataFrame:
+        """
+        Process a batch of Reddit posts through the complete pipeline.
         
-        # Get topic info
-        topic_info = self.topic_model.get_topic_info()
+        Args:
+            source: Path to an input JSON file, a {'posts': [...]} dict, or an
+                iterable of posts (dicts or request models) processed in memory
+            progress: Optional callback(stage, done, total) called before and after
+                each stage in STAGES; it may raise to abort the batch
+        """
+        report = progress or (lambda stage, done, total: None)
         
-        return {
-            'topics': topics,
-            'probabilities': probs,
-            'topic_info': topic_info
-        }
-    
-    def process_batch(self, json_path: str) -> pd.DataFrame:
-        """Process a batch of Reddit posts through the complete pipeline."""
         print(f"\n{'='*60}")
         print("Processing Reddit data through opinion pipeline")
         print(f"{'='*60}")
         
         # Step 1: Load and preprocess data
         print("\n[1/6] Loading and preprocessing data...")
-        raw_data = self.data_processor.load_json(json_path)
-        df = self.data_processor.process_posts(raw_data)
+        report('load', 0, 1)
+        if isinstance(source, str):
+            source = self.data_processor.load_json(source)
+        if isinstance(source, dict):
+            df = self.data_processor.process_posts(source)
+        else:
+            df = self.data_processor.process_records(source)
         print(f"   ✓ Processed {len(df)} comments")
+        report('load', 1, 1)
         
         if df.empty:
             print("   ✗ No valid comments found!")
@@ -107,41 +193,62 @@ class OpinionSearchPipeline:
         
         # Step 2: BERT sentiment analysis
         print("\n[2/6] Running BERT sentiment analysis...")
-        bert_results = self.bert_analyzer.predict(texts, batch_size=32)
+        report('bert', 0, len(texts))
+        bert_results = self._predict(
+            'bert', texts, lambda t: self.bert_analyzer.predict(t, batch_size=32)
+        )
         df['bert_sentiment'] = [r['sentiment'] for r in bert_results]
         df['bert_confidence'] = [r['confidence'] for r in bert_results]
         df['bert_scores'] = [r['scores'] for r in bert_results]
         print(f"   ✓ Analyzed {len(bert_results)} comments")
+        report('bert', len(texts), len(texts))
         
         # Step 3: VADER sentiment analysis
         print("\n[3/6] Running VADER sentiment analysis...")
+        report('vader', 0, len(texts))
         vader_results = self.vader_analyzer.analyze(texts)
         df['vader_sentiment'] = [r['sentiment'] for r in vader_results]
         df['vader_compound'] = [r['compound'] for r in vader_results]
         df['opinion_intensity'] = [r['intensity'] for r in vader_results]
         print(f"   ✓ Analyzed {len(vader_results)} comments")
+        report('vader', len(texts), len(texts))
         
         # Step 4: Emotion classification
         print("\n[4/6] Running emotion classification...")
-        emotion_results = self.emotion_classifier.predict(texts, top_k=3)
-        df['primary_emotion'] = [r['primary_emotion'] for r in emotion_results]
-        df['emotions'] = [r['emotions'] for r in emotion_results]
-        print(f"   ✓ Classified {len(emotion_results)} comments")
+        report('emotion', 0, len(texts))
+        emotion_scores = np.asarray(self._predict(
+            'emotion', texts, lambda t: self.emotion_classifier.predict_scores(t, batch_size=32)
+        ), dtype=np.float32)
+        df['primary_emotion'] = self.emotion_classifier.primary_emotions(emotion_scores)
+        # All 28 probabilities as one float16 block of emotion_<label> columns
+        df = pd.concat([df, pd.DataFrame(
+            emotion_scores.astype(np.float16),
+            columns=[f'emotion_{label}' for label in self.emotion_classifier.EMOTIONS],
+            index=df.index
+        )], axis=1)
+        print(f"   ✓ Classified {len(emotion_scores)} comments")
+        report('emotion', len(texts), len(texts))
         
         # Step 5: Entity extraction
         print("\n[5/6] Extracting named entities...")
+        report('entities', 0, len(texts))
         entity_results = self.extract_entities(texts)
         df['entities'] = entity_results
         df['mentioned_players'] = [e['persons'] for e in entity_results]
         df['mentioned_teams'] = [e['orgs'] for e in entity_results]
         print(f"   ✓ Extracted entities from {len(entity_results)} comments")
+        report('entities', len(texts), len(texts))
         
         # Step 6: Topic modeling
         print("\n[6/6] Discovering topics...")
-        topic_results = self.analyze_topics(texts, n_topics=10)
+        report('topics', 0, len(texts))
+        topic_results = self.analyze_topics(
+            texts, n_topics=10, comment_ids=df['comment_id'].tolist()
+        )
         df['topic'] = topic_results['topics']
         df['topic_probability'] = topic_results['probabilities']
         print(f"   ✓ Identified {len(topic_results['topic_info'])} topics")
+        report('topics', len(texts), len(texts))
         
         # Create composite opinion score
         df['opinion_score'] = self._calculate_opinion_score(df)
@@ -152,70 +259,212 @@ class OpinionSearchPipeline:
         
         return df
     
-    def _calculate_opinion_score(self, df: pd.DataFrame) -> List[float]:
+    def _calculate_opinion_score(self, df: pd.DataFrame, profile: str = 'default') -> np.ndarray:
         """Calculate composite opinion score combining multiple signals."""
-        scores = []
-        
-        for _, row in df.iterrows():
-            # Base sentiment score (-1 to 1)
-            base_score = row['vader_compound']
-            
-            # Confidence weight from BERT
-            confidence_weight = row['bert_confidence']
-            
-            # Engagement weight (normalized score)
-            engagement = min(row['engagement_score'] / 100, 1.0)
-            
-            # Intensity multiplier
-            intensity = row['opinion_intensity']
-            
-            # Combined score
-            opinion_score = (
-                base_score * 0.5 +  # Sentiment direction
-                confidence_weight * 0.2 +  # Model confidence
-                engagement * 0.2 +  # Community validation
-                intensity * 0.1  # Opinion strength
-            )
-            
-            scores.append(opinion_score)
-        
-        return scores
+        return calculate_opinion_score(df, profile)
     
     def get_topic_summary(self) -> pd.DataFrame:
         """Get summary of discovered topics."""
-        if self.topic_model is None:
-            return pd.DataFrame()
-        
-        return self.topic_model.get_topic_info()
+        return self.topic_manager.get_topic_info()
     
-    def search_opinions(self, df: pd.DataFrame, 
-                        query: str = None,
-                        sentiment: str = None,
-                        emotion: str = None,
-                        min_intensity: float = 0.0) -> pd.DataFrame:
-        """Search and filter opinions based on criteria."""
-        filtered = df.copy()
+    def rank_opinions(self, df: Union[pd.DataFrame, SearchBackend],
+                      query: str = None,
+                      sentiment: str = None,
+                      emotion: str = None,
+                      min_intensity: float = 0.0,
+                      scoring_profile: str = None,
+                      emotion_scores: Dict[str, str] = None,
+                      fuzzy: bool = False,
+                      expand: bool = False,
+                      query_syntax: bool = False,
+                      text_index=None,
+                      query_expander=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row ids and scores of all matching opinions in rank order.
+        
+        Ranked by score descending, then row id, so the order is stable across
+        calls. Takes the same filters as search_opinions.
+        """
+        filters = parse_emotion_filters(emotion_scores)
+        syntax_search = bool(query_syntax and query and query.strip())
+        parsed = parse_query(query) if syntax_search else None
+        
+        if isinstance(df, SearchBackend):
+            if query_syntax:
+                raise ValueError("Query syntax is only supported on the in-memory corpus")
+            return df.rank(scoring_profile=scoring_profile,
+                           **self.backend_filters(query, sentiment, emotion, min_intensity, emotion_scores,
+                                                  fuzzy, expand, text_index, query_expander))
+        
+        term_groups = None if query_syntax else self._term_groups(query, fuzzy, expand,
+                                                                  text_index, query_expander)
+        
+        mask = np.ones(len(df), dtype=bool)
         
         # Text search
-        if query:
-            filtered = filtered[
-                filtered['text'].str.contains(query, case=False, na=False)
-            ]
+        if syntax_search or term_groups:
+            if text_index is None:
+                raise ValueError("Fuzzy, expanded and query syntax searches need a text index")
+            if syntax_search:
+                # A query of only operators or stop words parses to None and matches nothing
+                expander = (query_expander or default_expander()) if expand else None
+                text_rows = evaluate(parsed, text_index, expander, fuzzy)
+            else:
+                text_rows = text_index.match(term_groups)
+            positions = df.index.get_indexer(text_rows)
+            matched = np.zeros(len(df), dtype=bool)
+            matched[positions[positions >= 0]] = True
+            mask &= matched
+        elif query and not query_syntax:
+            mask &= df['text'].str.contains(query, case=False, na=False).to_numpy()
         
         # Sentiment filter
         if sentiment:
-            filtered = filtered[filtered['bert_sentiment'] == sentiment]
+            mask &= (df['bert_sentiment'] == sentiment).to_numpy()
         
         # Emotion filter
         if emotion:
-            filtered = filtered[filtered['primary_emotion'] == emotion]
+            mask &= (df['primary_emotion'] == emotion).to_numpy()
         
         # Intensity filter
         if min_intensity > 0:
-            filtered = filtered[filtered['opinion_intensity'] >= min_intensity]
+            mask &= (df['opinion_intensity'] >= min_intensity).to_numpy()
+        
+        # Emotion score filters
+        for column, op, value in filters:
+            if column not in df:
+                raise ValueError(f"No scores stored for '{column[len('emotion_'):]}'")
+            mask &= COMPARISONS[op](df[column].to_numpy(), value)
+        
+        row_ids = df.index.to_numpy()[mask]
+        
+        # Rescore candidates with the requested profile
+        if scoring_profile and scoring_profile != 'default':
+            scores = self._calculate_opinion_score(df[mask], scoring_profile)
+        else:
+            scores = df['opinion_score'].to_numpy()[mask]
+        scores = np.asarray(scores, dtype=np.float64)
+        
+        order = np.lexsort((row_ids, -scores))
+        return row_ids[order], scores[order]
+    
+    def backend_filters(self, query: str = None, sentiment: str = None, emotion: str = None,
+                        min_intensity: float = 0.0, emotion_scores: Dict[str, str] = None,
+                        fuzzy: bool = False, expand: bool = False, text_index=None,
+                        query_expander=None) -> Dict:
+        """
+        A search's match conditions as SearchBackend keyword arguments, for
+        rank() and the value_counts/list_counts facet queries.
+        """
+        return {
+            'query': query,
+            'sentiment': sentiment,
+            'emotion': emotion,
+            'min_intensity': min_intensity or 0.0,
+            'emotion_scores': emotion_scores,
+            'term_groups': self._term_groups(query, fuzzy, expand, text_index, query_expander)
+        }
+    
+    def _term_groups(self, query: str, fuzzy: bool, expand: bool,
+                     text_index, query_expander) -> Optional[List[List[str]]]:
+        """
+        The query as groups of alternatives (all groups must match), or None
+        for a plain phrase search.
+        
+        expand adds slang and alias rewrites of each word or phrase, fuzzy adds
+        close spellings of the words the user typed.
+        """
+        if not query or not (fuzzy or expand):
+            return None
+        if expand:
+            groups = (query_expander or default_expander()).expand(query)
+        else:
+            groups = [[term] for term in tokenize(query)]
+        if fuzzy:
+            if text_index is None:
+                raise ValueError("Fuzzy search needs a text index")
+            groups = [group[:1] + text_index.fuzzy_terms(group[0]) + group[1:]
+                      if ' ' not in group[0] else group
+                      for group in groups]
+            groups = [list(dict.fromkeys(group)) for group in groups]
+        return groups or None
+    
+    def highlight_terms(self, query: str, fuzzy: bool = False, expand: bool = False,
+                        query_syntax: bool = False, text_index=None,
+                        query_expander=None) -> List[str]:
+        """Words of the query worth highlighting in results, including expansions."""
+        if not query:
+            return []
+        if query_syntax:
+            words = query_terms(parse_query(query))
+            groups = [[word] for word in words]
+            if expand:
+                synonyms = (query_expander or default_expander()).synonyms
+                groups = [group + synonyms.get((group[0],), []) for group in groups]
+            if fuzzy and text_index is not None:
+                groups = [group + text_index.fuzzy_terms(group[0]) for group in groups]
+        else:
+            groups = (self._term_groups(query, fuzzy and text_index is not None, expand,
+                                        text_index, query_expander)
+                      or [[term] for term in tokenize(query)])
+        return list(dict.fromkeys(word for group in groups for term in group for word in term.split()))
+    
+    def search_opinions(self, df: Union[pd.DataFrame, SearchBackend], 
+                        query: str = None,
+                        sentiment: str = None,
+                        emotion: str = None,
+                        min_intensity: float = 0.0,
+                        scoring_profile: str = None,
+                        limit: int = None,
+                        emotion_scores: Dict[str, str] = None,
+                        fuzzy: bool = False,
+                        expand: bool = False,
+                        query_syntax: bool = False,
+                        text_index=None,
+                        query_expander=None) -> pd.DataFrame:
+        """
+        Search and filter opinions based on criteria.
+        
+        Filters are combined into a single mask, so only the matching rows are
+        copied. A scoring_profile other than the default rescores just those rows.
+        df can also be a SearchBackend (e.g. SQLiteBackend), which runs the
+        search on disk.
+        
+        emotion_scores filters on any emotion's probability, e.g.
+        {"anger": ">0.6", "joy": "<0.1"}.
+        
+        fuzzy matches each query word, in any order, against its close
+        spellings (e.g. "odegard" finds "Ødegaard"). It needs text_index, the
+        corpus InvertedIndex from text_index.py, whose SymSpell dictionary
+        supplies the spellings without scanning the vocabulary.
+        
+        expand rewrites the query through the microtext slang dictionary and
+        team/player aliases (query_expansion.py), so "for real terrible" also
+        finds "fr terrible" and "man united" finds "MUFC".
+        
+        query_syntax parses query as a boolean query (query_parser.py):
+        +haaland -injury, "penalty decision", "haaland goal"~5, OR, NOT,
+        parentheses and team:/player:/author:/subreddit: fields, evaluated on
+        the positional text_index.
+        """
+        if isinstance(df, SearchBackend) and not query_syntax:
+            term_groups = self._term_groups(query, fuzzy, expand, text_index, query_expander)
+            return df.search(query=query, sentiment=sentiment, emotion=emotion,
+                             min_intensity=min_intensity, scoring_profile=scoring_profile,
+                             limit=limit, emotion_scores=emotion_scores, term_groups=term_groups)
+        
+        row_ids, scores = self.rank_opinions(
+            df, query=query, sentiment=sentiment, emotion=emotion, min_intensity=min_intensity,
+            scoring_profile=scoring_profile, emotion_scores=emotion_scores,
+            fuzzy=fuzzy, expand=expand, query_syntax=query_syntax,
+            text_index=text_index, query_expander=query_expander
+        )
+        if limit is not None:
+            row_ids, scores = row_ids[:limit], scores[:limit]
         
-        # Sort by opinion score
-        filtered = filtered.sort_values('opinion_score', ascending=False)
+        filtered = df.loc[row_ids]
+        if scoring_profile and scoring_profile != 'default':
+            filtered = filtered.assign(opinion_score=scores)
         
         return filtered
 
@@ -229,8 +478,9 @@ if __name__ == "__main__":
     df = pipeline.process_batch('reddit_posts.json')
     
     # Save results
-    df.to_csv('analyzed_opinions.csv', index=False)
-    print(f"\n✓ Saved results to analyzed_opinions.csv")
+    from result_store import ParquetResultStore
+    ParquetResultStore('analyzed_opinions').write(df)
+    print(f"\n✓ Saved results to analyzed_opinions/ (Parquet, by subreddit and match date)")
     
     # Get topic summary
     topics = pipeline.get_topic_summary()
@@ -0,0 +1,145 @@
+import importlib.util
+import os
+import re
+from functools import lru_cache
+from typing import List, Dict, Iterable, Tuple
+from text_index import tokenize
+
+MICROTEXT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              '..', 'classification', 'microtext.py')
+
+# Names that refer to the same team or player; any one expands to all of them
+ALIASES = [
+    # Teams
+    ['manchester united', 'man united', 'man utd', 'mufc'],
+    ['manchester city', 'man city', 'mcfc'],
+    ['arsenal', 'gunners', 'gooners'],
+    ['tottenham', 'tottenham hotspur', 'spurs', 'thfc'],
+    ['liverpool', 'lfc'],
+    ['chelsea', 'cfc'],
+    ['newcastle', 'newcastle united', 'nufc', 'toon'],
+    ['west ham', 'west ham united', 'whufc', 'hammers'],
+    ['aston villa', 'avfc'],
+    ['everton', 'toffees'],
+    ['real madrid', 'rmcf', 'los blancos'],
+    ['barcelona', 'barca', 'barça'],
+    ['bayern munich', 'bayern', 'fcbayern'],
+    ['paris saint germain', 'psg'],
+    ['juventus', 'juve'],
+    ['inter milan', 'internazionale'],
+    ['borussia dortmund', 'dortmund', 'bvb'],
+    # Players
+    ['cristiano ronaldo', 'ronaldo', 'cr7'],
+    ['lionel messi', 'messi', 'leo messi'],
+    ['kylian mbappe', 'mbappe', 'mbappé'],
+    ['erling haaland', 'haaland'],
+    ['martin odegaard', 'odegaard', 'ødegaard'],
+    ['kevin de bruyne', 'de bruyne', 'kdb'],
+    ['mohamed salah', 'mo salah', 'salah'],
+    ['virgil van dijk', 'van dijk', 'vvd'],
+    ['trent alexander arnold', 'alexander arnold', 'taa'],
+    ['vinicius junior', 'vinicius', 'vini jr'],
+    ['bukayo saka', 'saka'],
+    ['bruno fernandes', 'bruno'],
+]
+
+Phrase = Tuple[str, ...]
+
+# Shortest word or phrase that is expanded or added as an alternative
+MIN_PHRASE_LENGTH = 2
+
+def _phrases(value: str) -> List[Phrase]:
+    """Token tuples for a microtext value: underscores are spaces, ' / ' separates alternatives."""
+    phrases = []
+    for alternative in value.split('_/_'):
+        # Drop implied words, e.g. "(are)_you_up"
+        tokens = tuple(tokenize(re.sub(r'\([^)]*\)', ' ', alternative).replace('_', ' ')))
+        if tokens:
+            phrases.append(tokens)
+    return phrases
+
+def load_microtext(path: str = MICROTEXT_PATH) -> Dict[str, List[str]]:
+    """The microtext dict ({"fr": ["for_real", "neutral"], ...}) from classification/microtext.py."""
+    spec = importlib.util.spec_from_file_location('microtext', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.microtext
+
+class QueryExpander:
+    """
+    Rewrites a query into groups of interchangeable words and phrases.
+
+    Slang from the microtext dictionary expands both ways ("fr" <-> "for
+    real"), as do team and player aliases ("man united" <-> "MUFC"). Both are
+    compiled into one dict keyed by token tuples; a query is matched greedily,
+    longest phrase first.
+    """
+
+    def __init__(self, microtext: Dict[str, List[str]] = None,
+                 aliases: Iterable[Iterable[str]] = ALIASES):
+        """
+        Args:
+            microtext: Slang dictionary; loaded from classification/microtext.py
+                when None (and skipped if that file isn't there)
+            aliases: Groups of equivalent names
+        """
+        if microtext is None:
+            microtext = load_microtext() if os.path.exists(MICROTEXT_PATH) else {}
+
+        synonyms: Dict[Phrase, set] = {}
+
+        def link(phrases: List[Phrase]):
+            for phrase in phrases:
+                synonyms.setdefault(phrase, set()).update(phrases)
+
+        for slang, (meaning, *_) in microtext.items():
+            # "ya" -> "yes / you": each reading is a synonym of the slang, not of each other
+            for short in _phrases(slang):
+                for long in _phrases(meaning):
+                    link([short, long])
+        for names in aliases:
+            link([tuple(tokenize(name)) for name in names if tokenize(name)])
+
+        # Phrase -> its alternatives as space-separated strings. Single letters
+        # ("b" for "bad") are too ambiguous on either side, so they are neither
+        # expanded nor added
+        self.synonyms: Dict[Phrase, List[str]] = {}
+        for phrase, alternatives in synonyms.items():
+            if len(' '.join(phrase)) < MIN_PHRASE_LENGTH:
+                continue
+            alternatives = sorted(' '.join(p) for p in alternatives
+                                  if p != phrase and len(' '.join(p)) >= MIN_PHRASE_LENGTH)
+            if alternatives:
+                self.synonyms[phrase] = alternatives
+        self.max_phrase_length = max((len(p) for p in self.synonyms), default=1)
+
+    def __len__(self) -> int:
+        return len(self.synonyms)
+
+    def expand(self, query: str) -> List[List[str]]:
+        """
+        One group per query word or known phrase, the original first.
+
+        Alternatives are space-separated phrases, e.g.
+        "for real terrible" -> [["for real", "fr"], ["terrible"]].
+        """
+        tokens = tokenize(query)
+        groups = []
+        i = 0
+        while i < len(tokens):
+            for n in range(min(self.max_phrase_length, len(tokens) - i), 0, -1):
+                phrase = tuple(tokens[i:i + n])
+                alternatives = self.synonyms.get(phrase)
+                if alternatives is not None:
+                    groups.append([' '.join(phrase)] + alternatives)
+                    i += n
+                    break
+            else:
+                groups.append([tokens[i]])
+                i += 1
+        return groups
+
+@lru_cache(maxsize=1)
+def default_expander() -> QueryExpander:
+    """Shared expander over the bundled microtext dictionary and ALIASES."""
+    return QueryExpander()
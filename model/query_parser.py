@@ -0,0 +1,220 @@
+import re
+from typing import List, Tuple, Optional
+import numpy as np
+from text_index import tokenize, field_term, intersect, difference, union, FIELDS
+
+# Parsed queries are nested tuples:
+#   ('term', word)
+#   ('phrase', words, slop)
+#   ('field', field, value)
+#   ('and', [nodes]), ('or', [nodes]), ('not', node)
+Node = Tuple
+
+# Only known field names are fields; "re:haaland" or "10:30" are plain words
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<lparen>\()
+      | (?P<rparen>\))
+      | (?P<field>(?i:''' + '|'.join(sorted(FIELDS)) + r''')):(?=["\w])
+      | "(?P<phrase>[^"]*)"(?:~(?P<slop>\d+))?
+      | (?P<sign>[+-])(?=[^\s+-])
+      | (?P<word>[^\s()"]+)
+    )''', re.VERBOSE)
+
+OPERATORS = {'AND', 'OR', 'NOT'}
+
+def _lex(query: str) -> List[Tuple[str, object]]:
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = _TOKEN.match(query, pos)
+        if match is None or match.end() == pos:
+            raise ValueError(f"Unbalanced quote in query: {query}")
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == 'slop':
+            kind = 'phrase'
+        if kind == 'phrase':
+            slop = match.group('slop')
+            tokens.append(('phrase', (match.group('phrase'), int(slop) if slop else 0)))
+        elif kind == 'field':
+            tokens.append(('field', match.group('field').lower()))
+        elif kind == 'word' and match.group('word') in OPERATORS:
+            tokens.append(('op', match.group('word')))
+        else:
+            tokens.append((kind, match.group(kind)))
+    return tokens
+
+class _Parser:
+    """Recursive descent: OR binds loosest, then AND (explicit or implicit), then NOT/+/-."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self) -> Optional[Node]:
+        node = self.or_expr()
+        if self.pos < len(self.tokens):
+            raise ValueError("Unbalanced parenthesis in query")
+        return node
+
+    def or_expr(self) -> Optional[Node]:
+        nodes = [self.and_expr()]
+        while self.peek() == ('op', 'OR'):
+            self.take()
+            nodes.append(self.and_expr())
+        nodes = [n for n in nodes if n is not None]
+        if not nodes:
+            return None
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def and_expr(self) -> Optional[Node]:
+        nodes = []
+        while True:
+            kind, value = self.peek()
+            if kind is None or kind == 'rparen' or (kind, value) == ('op', 'OR'):
+                break
+            if (kind, value) == ('op', 'AND'):
+                self.take()
+                continue
+            node = self.unary()
+            if node is not None:
+                nodes.append(node)
+        if not nodes:
+            return None
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def unary(self) -> Optional[Node]:
+        kind, value = self.peek()
+        if (kind, value) in (('op', 'NOT'), ('sign', '-')):
+            self.take()
+            node = self.unary()
+            return ('not', node) if node is not None else None
+        if (kind, value) == ('sign', '+'):
+            self.take()
+            return self.unary()
+        return self.primary()
+
+    def primary(self) -> Optional[Node]:
+        kind, value = self.take()
+        if kind == 'lparen':
+            node = self.or_expr()
+            if self.take()[0] != 'rparen':
+                raise ValueError("Unbalanced parenthesis in query")
+            return node
+        if kind == 'rparen':
+            raise ValueError("Unbalanced parenthesis in query")
+        if kind == 'field':
+            value_kind, value_text = self.take()
+            if value_kind == 'phrase':
+                value_text = value_text[0]
+            elif value_kind not in ('word', 'op'):
+                raise ValueError(f"Missing value for field '{value}'")
+            return ('field', value, value_text) if tokenize(value_text) else None
+        if kind == 'phrase':
+            text, slop = value
+            words = tokenize(text)
+            if not words:
+                return None
+            return ('phrase', words, slop) if len(words) > 1 else ('term', words[0])
+        # A word such as "o'neil" can hold several tokens; they must be adjacent
+        words = tokenize(value)
+        if not words:
+            return None
+        return ('phrase', words, 0) if len(words) > 1 else ('term', words[0])
+
+def parse_query(query: str) -> Optional[Node]:
+    """
+    Parse the search query language.
+
+    Words are ANDed; OR and parentheses group alternatives; NOT or a leading
+    "-" excludes, "+" marks a required word. "..." is a phrase and "..."~k
+    matches its words within k positions of each other. team:, player:,
+    author: and subreddit: scope a word or quoted value to that field.
+
+    Returns:
+        Nested tuples (see Node), or None when the query has no searchable words
+
+    Raises:
+        ValueError: For unbalanced quotes or parentheses and fields without a value
+    """
+    return _Parser(_lex(query)).parse()
+
+def query_terms(node: Optional[Node]) -> List[str]:
+    """Words the query searches for in the text (not excluded ones), for highlighting."""
+    if node is None:
+        return []
+    kind = node[0]
+    if kind == 'term':
+        return [node[1]]
+    if kind == 'phrase':
+        return list(node[1])
+    if kind in ('and', 'or'):
+        return list(dict.fromkeys(t for child in node[1] for t in query_terms(child)))
+    return []
+
+def evaluate(node: Optional[Node], index, expander=None, fuzzy: bool = False) -> np.ndarray:
+    """
+    Ascending row ids matching a parsed query.
+
+    Args:
+        node: Result of parse_query; None (no searchable words) matches nothing
+        index: text_index.InvertedIndex
+        expander: QueryExpander whose slang and aliases are added to each
+            word and field value
+        fuzzy: Also match close spellings of each word
+    """
+    if node is None:
+        return union([])
+    kind = node[0]
+
+    if kind == 'term':
+        alternatives = [node[1]]
+        if expander is not None:
+            alternatives += expander.synonyms.get((node[1],), [])
+        if fuzzy:
+            alternatives += index.fuzzy_terms(node[1])
+        return index.rows_any(alternatives)
+
+    if kind == 'phrase':
+        _, words, slop = node
+        if expander is not None and not slop:
+            return index.rows_any([' '.join(words)] + expander.synonyms.get(tuple(words), []))
+        return index.phrase_rows(words, slop)
+
+    if kind == 'field':
+        _, field, value = node
+        keys = [field_term(field, value)]
+        if expander is not None:
+            keys += [field_term(field, alias) for alias in expander.synonyms.get(tuple(tokenize(value)), [])]
+        return union([index.rows(key) for key in dict.fromkeys(keys)])
+
+    if kind == 'or':
+        return union([evaluate(child, index, expander, fuzzy) for child in node[1]])
+
+    if kind == 'not':
+        return difference(index.all_rows(), evaluate(node[1], index, expander, fuzzy))
+
+    # AND: intersect the positive parts, smallest first, then drop excluded rows
+    positive = [c for c in node[1] if c[0] != 'not']
+    negative = [c[1] for c in node[1] if c[0] == 'not']
+    results = sorted((evaluate(c, index, expander, fuzzy) for c in positive), key=len)
+    rows = results[0] if results else index.all_rows()
+    for other in results[1:]:
+        if not len(rows):
+            return rows
+        rows = intersect(rows, other)
+    for child in negative:
+        if not len(rows):
+            break
+        rows = difference(rows, evaluate(child, index, expander, fuzzy))
+    return rows
@@ -0,0 +1,173 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Hashable, Union
+import numpy as np
+
+def encode_cursor(score: float, row_id: int) -> str:
+    """Opaque cursor pointing just after the result with this score and row id."""
+    raw = json.dumps([float(score), int(row_id)], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """
+    Raises:
+        ValueError: For cursors not produced by encode_cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, row_id = json.loads(raw)
+        return float(score), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+class RankedResults:
+    """
+    Row ids of all matches of a search in rank order, with their scores.
+
+    Ranking is by score descending, then row id ascending, so a (score, row id)
+    pair identifies a position even after rows were added.
+    """
+
+    __slots__ = ('row_ids', 'scores')
+
+    def __init__(self, row_ids: np.ndarray, scores: np.ndarray):
+        self.row_ids = row_ids
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.row_ids.nbytes + self.scores.nbytes
+
+    def position(self, cursor: Optional[str]) -> int:
+        """Index of the first result after the cursor (0 without one)."""
+        if not cursor:
+            return 0
+        score, row_id = decode_cursor(cursor)
+        neg = -self.scores
+        lo = int(np.searchsorted(neg, -score, side='left'))
+        hi = int(np.searchsorted(neg, -score, side='right'))
+        return lo + int(np.searchsorted(self.row_ids[lo:hi], row_id, side='right'))
+
+    def page(self, cursor: Optional[str], limit: Optional[int]) -> Tuple[np.ndarray, np.ndarray, Optional[str]]:
+        """
+        Results after cursor.
+
+        Returns:
+            (row_ids, scores, next_cursor); next_cursor is None on the last page
+        """
+        start = self.position(cursor)
+        end = len(self) if limit is None else min(start + limit, len(self))
+        next_cursor = None
+        if end < len(self) and end > start:
+            next_cursor = encode_cursor(self.scores[end - 1], self.row_ids[end - 1])
+        return self.row_ids[start:end], self.scores[start:end], next_cursor
+
+def _size(value) -> int:
+    return value.nbytes if hasattr(value, 'nbytes') else len(value)
+
+class ResultSetCache:
+    """
+    LRU cache of ranked result sets with a time-to-live and a memory bound.
+
+    Values are RankedResults or encoded responses (bytes).
+
+    Keys should include the corpus generation. The cache also subscribes to
+    the corpus (reset/add) and drops everything when data changes, so stale
+    result sets don't hold memory until they expire.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 256, max_bytes: int = 64 * 2**20):
+        """
+        Args:
+            ttl: Seconds a result set is reused
+            max_entries: Result sets kept
+            max_bytes: Memory bound for cached row ids, scores and responses
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: Dict[Hashable, Tuple[float, Union[RankedResults, bytes]]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: Hashable):
+        _, value = self._entries.pop(key)
+        self._bytes -= _size(value)
+
+    def get(self, key: Hashable) -> Optional[Union[RankedResults, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                self._drop(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Union[RankedResults, bytes]):
+        size = _size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic(), value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    # Corpus listener: any change invalidates every result set
+    def reset(self):
+        self.clear()
+
+    def add(self, batch, start_row: int):
+        self.clear()
+
+    def clone(self, corpus) -> 'ResultSetCache':
+        return ResultSetCache(self.ttl, self.max_entries, self.max_bytes)
+
+    def adopt(self, other: 'ResultSetCache'):
+        self.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
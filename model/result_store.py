@@ -0,0 +1,188 @@
+import os
+import uuid
+from datetime import date
+from typing import List, Optional, Union
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+_STRINGS = pa.list_(pa.string())
+
+# Arrow types for the pipeline's columns; nested values are real struct/list columns
+OPINION_FIELDS = {
+    'post_id': pa.string(),
+    'subreddit': pa.string(),
+    'post_title': pa.string(),
+    'post_time': pa.int64(),
+    'comment_id': pa.string(),
+    'author': pa.string(),
+    'text': pa.string(),
+    'original_text': pa.string(),
+    'comment_length': pa.int32(),
+    'word_count': pa.int32(),
+    'has_flair': pa.bool_(),
+    'team_affiliation': pa.string(),
+    'engagement_score': pa.int64(),
+    'timestamp': pa.int64(),
+    'is_reply': pa.bool_(),
+    'datetime': pa.timestamp('s'),
+    'hour': pa.int8(),
+    'day_of_week': pa.int8(),
+    'bert_sentiment': pa.string(),
+    'bert_confidence': pa.float32(),
+    'bert_scores': pa.struct([
+        ('negative', pa.float32()),
+        ('neutral', pa.float32()),
+        ('positive', pa.float32())
+    ]),
+    'vader_sentiment': pa.string(),
+    'vader_compound': pa.float32(),
+    'opinion_intensity': pa.float32(),
+    'primary_emotion': pa.string(),
+    'emotions': pa.list_(pa.struct([('emotion', pa.string()), ('score', pa.float32())])),
+    'entities': pa.struct([
+        ('persons', _STRINGS),
+        ('orgs', _STRINGS),
+        ('events', _STRINGS),
+        ('all_entities', pa.list_(pa.struct([('text', pa.string()), ('label', pa.string())])))
+    ]),
+    'mentioned_players': _STRINGS,
+    'mentioned_teams': _STRINGS,
+    'topic': pa.int32(),
+    'topic_probability': pa.float32(),
+    'opinion_score': pa.float32(),
+    'match_date': pa.date32(),
+}
+
+# Columns the API's search filters, scoring profiles, facets and statistics
+# read; always loaded, whatever subset is asked for
+REQUIRED_COLUMNS = [
+    'comment_id', 'text', 'author', 'subreddit', 'timestamp', 'engagement_score',
+    'bert_sentiment', 'bert_confidence', 'vader_sentiment', 'vader_compound',
+    'opinion_intensity', 'primary_emotion', 'opinion_score', 'entities',
+]
+
+PARTITIONING = ds.partitioning(
+    pa.schema([('subreddit', pa.string()), ('match_date', pa.date32())]),
+    flavor='hive'
+)
+
+def _as_date(value: Union[str, date, None]) -> Optional[date]:
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+def match_dates(df: pd.DataFrame) -> pd.Series:
+    """
+    Partition date of each row: the post's date, else the comment's.
+
+    NaT where neither post_time nor timestamp is set (scraped comments
+    arrive with post_time 0).
+    """
+    seconds = pd.Series(np.nan, index=df.index)
+    for column in ('timestamp', 'post_time'):
+        if column in df:
+            values = pd.to_numeric(df[column], errors='coerce').astype(np.float64)
+            seconds = values.where(values > 0, seconds)
+    return pd.to_datetime(seconds, unit='s').dt.date
+
+class ParquetResultStore:
+    """Analyzed opinions as Parquet files partitioned by subreddit and match date."""
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Dataset directory (subreddit=<name>/match_date=<YYYY-MM-DD>/part-*.parquet)
+        """
+        self.root = root
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.root) and any(os.scandir(self.root))
+
+    def to_table(self, df: pd.DataFrame) -> pa.Table:
+        """
+        Convert pipeline output to Arrow with the declared schema, adding match_date
+        (null for rows with neither a post_time nor a timestamp).
+        """
+        df = df.copy()
+        df['match_date'] = match_dates(df)
+        if 'topic_probability' in df:
+            df['topic_probability'] = pd.to_numeric(df['topic_probability'], errors='coerce')
+
+        known = [c for c in df.columns if c in OPINION_FIELDS]
+        schema = pa.schema([(c, OPINION_FIELDS[c]) for c in known])
+        table = pa.Table.from_pandas(df[known], schema=schema, preserve_index=False)
+
+        # Columns without a declared type keep their inferred one
+        for c in df.columns:
+            if c not in OPINION_FIELDS:
+                table = table.append_column(c, pa.Array.from_pandas(df[c]))
+
+        return table
+
+    def write(self, df: pd.DataFrame) -> int:
+        """
+        Append rows as new files in their subreddit/match_date partitions.
+
+        Rows without a usable date go to the null partition
+        (match_date=__HIVE_DEFAULT_PARTITION__), which date-range reads skip.
+        Returns the number of rows written.
+        """
+        if df.empty:
+            return 0
+
+        ds.write_dataset(
+            self.to_table(df),
+            self.root,
+            format='parquet',
+            partitioning=PARTITIONING,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        return len(df)
+
+    def dataset(self) -> ds.Dataset:
+        return ds.dataset(self.root, format='parquet', partitioning=PARTITIONING)
+
+    def read(self, columns: Optional[List[str]] = None,
+             subreddits: Optional[List[str]] = None,
+             start_date: Union[str, date, None] = None,
+             end_date: Union[str, date, None] = None,
+             filter: Optional[ds.Expression] = None) -> pd.DataFrame:
+        """
+        Load opinions, reading only the needed partitions and columns.
+
+        Args:
+            columns: Columns to read (None for all)
+            subreddits: Only these subreddits
+            start_date: First match date to include (inclusive)
+            end_date: Last match date to include (inclusive)
+            filter: Extra row predicate, pushed down to Parquet row groups
+
+        Returns:
+            DataFrame with nested columns as Python dicts/lists, like pipeline output
+        """
+        if not self.exists():
+            return pd.DataFrame(columns=columns or [])
+
+        expr = filter
+        conditions = []
+        if subreddits:
+            conditions.append(ds.field('subreddit').isin(subreddits))
+        if start_date is not None:
+            conditions.append(ds.field('match_date') >= pa.scalar(_as_date(start_date), pa.date32()))
+        if end_date is not None:
+            conditions.append(ds.field('match_date') <= pa.scalar(_as_date(end_date), pa.date32()))
+        for condition in conditions:
+            expr = condition if expr is None else expr & condition
+
+        table = self.dataset().to_table(columns=columns, filter=expr)
+        df = table.to_pandas()
+
+        # Nested columns as Python objects, matching the pipeline's in-memory shape
+        for name, column in zip(table.column_names, table.columns):
+            if pa.types.is_nested(column.type):
+                df[name] = column.to_pylist()
+
+        return df
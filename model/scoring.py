@@ -0,0 +1,74 @@
+import time
+from typing import Dict, Callable
+import numpy as np
+import pandas as pd
+
+def _engagement(df: pd.DataFrame) -> np.ndarray:
+    """Normalized engagement, capped at 1.0."""
+    return np.minimum(df['engagement_score'].to_numpy(dtype=np.float64) / 100, 1.0)
+
+def default_score(df: pd.DataFrame) -> np.ndarray:
+    """Original blend of sentiment, confidence, engagement and intensity."""
+    return (
+        df['vader_compound'].to_numpy(dtype=np.float64) * 0.5 +  # Sentiment direction
+        df['bert_confidence'].to_numpy(dtype=np.float64) * 0.2 +  # Model confidence
+        _engagement(df) * 0.2 +  # Community validation
+        df['opinion_intensity'].to_numpy(dtype=np.float64) * 0.1  # Opinion strength
+    )
+
+def time_decayed_score(df: pd.DataFrame, half_life_hours: float = 72.0) -> np.ndarray:
+    """Default blend with engagement halved for every half_life_hours of comment age."""
+    age_hours = np.maximum(time.time() - df['timestamp'].to_numpy(dtype=np.float64), 0) / 3600
+    decay = np.exp2(-age_hours / half_life_hours)
+    return (
+        df['vader_compound'].to_numpy(dtype=np.float64) * 0.5 +
+        df['bert_confidence'].to_numpy(dtype=np.float64) * 0.2 +
+        _engagement(df) * decay * 0.2 +
+        df['opinion_intensity'].to_numpy(dtype=np.float64) * 0.1
+    )
+
+def confidence_gated_score(df: pd.DataFrame, min_confidence: float = 0.6) -> np.ndarray:
+    """Sentiment only counts when BERT is confident and agrees with VADER."""
+    confident = df['bert_confidence'].to_numpy(dtype=np.float64) >= min_confidence
+    agrees = (df['bert_sentiment'] == df['vader_sentiment']).to_numpy()
+    gate = (confident & agrees).astype(np.float64)
+    return (
+        df['vader_compound'].to_numpy(dtype=np.float64) * gate * 0.6 +
+        _engagement(df) * 0.25 +
+        df['opinion_intensity'].to_numpy(dtype=np.float64) * gate * 0.15
+    )
+
+def engagement_score(df: pd.DataFrame) -> np.ndarray:
+    """Rank by community validation first, strength of opinion second."""
+    return (
+        _engagement(df) * 0.7 +
+        df['opinion_intensity'].to_numpy(dtype=np.float64) * 0.3
+    )
+
+# Named scoring profiles selectable per search request
+SCORING_PROFILES: Dict[str, Callable[[pd.DataFrame], np.ndarray]] = {
+    'default': default_score,
+    'time_decayed': time_decayed_score,
+    'confidence_gated': confidence_gated_score,
+    'engagement': engagement_score,
+}
+
+def calculate_opinion_score(df: pd.DataFrame, profile: str = 'default') -> np.ndarray:
+    """
+    Score opinions with a named profile.
+
+    Args:
+        df: Analyzed opinions (only the rows to be scored)
+        profile: Key of SCORING_PROFILES
+
+    Returns:
+        Array of scores aligned with df rows
+    """
+    if profile not in SCORING_PROFILES:
+        raise ValueError(
+            f"Unknown scoring profile '{profile}'. Available: {', '.join(SCORING_PROFILES)}"
+        )
+    if df.empty:
+        return np.zeros(0)
+
+    return SCORING_PROFILES[profile](df)
@@ -0,0 +1,409 @@
+import abc
+import json
+import operator
+import re
+import sqlite3
+import threading
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
+import numpy as np
+import pandas as pd
+from scoring import calculate_opinion_score
+
+# Columns stored as plain SQL columns; everything else goes into the JSON `data` column
+SCALAR_COLUMNS = {
+    'comment_id': 'TEXT NOT NULL UNIQUE',
+    'post_id': 'TEXT',
+    'subreddit': 'TEXT',
+    'author': 'TEXT',
+    'text': 'TEXT',
+    'timestamp': 'INTEGER',
+    'engagement_score': 'INTEGER',
+    'bert_sentiment': 'TEXT',
+    'bert_confidence': 'REAL',
+    'vader_sentiment': 'TEXT',
+    'vader_compound': 'REAL',
+    'opinion_intensity': 'REAL',
+    'primary_emotion': 'TEXT',
+    'topic': 'INTEGER',
+    'opinion_score': 'REAL',
+}
+
+INDEXED_COLUMNS = ['bert_sentiment', 'primary_emotion', 'opinion_intensity',
+                   'timestamp', 'subreddit', 'opinion_score']
+
+COMPARISONS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '=': operator.eq,
+}
+
+_FILTER = re.compile(r'^\s*(>=|<=|>|<|=)\s*([0-9]*\.?[0-9]+)\s*$')
+
+def parse_emotion_filters(emotion_scores: Optional[Dict[str, str]]) -> List[Tuple[str, str, float]]:
+    """
+    Parse {"anger": ">0.6", "joy": "<0.1"} into (column, operator, value) triples.
+
+    Raises:
+        ValueError: For malformed labels or conditions
+    """
+    filters = []
+    for label, condition in (emotion_scores or {}).items():
+        if not re.fullmatch(r'[a-z_]+', label):
+            raise ValueError(f"Invalid emotion '{label}'")
+        match = _FILTER.match(str(condition))
+        if match is None:
+            raise ValueError(
+                f"Invalid condition '{condition}' for {label}; use e.g. '>0.6' or '<=0.1'"
+            )
+        filters.append((f'emotion_{label}', match.group(1), float(match.group(2))))
+    return filters
+
+def _json_default(value):
+    # numpy scalars (e.g. the float16 emotion scores) as plain numbers
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+# (rowid, key, value) for each distinct string in the row's entity lists
+_ENTITY_VALUES = """
+    SELECT DISTINCT {rowid}, k.key, j.value
+    FROM {source} json_each({data}, '$.entities') k, json_each(k.value) j
+    WHERE k.type = 'array' AND j.type = 'text'"""
+
+class SearchBackend(abc.ABC):
+    """Storage that search_opinions can run against instead of an in-memory DataFrame."""
+
+    @abc.abstractmethod
+    def add(self, df: pd.DataFrame) -> int:
+        """Store analyzed opinions; returns the number of new rows."""
+
+    @abc.abstractmethod
+    def new_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        """The rows of df whose comment_id is not stored yet."""
+
+    @abc.abstractmethod
+    def clear(self):
+        """Delete every stored opinion."""
+
+    @abc.abstractmethod
+    def scan(self, batch_size: int = 10000) -> Iterator[pd.DataFrame]:
+        """All stored opinions as fetch() frames of up to batch_size rows, in row id order."""
+
+    @abc.abstractmethod
+    def search(self, query: str = None, sentiment: str = None, emotion: str = None,
+               min_intensity: float = 0.0, scoring_profile: str = None,
+               limit: Optional[int] = None,
+               emotion_scores: Optional[Dict[str, str]] = None,
+               term_groups: Optional[List[List[str]]] = None) -> pd.DataFrame:
+        """
+        Matching opinions, best opinion_score first.
+
+        term_groups replaces the phrase query: every group must match one of
+        its terms (e.g. the fuzzy alternatives of each query word).
+        """
+
+    @abc.abstractmethod
+    def rank(self, query: str = None, sentiment: str = None, emotion: str = None,
+             min_intensity: float = 0.0, scoring_profile: str = None,
+             emotion_scores: Optional[Dict[str, str]] = None,
+             term_groups: Optional[List[List[str]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Row ids and scores of all matches, by score descending then row id."""
+
+    @abc.abstractmethod
+    def fetch(self, row_ids: Iterable[int]) -> pd.DataFrame:
+        """Full rows for the given row ids, in that order."""
+
+    @abc.abstractmethod
+    def value_counts(self, column: str, query: str = None, sentiment: str = None, emotion: str = None,
+                     min_intensity: float = 0.0, emotion_scores: Optional[Dict[str, str]] = None,
+                     term_groups: Optional[List[List[str]]] = None) -> pd.Series:
+        """Counts of a column's values over the matches of a search, most frequent first."""
+
+    @abc.abstractmethod
+    def list_counts(self, key: str, query: str = None, sentiment: str = None, emotion: str = None,
+                    min_intensity: float = 0.0, emotion_scores: Optional[Dict[str, str]] = None,
+                    term_groups: Optional[List[List[str]]] = None) -> pd.Series:
+        """Number of matches whose entities[key] list holds each value, most frequent first."""
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """Number of stored opinions."""
+
+class SQLiteBackend(SearchBackend):
+    """
+    Opinions in a local SQLite database with an FTS5 index on the text.
+
+    The database runs in WAL mode, so readers don't block each other or the
+    writer. Each thread gets its own connection. Entity lists (players,
+    teams, ...) are also kept one value per row in the indexed
+    opinion_entities table, so facets are counted without parsing JSON.
+    """
+
+    def __init__(self, path: str = "opinions.db"):
+        """
+        Args:
+            path: Database file, created if missing
+        """
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._create()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create(self):
+        conn = self._connect()
+        columns = ',\n'.join(f"{name} {kind}" for name, kind in SCALAR_COLUMNS.items())
+        with conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS opinions (
+                    rowid INTEGER PRIMARY KEY,
+                    {columns},
+                    data TEXT
+                )""")
+            for name in INDEXED_COLUMNS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_opinions_{name} ON opinions ({name})")
+            # External-content FTS table: the text is stored once, in opinions
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS opinions_fts USING fts5(
+                    text, content='opinions', content_rowid='rowid',
+                    tokenize='unicode61 remove_diacritics 2'
+                )""")
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS opinions_ai AFTER INSERT ON opinions BEGIN
+                    INSERT INTO opinions_fts(rowid, text) VALUES (new.rowid, new.text);
+                END""")
+
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'opinion_entities'").fetchone()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS opinion_entities (
+                    rowid INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_opinion_entities_key ON opinion_entities (key, value)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_opinion_entities_rowid ON opinion_entities (rowid)")
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS opinions_entities_ai AFTER INSERT ON opinions BEGIN
+                    INSERT INTO opinion_entities (rowid, key, value)
+                    {_ENTITY_VALUES.format(rowid='new.rowid', data='new.data', source='')};
+                END""")
+            if not exists:
+                # Databases created before the side table get it filled once
+                conn.execute(f"INSERT INTO opinion_entities (rowid, key, value) "
+                             f"{_ENTITY_VALUES.format(rowid='o.rowid', data='o.data', source='opinions o,')}")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM opinions").fetchone()[0]
+
+    def add(self, df: pd.DataFrame) -> int:
+        """Insert opinions; comments already stored are skipped."""
+        if df.empty:
+            return 0
+
+        scalars = [c for c in SCALAR_COLUMNS if c in df.columns]
+        extras = [c for c in df.columns if c not in SCALAR_COLUMNS]
+
+        values = [df[c].tolist() for c in scalars]
+        extra_values = df[extras].to_dict('records')
+        data = [json.dumps(record, default=_json_default) for record in extra_values]
+
+        placeholders = ', '.join('?' * (len(scalars) + 1))
+        sql = f"INSERT OR IGNORE INTO opinions ({', '.join(scalars)}, data) VALUES ({placeholders})"
+
+        conn = self._connect()
+        with self._write_lock, conn:
+            # rowcount excludes the trigger's FTS inserts
+            return conn.executemany(sql, zip(*values, data)).rowcount
+
+    def new_rows(self, df: pd.DataFrame) -> pd.DataFrame:
+        if df.empty:
+            return df
+        df = df.drop_duplicates('comment_id')
+        ids = df['comment_id'].tolist()
+        conn = self._connect()
+        stored = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            sql = f"SELECT comment_id FROM opinions WHERE comment_id IN ({', '.join('?' * len(chunk))})"
+            stored.update(row[0] for row in conn.execute(sql, chunk))
+        return df[[comment_id not in stored for comment_id in ids]]
+
+    def clear(self):
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute("DELETE FROM opinions")
+            conn.execute("DELETE FROM opinion_entities")
+            conn.execute("INSERT INTO opinions_fts(opinions_fts) VALUES ('delete-all')")
+
+    def scan(self, batch_size: int = 10000) -> Iterator[pd.DataFrame]:
+        conn = self._connect()
+        last = 0
+        while True:
+            row_ids = [row[0] for row in conn.execute(
+                "SELECT rowid FROM opinions WHERE rowid > ? ORDER BY rowid LIMIT ?", (last, batch_size))]
+            if not row_ids:
+                return
+            yield self.fetch(row_ids)
+            last = row_ids[-1]
+
+    def _where(self, query, sentiment, emotion, min_intensity, emotion_scores,
+               term_groups=None) -> (str, List):
+        joins, clauses, params = '', [], []
+        if term_groups:
+            joins = "JOIN opinions_fts f ON f.rowid = o.rowid"
+            clauses.append("opinions_fts MATCH ?")
+            params.append(' AND '.join(
+                '(' + ' OR '.join('"' + term.replace('"', '""') + '"' for term in group) + ')'
+                for group in term_groups
+            ))
+        elif query:
+            # Quoted as one FTS5 phrase: all words, in order
+            joins = "JOIN opinions_fts f ON f.rowid = o.rowid"
+            clauses.append("opinions_fts MATCH ?")
+            params.append('"' + query.replace('"', '""') + '"')
+        if sentiment:
+            clauses.append("o.bert_sentiment = ?")
+            params.append(sentiment)
+        if emotion:
+            clauses.append("o.primary_emotion = ?")
+            params.append(emotion)
+        if min_intensity > 0:
+            clauses.append("o.opinion_intensity >= ?")
+            params.append(min_intensity)
+        for column, op, value in parse_emotion_filters(emotion_scores):
+            # Emotion scores live in the JSON column
+            clauses.append(f"json_extract(o.data, ?) {op} ?")
+            params.extend([f'$.{column}', value])
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        return f"{joins} {where}", params
+
+    def search(self, query: str = None, sentiment: str = None, emotion: str = None,
+               min_intensity: float = 0.0, scoring_profile: str = None,
+               limit: Optional[int] = None,
+               emotion_scores: Optional[Dict[str, str]] = None,
+               term_groups: Optional[List[List[str]]] = None) -> pd.DataFrame:
+        """
+        Matching opinions, best score first.
+
+        With the default profile the database sorts and limits. Other profiles
+        rank the matches with rank() and fetch full rows for the top results.
+        """
+        if scoring_profile and scoring_profile != 'default':
+            row_ids, scores = self.rank(query, sentiment, emotion, min_intensity,
+                                        scoring_profile, emotion_scores, term_groups)
+            if limit is not None:
+                row_ids, scores = row_ids[:limit], scores[:limit]
+            return self.fetch(row_ids.tolist()).assign(opinion_score=scores)
+
+        where, params = self._where(query, sentiment, emotion, min_intensity, emotion_scores,
+                                    term_groups)
+        sql = f"SELECT o.rowid FROM opinions o {where} ORDER BY o.opinion_score DESC, o.rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        row_ids = [r[0] for r in self._connect().execute(sql, params)]
+        return self.fetch(row_ids)
+
+    def rank(self, query: str = None, sentiment: str = None, emotion: str = None,
+             min_intensity: float = 0.0, scoring_profile: str = None,
+             emotion_scores: Optional[Dict[str, str]] = None,
+             term_groups: Optional[List[List[str]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row ids and scores of all matches, by score descending then row id.
+
+        Only the scoring columns of the matches are read.
+        """
+        conn = self._connect()
+        where, params = self._where(query, sentiment, emotion, min_intensity, emotion_scores,
+                                    term_groups)
+
+        if not scoring_profile or scoring_profile == 'default':
+            sql = (f"SELECT o.rowid, o.opinion_score FROM opinions o {where} "
+                   f"ORDER BY o.opinion_score DESC, o.rowid")
+            rows = conn.execute(sql, params).fetchall()
+            row_ids = np.array([r[0] for r in rows], dtype=np.int64)
+            scores = np.array([r[1] for r in rows], dtype=np.float64)
+            return row_ids, scores
+
+        scalars = [c for c in SCALAR_COLUMNS if c != 'text']
+        sql = f"SELECT o.rowid, {', '.join('o.' + c for c in scalars)} FROM opinions o {where}"
+        candidates = pd.DataFrame(conn.execute(sql, params).fetchall(), columns=['rowid'] + scalars)
+        if candidates.empty:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        scores = np.asarray(calculate_opinion_score(candidates, scoring_profile), dtype=np.float64)
+        row_ids = candidates['rowid'].to_numpy(dtype=np.int64)
+        order = np.lexsort((row_ids, -scores))
+        return row_ids[order], scores[order]
+
+    def fetch(self, row_ids: Iterable[int]) -> pd.DataFrame:
+        row_ids = list(row_ids)
+        columns = list(SCALAR_COLUMNS)
+        if not row_ids:
+            return pd.DataFrame(columns=columns)
+
+        conn = self._connect()
+        rows = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(row_ids), 500):
+            chunk = row_ids[start:start + 500]
+            sql = (f"SELECT rowid, {', '.join(columns)}, data FROM opinions "
+                   f"WHERE rowid IN ({', '.join('?' * len(chunk))})")
+            for row in conn.execute(sql, chunk):
+                rows[row[0]] = row
+
+        records = []
+        for row_id in row_ids:
+            row = rows[row_id]
+            record = dict(zip(columns, row[1:-1]))
+            record.update(json.loads(row[-1]) if row[-1] else {})
+            records.append(record)
+
+        df = pd.DataFrame.from_records(records, index=pd.Index(row_ids, name='rowid'))
+        if 'datetime' in df:
+            df['datetime'] = pd.to_datetime(df['datetime'])
+        return df
+
+    def value_counts(self, column: str, query: str = None, sentiment: str = None, emotion: str = None,
+                     min_intensity: float = 0.0, emotion_scores: Optional[Dict[str, str]] = None,
+                     term_groups: Optional[List[List[str]]] = None) -> pd.Series:
+        """One GROUP BY over the search's matches."""
+        if column in SCALAR_COLUMNS:
+            expr = f"o.{column}"
+        elif re.fullmatch(r'\w+', column):
+            expr = f"json_extract(o.data, '$.{column}')"
+        else:
+            raise ValueError(f"Invalid column '{column}'")
+        where, params = self._where(query, sentiment, emotion, min_intensity, emotion_scores, term_groups)
+        sql = f"SELECT {expr}, COUNT(*) FROM opinions o {where} GROUP BY 1"
+        return self._counts(sql, params)
+
+    def list_counts(self, key: str, query: str = None, sentiment: str = None, emotion: str = None,
+                    min_intensity: float = 0.0, emotion_scores: Optional[Dict[str, str]] = None,
+                    term_groups: Optional[List[List[str]]] = None) -> pd.Series:
+        """One GROUP BY over opinion_entities joined to the search's matches."""
+        where, params = self._where(query, sentiment, emotion, min_intensity, emotion_scores, term_groups)
+        # Values are distinct per row, so COUNT(*) counts rows
+        sql = (f"SELECT e.value, COUNT(*) FROM opinion_entities e "
+               f"JOIN opinions o ON o.rowid = e.rowid AND e.key = ? {where} GROUP BY e.value")
+        return self._counts(sql, [key] + params)
+
+    def _counts(self, sql: str, params: List) -> pd.Series:
+        counts = {value: count for value, count in self._connect().execute(sql, params) if value is not None}
+        return pd.Series(counts, dtype=np.int64).sort_values(ascending=False, kind='stable')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
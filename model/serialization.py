@@ -0,0 +1,113 @@
+import json
+from typing import List, Dict, Optional, Any, Callable
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj: Any) -> bytes:
+    """Encode to JSON bytes with orjson when installed, else the json module."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, default=_default).encode('utf-8')
+
+def _default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _column(column: str, convert: Callable[[pd.Series], List]) -> Callable[[pd.DataFrame], List]:
+    # Columns left out of a partial /store/load come back as nulls
+    return lambda df: convert(df[column]) if column in df else [None] * len(df)
+
+def _strings(column: str) -> Callable[[pd.DataFrame], List]:
+    return _column(column, lambda values: values.astype(object).where(values.notna(), None).tolist())
+
+def _floats(column: str) -> Callable[[pd.DataFrame], List]:
+    return _column(column, lambda values: values.to_numpy(dtype=np.float64).tolist())
+
+def _ints(column: str) -> Callable[[pd.DataFrame], List]:
+    return _column(column, lambda values: values.to_numpy(dtype=np.int64).tolist())
+
+# Response field -> column extractor; entity fields are filled separately
+OPINION_FIELDS = {
+    'comment_id': _strings('comment_id'),
+    'text': _strings('text'),
+    'author': _strings('author'),
+    'sentiment': _strings('bert_sentiment'),
+    'confidence': _floats('bert_confidence'),
+    'emotion': _strings('primary_emotion'),
+    'opinion_score': _floats('opinion_score'),
+    'entities': None,
+    'mentioned_players': None,
+    'mentioned_teams': None,
+    'timestamp': _ints('timestamp'),
+    'engagement_score': _ints('engagement_score'),
+}
+
+ENTITY_FIELDS = {'entities': None, 'mentioned_players': 'persons', 'mentioned_teams': 'orgs'}
+
+# Only returned when asked for (computed per page, see snippets.py)
+SNIPPET_FIELDS = {
+    'snippet': _strings('snippet'),
+    'highlights': lambda df: df['highlights'].tolist(),
+}
+
+_EXTRACTORS = {**OPINION_FIELDS, **SNIPPET_FIELDS}
+
+def check_fields(fields: Optional[List[str]]) -> List[str]:
+    """
+    Validate a field projection; None selects every opinion field.
+
+    Raises:
+        ValueError: For unknown fields
+    """
+    if fields is None:
+        return list(OPINION_FIELDS)
+    unknown = [f for f in fields if f not in _EXTRACTORS]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(_EXTRACTORS)}"
+        )
+    return list(dict.fromkeys(fields))
+
+def opinion_records(results: pd.DataFrame, entities=None,
+                    fields: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Convert the top-k result slice to response dicts, one column at a time.
+
+    Args:
+        results: Ranked results (already limited)
+        entities: The corpus EntityTable for compact rows; rows from a search
+            backend carry an entities column instead
+        fields: Response fields to include (all when None)
+    """
+    fields = check_fields(fields)
+    if results.empty:
+        return []
+
+    columns = {}
+    wanted_entities = [f for f in fields if f in ENTITY_FIELDS]
+    if wanted_entities:
+        if 'entity_start' in results:
+            rows = [entities.row(s, e) for s, e in zip(results['entity_start'].tolist(),
+                                                        results['entity_end'].tolist())]
+        elif 'entities' in results:
+            rows = [e or {} for e in results['entities'].tolist()]
+        else:
+            rows = [{}] * len(results)
+        for field in wanted_entities:
+            key = ENTITY_FIELDS[field]
+            columns[field] = rows if key is None else [r.get(key, []) for r in rows]
+
+    for field in fields:
+        if field not in columns:
+            columns[field] = _EXTRACTORS[field](results)
+
+    values = [columns[field] for field in fields]
+    return [dict(zip(fields, row)) for row in zip(*values)]
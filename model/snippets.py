@@ -0,0 +1,141 @@
+import re
+import time
+from bisect import bisect_left
+from typing import List, Tuple, Optional
+import numpy as np
+from text_index import TOKEN_PATTERN, token_spans
+
+ELLIPSIS = '…'
+
+# Matches looked at per result; enough to place one window
+MAX_MATCHES = 64
+
+# Characters that take two UTF-16 code units (a surrogate pair), e.g. most emoji
+_ASTRAL = re.compile('[\U00010000-\U0010FFFF]')
+
+def utf16_spans(text: str, spans: List[List[int]]) -> List[List[int]]:
+    """Char offsets into text as UTF-16 code unit offsets, the indices JavaScript strings use."""
+    if text.isascii() or not spans:
+        return spans
+    astral = [match.start() for match in _ASTRAL.finditer(text)]
+    if not astral:
+        return spans
+    return [[s + bisect_left(astral, s), e + bisect_left(astral, e)] for s, e in spans]
+
+def _best_window(starts: List[int], ends: List[int], length: int) -> Tuple[int, int]:
+    """First and last match index of the length-char window holding the most matches."""
+    best = (0, 0)
+    j = 0
+    for i in range(len(starts)):
+        j = max(j, i)
+        while j + 1 < len(starts) and ends[j + 1] - starts[i] <= length:
+            j += 1
+        if j - i > best[1] - best[0]:
+            best = (i, j)
+    return best
+
+def _window(text: str, first: int, last: int, length: int) -> Tuple[int, int]:
+    """Char range of about length chars around [first, last), cut at spaces."""
+    pad = max(0, (length - (last - first)) // 2)
+    start = max(0, first - pad)
+    end = min(len(text), start + length)
+    start = max(0, min(start, end - length))
+
+    # Don't cut words in half, unless that would drop a match
+    if start > 0:
+        space = text.find(' ', start, first)
+        if space != -1:
+            start = space + 1
+    if end < len(text):
+        space = text.rfind(' ', max(last, start), end)
+        if space != -1:
+            end = space
+    return start, end
+
+def snippet(text: str, starts: List[int], ends: List[int], length: int) -> Tuple[str, List[List[int]]]:
+    """
+    The window of text with the most matches, and the matches' offsets in it.
+
+    Args:
+        text: Full comment text
+        starts, ends: Sorted match char ranges in text
+        length: Window size in chars; shorter texts are returned whole
+    """
+    if len(text) <= length:
+        return text, [[s, e] for s, e in zip(starts, ends)]
+
+    if starts:
+        i, j = _best_window(starts, ends, length)
+        start, end = _window(text, starts[i], ends[j], length)
+    else:
+        start, end = _window(text, 0, 0, length)
+
+    prefix = ELLIPSIS if start > 0 else ''
+    suffix = ELLIPSIS if end < len(text) else ''
+    shift = len(prefix) - start
+    highlights = [[s + shift, e + shift] for s, e in zip(starts, ends) if s >= start and e <= end]
+    return prefix + text[start:end] + suffix, highlights
+
+def make_snippets(texts: List[str], terms: List[str], row_ids: Optional[np.ndarray] = None,
+                  index=None, length: int = 160,
+                  budget: float = 0.002) -> Tuple[List[str], List[List[List[int]]]]:
+    """
+    Query-aware snippets with highlight offsets for a page of results.
+
+    Match positions come from the char offsets stored in the positional index
+    (one binary search per term for the whole page). Without an index (e.g.
+    rows from a search backend) each text is scanned for the terms instead.
+    A result that runs past its time budget gets a plain leading snippet.
+
+    Args:
+        texts: Result texts
+        terms: Lowercased words to highlight
+        row_ids: Corpus row ids of the results, for index lookups
+        index: text_index.InvertedIndex
+        length: Snippet size in chars
+        budget: Seconds allowed per result
+
+    Returns:
+        (snippets, highlights); highlights are [start, end] UTF-16 offsets into
+        the snippet, so they slice the string as-is in JavaScript
+    """
+    terms = list(dict.fromkeys(t for t in terms if t))
+    offsets = {}
+    if terms and index is not None and row_ids is not None:
+        offsets = {term: index.offsets(term, row_ids) for term in terms}
+
+    snippets, highlights = [], []
+    for k, text in enumerate(texts):
+        text = text if isinstance(text, str) else ''
+        deadline = time.perf_counter() + budget
+        starts = []
+
+        if offsets:
+            for term in terms:
+                starts.extend(offsets[term][k][:MAX_MATCHES].tolist())
+        elif terms:
+            wanted = set(terms)
+            for n, (token, offset) in enumerate(token_spans(text)):
+                if token in wanted:
+                    starts.append(offset)
+                    if len(starts) >= MAX_MATCHES:
+                        break
+                if n % 256 == 255 and time.perf_counter() > deadline:
+                    break
+
+        starts.sort()
+        starts = starts[:MAX_MATCHES]
+        ends = []
+        for start in starts:
+            # Token length in the original text (lowercasing can change it)
+            match = TOKEN_PATTERN.match(text, start)
+            ends.append(match.end() if match else start)
+
+        if time.perf_counter() > deadline:
+            # Out of time: plain leading snippet
+            starts, ends = [], []
+        text_snippet, spans = snippet(text, starts, ends, length)
+        snippets.append(text_snippet)
+        highlights.append(utf16_spans(text_snippet, spans))
+
+    return snippets, highlights
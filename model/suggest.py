@@ -0,0 +1,204 @@
+import heapq
+import threading
+from bisect import bisect_left
+from collections import Counter
+from typing import List, Dict
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from text_index import tokenize
+
+# Entity labels that are worth completing (no dates, numbers or amounts)
+ENTITY_KINDS = {
+    'PERSON': 'player',
+    'ORG': 'team',
+    'EVENT': 'event',
+    'GPE': 'place',
+    'FAC': 'place',
+    'NORP': 'entity',
+    'WORK_OF_ART': 'entity',
+}
+
+# Relative weight of one mention, one search and one comment containing a term
+ENTITY_WEIGHT = 3.0
+QUERY_WEIGHT = 5.0
+TERM_WEIGHT = 1.0
+
+_KIND_PRIORITY = {'query': 0, 'term': 1}
+
+# Fewest pending keys worth a full merge into the sorted list
+MIN_PENDING_KEYS = 1024
+
+class SuggestIndex:
+    """
+    Prefix completion over entity names, corpus terms and past searches.
+
+    Completions are kept as a sorted list of lowercased keys with an aligned
+    weight array, so a prefix is two binary searches plus a top-k over the
+    matching slice. It is a corpus listener: known keys are reweighted in
+    place, and new keys wait in a small sorted pending run that is merged
+    into the list once it grows past MIN_PENDING_KEYS (or sqrt of the list).
+    """
+
+    def __init__(self, corpus=None, min_term_length: int = 3):
+        """
+        Args:
+            corpus: OpinionCorpus whose EntityTable compact batches point into
+            min_term_length: Shortest corpus term offered as a completion
+        """
+        self.corpus = corpus
+        self.min_term_length = min_term_length
+
+        self._weights: Dict[str, float] = {}
+        self._display: Dict[str, str] = {}
+        self._kind: Dict[str, str] = {}
+        self._queries = Counter()
+        self._lock = threading.Lock()
+        # (sorted keys, aligned weights); the key list is replaced, never mutated
+        self._sorted = ([], np.zeros(0))
+        self._pending: List[str] = []
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sorted[0]) + len(self._pending)
+
+    def _count(self, display: str, kind: str, weight: float, new_keys: set):
+        key = display.lower()
+        if key not in self._weights:
+            self._weights[key] = 0.0
+            new_keys.add(key)
+        else:
+            # Already in the sorted list: bump its weight where it is
+            keys, weights = self._sorted
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                weights[i] += weight
+        self._weights[key] += weight
+        # Entity spellings beat searches, which beat bare lowercase terms
+        current = self._kind.get(key)
+        if current is None or _KIND_PRIORITY.get(kind, -1) < _KIND_PRIORITY.get(current, -1):
+            self._kind[key] = kind
+            self._display[key] = display
+
+    def _publish(self, new_keys: set):
+        """Add new keys to the pending run, merging it into the sorted list when large."""
+        if not new_keys:
+            return
+        self._pending = list(heapq.merge(self._pending, sorted(new_keys)))
+        keys, weights = self._sorted
+        if len(self._pending) > max(MIN_PENDING_KEYS, int(np.sqrt(len(keys)))):
+            positions = [bisect_left(keys, key) for key in self._pending]
+            weights = np.insert(weights, positions, [self._weights[key] for key in self._pending])
+            self._sorted = (list(heapq.merge(keys, self._pending)), weights)
+            self._pending = []
+
+    def reset(self):
+        """Drop corpus-derived completions; past searches are kept."""
+        with self._lock:
+            self._weights, self._display, self._kind = {}, {}, {}
+            self._sorted, self._pending = ([], np.zeros(0)), []
+            new_keys = set()
+            for query, count in self._queries.items():
+                self._count(query, 'query', count * QUERY_WEIGHT, new_keys)
+            self._publish(new_keys)
+
+    def clone(self, corpus) -> 'SuggestIndex':
+        fresh = SuggestIndex(corpus, self.min_term_length)
+        with self._lock:
+            fresh._queries = Counter(self._queries)
+        fresh.reset()
+        return fresh
+
+    def adopt(self, other: 'SuggestIndex'):
+        """Take over completions built off to the side, keeping searches recorded meanwhile."""
+        with self._lock:
+            self._weights, self._display, self._kind = other._weights, other._display, other._kind
+            self._sorted, self._pending = other._sorted, other._pending
+            new_keys = set()
+            for query, count in (self._queries - other._queries).items():
+                self._count(query, 'query', count * QUERY_WEIGHT, new_keys)
+            self._publish(new_keys)
+
+    def _entity_mentions(self, batch: pd.DataFrame) -> Counter:
+        mentions = Counter()
+        if 'entity_start' in batch and self.corpus is not None:
+            entities = self.corpus.entities
+            start, end = int(batch['entity_start'].min()), int(batch['entity_end'].max())
+            texts = entities.text_codes[start:end]
+            labels = entities.label_codes[start:end]
+            for text_code, label_code in zip(texts.tolist(), labels.tolist()):
+                label = entities.labels[label_code]
+                if label in ENTITY_KINDS:
+                    mentions[(entities.texts[text_code], ENTITY_KINDS[label])] += 1
+        elif 'entities' in batch:
+            for row in batch['entities']:
+                for entity in (row or {}).get('all_entities') or []:
+                    if entity['label'] in ENTITY_KINDS:
+                        mentions[(entity['text'], ENTITY_KINDS[entity['label']])] += 1
+        return mentions
+
+    def add(self, batch: pd.DataFrame, start_row: int):
+        """Count the batch's entity mentions and terms (one per comment)."""
+        mentions = self._entity_mentions(batch)
+        terms = Counter()
+        if 'text' in batch:
+            for text in batch['text']:
+                terms.update(set(tokenize(text)))
+
+        with self._lock:
+            new_keys = set()
+            for (text, kind), count in mentions.items():
+                self._count(text, kind, count * ENTITY_WEIGHT, new_keys)
+            for term, count in terms.items():
+                if len(term) >= self.min_term_length and not term.isdigit() and term not in ENGLISH_STOP_WORDS:
+                    self._count(term, 'term', count * TERM_WEIGHT, new_keys)
+            self._publish(new_keys)
+
+    def record_query(self, query: str):
+        """Count a search so popular queries are suggested."""
+        query = ' '.join(query.split())
+        if not query:
+            return
+        with self._lock:
+            self._queries[query.lower()] += 1
+            new_keys = set()
+            self._count(query.lower(), 'query', QUERY_WEIGHT, new_keys)
+            self._publish(new_keys)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """
+        Completions of prefix, highest weight first.
+
+        Returns:
+            Dicts with text, kind (player/team/term/query/...) and weight
+        """
+        prefix = ' '.join(prefix.split()).lower()
+        if not prefix:
+            return []
+
+        end = prefix + '\U0010ffff'
+        with self._lock:
+            keys, weights = self._sorted
+            lo = bisect_left(keys, prefix)
+            hi = bisect_left(keys, end, lo)
+            pending = self._pending[bisect_left(self._pending, prefix):bisect_left(self._pending, end)]
+            matches = keys[lo:hi] + pending
+            candidates = np.concatenate([weights[lo:hi], [self._weights[key] for key in pending]])
+            display, kinds = self._display, self._kind
+        if not matches:
+            return []
+
+        if len(candidates) > limit:
+            top = np.argpartition(-candidates, limit)[:limit]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-candidates[top], kind='stable')]
+
+        return [
+            {
+                'text': display.get(matches[i], matches[i]),
+                'kind': kinds.get(matches[i], 'term'),
+                'weight': float(candidates[i])
+            }
+            for i in top.tolist()
+        ]
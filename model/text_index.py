@@ -0,0 +1,328 @@
+import re
+import threading
+from array import array
+from typing import List, Dict, Iterable, Iterator, Tuple
+import numpy as np
+import pandas as pd
+from fuzzy import SymSpellIndex, max_distance_for
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Query fields backed by a column, and by entity labels
+FIELD_COLUMNS = {'author': 'author', 'subreddit': 'subreddit'}
+ENTITY_FIELDS = {'PERSON': 'player', 'ORG': 'team'}
+FIELDS = set(FIELD_COLUMNS) | set(ENTITY_FIELDS.values())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, split on anything that isn't a letter, digit or underscore."""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+def token_spans(text: str) -> Iterator[Tuple[str, int]]:
+    """(lowercased token, char offset in text) for each word of text."""
+    if not text:
+        return
+    for match in TOKEN_PATTERN.finditer(text):
+        yield match.group().lower(), match.start()
+
+def field_term(field: str, value: str) -> str:
+    """Index key of a field value, e.g. ('team', 'Man City') -> 'team:man city'."""
+    return f"{field}:{' '.join(tokenize(value))}"
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+def intersect(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Sorted unique values in both a and b.
+
+    The shorter list is binary-searched into the longer one, so a rare term
+    against a common one costs O(short * log long) instead of a merge.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return _EMPTY
+    idx = np.searchsorted(b, a)
+    found = idx < len(b)
+    found[found] = b[idx[found]] == a[found]
+    return a[found]
+
+def difference(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Sorted values of a that are not in b."""
+    if not len(a) or not len(b):
+        return a
+    idx = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[idx] != a]
+
+def union(postings: List[np.ndarray]) -> np.ndarray:
+    """Sorted unique values in any of postings, merged in one pass."""
+    postings = [p for p in postings if len(p)]
+    if not postings:
+        return _EMPTY
+    if len(postings) == 1:
+        return postings[0]
+    return np.unique(np.concatenate(postings))
+
+def _intersect(postings: List[np.ndarray]) -> np.ndarray:
+    """Row ids in every posting list, intersecting the shortest first."""
+    if not postings:
+        return _EMPTY
+    postings = sorted(postings, key=len)
+    rows = postings[0]
+    for other in postings[1:]:
+        if not len(rows):
+            break
+        rows = intersect(rows, other)
+    return rows
+
+class InvertedIndex:
+    """
+    Positional index over the corpus text.
+
+    Every occurrence of a term is kept as (row id, token position, char
+    offset) in three append-only uint32 arrays, ordered by row then position,
+    so a corpus batch only appends. Phrases and proximity are checked on
+    row << 32 | position keys with binary-search intersections.
+
+    Field values (team:, player:, author:, subreddit:) are indexed as row ids
+    only. The vocabulary is mirrored in a SymSpell index for typo-tolerant
+    lookups. It is a corpus listener (reset/add).
+
+    With vocabulary_only only the SymSpell dictionary is kept, for corpora
+    whose rows live in a search backend.
+    """
+
+    def __init__(self, corpus=None, max_distance: int = 2, vocabulary_only: bool = False):
+        """
+        Args:
+            corpus: OpinionCorpus whose EntityTable compact batches point into
+            max_distance: Largest edit distance for fuzzy term expansion
+            vocabulary_only: Keep only the fuzzy dictionary, no postings
+        """
+        self.corpus = corpus
+        self.max_distance = max_distance
+        self.vocabulary_only = vocabulary_only
+        self.positions: Dict[str, Tuple[array, array, array]] = {}
+        self.fields: Dict[str, array] = {}
+        self.fuzzy = SymSpellIndex(max_distance=max_distance)
+        self.n_rows = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def nbytes(self) -> int:
+        occurrences = sum(len(rows) for rows, _, _ in self.positions.values())
+        return 12 * occurrences + 4 * sum(len(rows) for rows in self.fields.values())
+
+    def reset(self):
+        with self._lock:
+            self.positions = {}
+            self.fields = {}
+            self.fuzzy = SymSpellIndex(max_distance=self.max_distance)
+            self.n_rows = 0
+
+    def clone(self, corpus) -> 'InvertedIndex':
+        return InvertedIndex(corpus, max_distance=self.max_distance, vocabulary_only=self.vocabulary_only)
+
+    def adopt(self, other: 'InvertedIndex'):
+        """Take over the postings of an index built off to the side."""
+        with self._lock:
+            self.positions, self.fields = other.positions, other.fields
+            self.fuzzy, self.n_rows = other.fuzzy, other.n_rows
+
+    def _field_terms(self, batch: pd.DataFrame, start_row: int) -> Dict[str, List[int]]:
+        """Field key -> ascending row ids for the batch's authors, subreddits, players and teams."""
+        terms: Dict[str, List[int]] = {}
+        keys: Dict[Tuple[str, str], str] = {}
+
+        def add(field, value, row_id):
+            key = keys.get((field, value))
+            if key is None:
+                key = keys[(field, value)] = field_term(field, value)
+            rows = terms.setdefault(key, [])
+            if not rows or rows[-1] != row_id:
+                rows.append(row_id)
+
+        for field, column in FIELD_COLUMNS.items():
+            if column in batch:
+                for row_id, value in enumerate(batch[column].tolist(), start=start_row):
+                    if isinstance(value, str) and value:
+                        add(field, value, row_id)
+
+        if 'entity_start' in batch and self.corpus is not None:
+            entities = self.corpus.entities
+            text_codes, label_codes = entities.text_codes, entities.label_codes
+            bounds = zip(batch['entity_start'].tolist(), batch['entity_end'].tolist())
+            for row_id, (start, end) in enumerate(bounds, start=start_row):
+                for text_code, label_code in zip(text_codes[start:end].tolist(),
+                                                 label_codes[start:end].tolist()):
+                    field = ENTITY_FIELDS.get(entities.labels[label_code])
+                    if field:
+                        add(field, entities.texts[text_code], row_id)
+        elif 'entities' in batch:
+            for row_id, row in enumerate(batch['entities'], start=start_row):
+                for entity in (row or {}).get('all_entities') or []:
+                    field = ENTITY_FIELDS.get(entity['label'])
+                    if field:
+                        add(field, entity['text'], row_id)
+
+        return {key: rows for key, rows in terms.items() if not key.endswith(':')}
+
+    def add(self, batch: pd.DataFrame, start_row: int):
+        """Index the batch's text and fields; start_row is the row id of its first row."""
+        if self.vocabulary_only:
+            self._add_vocabulary(batch, start_row)
+            return
+        occurrences: Dict[str, Tuple[List[int], List[int], List[int]]] = {}
+        if 'text' in batch:
+            for row_id, text in enumerate(batch['text'].tolist(), start=start_row):
+                for position, (term, offset) in enumerate(token_spans(text)):
+                    entry = occurrences.get(term)
+                    if entry is None:
+                        entry = occurrences[term] = ([], [], [])
+                    entry[0].append(row_id)
+                    entry[1].append(position)
+                    entry[2].append(offset)
+        field_terms = self._field_terms(batch, start_row)
+
+        with self._lock:
+            for term, (rows, positions, offsets) in occurrences.items():
+                stored = self.positions.get(term)
+                if stored is None:
+                    stored = self.positions[term] = (array('I'), array('I'), array('I'))
+                stored[0].extend(rows)
+                stored[1].extend(positions)
+                stored[2].extend(offsets)
+                self.fuzzy.add(term, len(set(rows)))
+            for key, rows in field_terms.items():
+                self.fields.setdefault(key, array('I')).extend(rows)
+            self.n_rows = max(self.n_rows, start_row + len(batch))
+
+    def _add_vocabulary(self, batch: pd.DataFrame, start_row: int):
+        documents: Dict[str, int] = {}
+        if 'text' in batch:
+            for text in batch['text'].tolist():
+                for term in set(tokenize(text)):
+                    documents[term] = documents.get(term, 0) + 1
+        with self._lock:
+            for term, count in documents.items():
+                self.fuzzy.add(term, count)
+            self.n_rows = max(self.n_rows, start_row + len(batch))
+
+    def all_rows(self) -> np.ndarray:
+        return np.arange(self.n_rows, dtype=np.int64)
+
+    def occurrences(self, term: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(row ids, token positions, char offsets) of every occurrence of term."""
+        with self._lock:
+            stored = self.positions.get(term)
+            if stored is None:
+                return _EMPTY, _EMPTY, _EMPTY
+            return tuple(np.frombuffer(a, dtype=np.uint32).astype(np.int64) for a in stored)
+
+    def offsets(self, term: str, row_ids: np.ndarray) -> List[np.ndarray]:
+        """Char offsets of term in each of row_ids (looked up, not re-tokenized)."""
+        with self._lock:
+            stored = self.positions.get(term)
+            if stored is None:
+                return [_EMPTY] * len(row_ids)
+            rows = np.frombuffer(stored[0], dtype=np.uint32)
+            offsets = np.frombuffer(stored[2], dtype=np.uint32)
+            lo = np.searchsorted(rows, row_ids, side='left')
+            hi = np.searchsorted(rows, row_ids, side='right')
+            result = [offsets[l:h].astype(np.int64) for l, h in zip(lo.tolist(), hi.tolist())]
+            del rows, offsets
+        return result
+
+    def _keys(self, term: str) -> np.ndarray:
+        """Ascending row << 32 | position keys of term's occurrences."""
+        with self._lock:
+            stored = self.positions.get(term)
+            if stored is None:
+                return _EMPTY
+            rows = np.frombuffer(stored[0], dtype=np.uint32).astype(np.int64)
+            positions = np.frombuffer(stored[1], dtype=np.uint32).astype(np.int64)
+        return (rows << 32) | positions
+
+    def rows(self, term: str) -> np.ndarray:
+        """Ascending row ids of the comments containing term (or a field key like 'team:arsenal')."""
+        with self._lock:
+            if term in self.fields:
+                return np.frombuffer(self.fields[term], dtype=np.uint32).astype(np.int64)
+            stored = self.positions.get(term)
+            if stored is None:
+                return _EMPTY
+            rows = np.frombuffer(stored[0], dtype=np.uint32).astype(np.int64)
+        if len(rows) < 2:
+            return rows
+        return rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+
+    def phrase_rows(self, words: List[str], slop: int = 0) -> np.ndarray:
+        """
+        Rows containing words as a phrase.
+
+        With slop > 0 the words may appear in any order, each within slop
+        positions of the first word.
+        """
+        if not words:
+            return _EMPTY
+        if len(words) == 1:
+            return self.rows(words[0])
+
+        anchors = self._keys(words[0])
+        for offset, word in enumerate(words[1:], start=1):
+            if not len(anchors):
+                break
+            keys = self._keys(word)
+            if not slop:
+                anchors = intersect(anchors, keys - offset)
+                continue
+            if not len(keys):
+                return _EMPTY
+            # Nearest occurrence on either side of each anchor
+            idx = np.searchsorted(keys, anchors)
+            after = keys[np.minimum(idx, len(keys) - 1)] - anchors
+            before = anchors - keys[np.maximum(idx - 1, 0)]
+            near = ((idx < len(keys)) & (after <= slop)) | ((idx > 0) & (before <= slop))
+            anchors = anchors[near]
+
+        rows = anchors >> 32
+        if len(rows) < 2:
+            return rows
+        return rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+
+    def rows_all(self, terms: Iterable[str]) -> np.ndarray:
+        """Ascending row ids of the comments containing every one of terms."""
+        return _intersect([self.rows(term) for term in dict.fromkeys(terms)])
+
+    def rows_any(self, terms: Iterable[str]) -> np.ndarray:
+        """
+        Ascending row ids of the comments containing any of terms.
+
+        A term with spaces (an expanded phrase such as "for real") matches as a
+        phrase. The postings are merged in one pass.
+        """
+        return union([self.phrase_rows(term.split()) if ' ' in term else self.rows(term)
+                      for term in dict.fromkeys(terms)])
+
+    def match(self, groups: List[List[str]]) -> np.ndarray:
+        """
+        Row ids matching every group, where a group matches any of its terms.
+
+        Groups are intersected smallest first.
+        """
+        return _intersect([self.rows_any(group) for group in groups])
+
+    def fuzzy_terms(self, term: str) -> List[str]:
+        """term and the indexed words within its edit distance budget, closest first."""
+        term = term.lower()
+        with self._lock:
+            matches = self.fuzzy.lookup(term, max_distance_for(term, self.max_distance))
+        return list(dict.fromkeys([term] + [word for word, _ in matches]))
+
+    def fuzzy_groups(self, query: str) -> List[List[str]]:
+        """One group of fuzzy alternatives per query term."""
+        return [self.fuzzy_terms(term) for term in tokenize(query)]
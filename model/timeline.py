@@ -0,0 +1,310 @@
+import threading
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from compact import SENTIMENTS, _grow
+from text_index import ENTITY_FIELDS, field_term
+from aggregates import day_number, SECONDS_PER_DAY
+
+# Bucket name -> width in seconds
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': SECONDS_PER_DAY}
+
+# Series a timeline can be keyed by (besides all comments)
+TIMELINE_FIELDS = ['team', 'player', 'subreddit']
+
+_CELL_COLUMNS = {
+    'comments': np.uint32, 'negative': np.uint32, 'neutral': np.uint32, 'positive': np.uint32,
+    'intensity_count': np.uint32, 'intensity_sum': np.float64,
+}
+_EMOTION_COLUMNS = {'comments': np.uint32}
+
+# Emotion cells are indexed by (key << 32 | bucket) << 8 | emotion code
+EMOTION_BITS = 8
+
+# Fewest pending cells worth a full merge into the sorted index
+MIN_PENDING_CELLS = 4096
+
+def _lookup(index: np.ndarray, order: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(found mask, cell ids of the found keys) of sorted keys in a sorted index."""
+    positions = np.searchsorted(index, keys)
+    found = positions < len(index)
+    found[found] = index[positions[found]] == keys[found]
+    return found, order[positions[found]]
+
+class _Cells:
+    """
+    Pre-aggregated counts, one cell per distinct index value (e.g. key << 32 | bucket).
+
+    Counts live in append-only narrow columns. `index` keeps the cells' index
+    values in ascending order and `order` their cell ids, so a key's cells
+    over a time range are a single searchsorted slice, already in time order.
+    New cells first go to a small sorted pending run that is merged into
+    `index` in bulk once it outgrows about 64 * sqrt(cells), so a batch
+    doesn't rewrite the whole index.
+    """
+
+    def __init__(self, columns: Dict[str, type]):
+        self.columns = {name: np.zeros(0, dtype=dtype) for name, dtype in columns.items()}
+        self.index = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int32)
+        self._pending_index = np.zeros(0, dtype=np.int64)
+        self._pending_order = np.zeros(0, dtype=np.int32)
+        self.size = 0
+
+    @property
+    def nbytes(self) -> int:
+        return (sum(column.dtype.itemsize for column in self.columns.values()) + 12) * self.size
+
+    def add(self, index: np.ndarray, values: Dict[str, np.ndarray]):
+        """Add counts to the cells at index (ascending, unique), creating missing cells."""
+        if not len(index):
+            return
+        ids = np.full(len(index), -1, dtype=np.int64)
+        found, found_ids = _lookup(self.index, self.order, index)
+        ids[found] = found_ids
+        missing = np.flatnonzero(~found)
+        if len(missing) and len(self._pending_index):
+            found, found_ids = _lookup(self._pending_index, self._pending_order, index[missing])
+            ids[missing[found]] = found_ids
+        new = ids < 0
+        added = int(new.sum())
+        ids[new] = np.arange(self.size, self.size + added)
+        found = ~new
+
+        for name, column in self.columns.items():
+            column = self.columns[name] = _grow(column, self.size + added)
+            column[ids[found]] += values[name][found].astype(column.dtype)
+            column[self.size:self.size + added] = values[name][new]
+
+        if added:
+            self.size += added
+            positions = np.searchsorted(self._pending_index, index[new])
+            self._pending_index = np.insert(self._pending_index, positions, index[new])
+            self._pending_order = np.insert(self._pending_order, positions, ids[new])
+            if len(self._pending_index) > max(MIN_PENDING_CELLS, 64 * int(np.sqrt(len(self.index)))):
+                self._merge()
+
+    def _merge(self):
+        positions = np.searchsorted(self.index, self._pending_index)
+        self.index = np.insert(self.index, positions, self._pending_index)
+        self.order = np.insert(self.order, positions, self._pending_order)
+        self._pending_index = np.zeros(0, dtype=np.int64)
+        self._pending_order = np.zeros(0, dtype=np.int32)
+
+    def select(self, lo: int, hi: int) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """(index values, columns) of the cells with lo <= index <= hi, ascending."""
+        start = np.searchsorted(self.index, lo, side='left')
+        end = np.searchsorted(self.index, hi, side='right')
+        index, ids = self.index[start:end], self.order[start:end]
+        start = np.searchsorted(self._pending_index, lo, side='left')
+        end = np.searchsorted(self._pending_index, hi, side='right')
+        if end > start:
+            index = np.concatenate([index, self._pending_index[start:end]])
+            ids = np.concatenate([ids, self._pending_order[start:end]])
+            order = np.argsort(index, kind='stable')
+            index, ids = index[order], ids[order]
+        return index, {name: column[ids] for name, column in self.columns.items()}
+
+class SentimentTimeline:
+    """
+    Sentiment, emotion and intensity counts per time bucket, kept up to date on ingest.
+
+    Each batch is rolled up into minute, hour and day cells for all comments
+    and for every subreddit, team and player it mentions, merged into one
+    cell per (key, bucket) that has comments (see _Cells). Emotions are kept
+    sparsely, one cell per (key, bucket, emotion) that occurs. It is a corpus
+    listener (reset/add).
+    """
+
+    def __init__(self, corpus=None):
+        """
+        Args:
+            corpus: OpinionCorpus whose EntityTable compact batches point into
+        """
+        self.corpus = corpus
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(cells.nbytes + emotions.nbytes for cells, emotions in self.tables.values())
+
+    def reset(self):
+        with self._lock:
+            self.keys: Dict[str, int] = {'': 0}
+            self.emotions: List[str] = []
+            self._emotion_codes: Dict[str, int] = {}
+            self.tables = {resolution: (_Cells(_CELL_COLUMNS), _Cells(_EMOTION_COLUMNS))
+                           for resolution in RESOLUTIONS}
+
+    def clone(self, corpus) -> 'SentimentTimeline':
+        return SentimentTimeline(corpus)
+
+    def adopt(self, other: 'SentimentTimeline'):
+        """Take over the rollups built off to the side."""
+        with self._lock:
+            self.keys, self.tables = other.keys, other.tables
+            self.emotions, self._emotion_codes = other.emotions, other._emotion_codes
+
+    def _key(self, field: str, value: str) -> int:
+        name = field_term(field, value)
+        code = self.keys.get(name)
+        if code is None:
+            code = self.keys[name] = len(self.keys)
+        return code
+
+    def _entries(self, batch: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """(batch position, key id) of every series each row counts towards."""
+        per_row: List[set] = [{0} for _ in range(len(batch))]
+
+        if 'subreddit' in batch:
+            for keys, value in zip(per_row, batch['subreddit'].tolist()):
+                if isinstance(value, str) and value:
+                    keys.add(self._key('subreddit', value))
+
+        if 'entity_start' in batch and self.corpus is not None:
+            entities = self.corpus.entities
+            text_codes, label_codes = entities.text_codes, entities.label_codes
+            codes: Dict[Tuple[int, int], Optional[int]] = {}
+            bounds = zip(batch['entity_start'].tolist(), batch['entity_end'].tolist())
+            for keys, (start, end) in zip(per_row, bounds):
+                for pair in zip(text_codes[start:end].tolist(), label_codes[start:end].tolist()):
+                    if pair not in codes:
+                        field = ENTITY_FIELDS.get(entities.labels[pair[1]])
+                        codes[pair] = self._key(field, entities.texts[pair[0]]) if field else None
+                    if codes[pair] is not None:
+                        keys.add(codes[pair])
+        elif 'entities' in batch:
+            for keys, row in zip(per_row, batch['entities']):
+                for entity in (row or {}).get('all_entities') or []:
+                    field = ENTITY_FIELDS.get(entity['label'])
+                    if field:
+                        keys.add(self._key(field, entity['text']))
+
+        lengths = np.fromiter(map(len, per_row), dtype=np.int64, count=len(per_row))
+        rows = np.repeat(np.arange(len(batch)), lengths)
+        keys = np.fromiter((key for keys in per_row for key in keys), dtype=np.int64, count=len(rows))
+        return rows, keys
+
+    def _emotion_column(self, batch: pd.DataFrame) -> np.ndarray:
+        """primary_emotion codes, -1 where missing."""
+        if 'primary_emotion' not in batch:
+            return np.full(len(batch), -1, dtype=np.int64)
+        values = batch['primary_emotion'].astype(object)
+        codes = self._emotion_codes
+        for value in pd.unique(values.dropna()):
+            if value not in codes:
+                codes[value] = len(self.emotions)
+                self.emotions.append(value)
+        return values.map(codes).fillna(-1).to_numpy(dtype=np.int64)
+
+    def add(self, batch: pd.DataFrame, start_row: int):
+        """Roll the batch up into the minute, hour and day cells of its series."""
+        if batch.empty or 'timestamp' not in batch:
+            return
+        times = batch['timestamp'].to_numpy(dtype=np.int64)
+        if 'bert_sentiment' in batch:
+            sentiment = pd.Categorical(batch['bert_sentiment'], categories=SENTIMENTS).codes.astype(np.int64)
+        else:
+            sentiment = np.full(len(batch), -1, dtype=np.int64)
+        if 'opinion_intensity' in batch:
+            intensity = batch['opinion_intensity'].to_numpy(dtype=np.float64)
+        else:
+            intensity = np.full(len(batch), np.nan)
+
+        with self._lock:
+            rows, keys = self._entries(batch)
+            emotion = self._emotion_column(batch)[rows]
+            sentiment, intensity = sentiment[rows], intensity[rows]
+            has_intensity = ~np.isnan(intensity)
+
+            for resolution, width in RESOLUTIONS.items():
+                cells, emotion_cells = self.tables[resolution]
+                index, inverse = np.unique((keys << 32) | (times[rows] // width), return_inverse=True)
+                n = len(index)
+
+                labelled = sentiment >= 0
+                by_sentiment = np.bincount(inverse[labelled] * 3 + sentiment[labelled],
+                                           minlength=3 * n).reshape(n, 3)
+                cells.add(index, {
+                    'comments': np.bincount(inverse, minlength=n),
+                    'negative': by_sentiment[:, 0],
+                    'neutral': by_sentiment[:, 1],
+                    'positive': by_sentiment[:, 2],
+                    'intensity_count': np.bincount(inverse[has_intensity], minlength=n),
+                    'intensity_sum': np.bincount(inverse[has_intensity], weights=intensity[has_intensity],
+                                                 minlength=n),
+                })
+
+                labelled = emotion >= 0
+                emotion_index, counts = np.unique((index[inverse[labelled]] << EMOTION_BITS) | emotion[labelled],
+                                                  return_counts=True)
+                emotion_cells.add(emotion_index, {'comments': counts})
+
+    def timeline(self, resolution: str = 'hour', field: Optional[str] = None, value: Optional[str] = None,
+                 start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
+        """
+        Per-bucket counts of one series, oldest first.
+
+        Args:
+            resolution: 'minute', 'hour' or 'day'
+            field, value: Series key, e.g. ('team', 'Arsenal'); all comments when omitted
+            start_date, end_date: Inclusive YYYY-MM-DD range (UTC)
+
+        Returns:
+            [{time, comments, positive, negative, neutral, average_intensity, emotions}]
+
+        Raises:
+            ValueError: For unknown resolutions or fields, and malformed dates
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}'. Available: {', '.join(RESOLUTIONS)}")
+        if field is not None and field not in TIMELINE_FIELDS:
+            raise ValueError(f"Unknown field '{field}'. Available: {', '.join(TIMELINE_FIELDS)}")
+        width = RESOLUTIONS[resolution]
+        lo = day_number(start_date) * SECONDS_PER_DAY // width if start_date else 0
+        hi = ((day_number(end_date) + 1) * SECONDS_PER_DAY // width - 1) if end_date else 2**31 - 1
+
+        with self._lock:
+            key = self.keys.get(field_term(field, value) if field else '')
+            if key is None:
+                return []
+            cells_table, emotions_table = self.tables[resolution]
+            index, cells = cells_table.select(key << 32 | lo, key << 32 | hi)
+            emotion_index, emotion_cells = emotions_table.select((key << 32 | lo) << EMOTION_BITS,
+                                                                 (key << 32 | hi) << EMOTION_BITS | 0xFF)
+            emotions = list(self.emotions)
+
+        # Emotion cells only exist for buckets that have comment cells
+        slot = np.searchsorted(index, emotion_index >> EMOTION_BITS)
+        by_emotion = np.zeros((len(index), len(emotions)), dtype=np.int64)
+        by_emotion[slot, emotion_index & 0xFF] = emotion_cells['comments']
+
+        buckets = index & 0xFFFFFFFF
+        unit = 'D' if resolution == 'day' else 'm'
+        times = np.datetime_as_string((buckets * width).astype('datetime64[s]'), unit=unit)
+
+        # Emotions per bucket, most frequent first
+        order = np.argsort(-by_emotion, axis=1, kind='stable')
+        emotion_counts = np.take_along_axis(by_emotion, order, axis=1)
+        nonzero = (emotion_counts > 0).sum(axis=1)
+
+        intensity_count = cells['intensity_count']
+        average_intensity = np.where(intensity_count > 0,
+                                     cells['intensity_sum'] / np.maximum(intensity_count, 1), np.nan)
+
+        points = []
+        for time, comments, positive, negative, neutral, intensity, labels, counts, k in zip(
+                times.tolist(), cells['comments'].tolist(), cells['positive'].tolist(),
+                cells['negative'].tolist(), cells['neutral'].tolist(), average_intensity.tolist(),
+                order.tolist(), emotion_counts.tolist(), nonzero.tolist()):
+            points.append({
+                "time": time,
+                "comments": comments,
+                "positive": positive,
+                "negative": negative,
+                "neutral": neutral,
+                "average_intensity": None if intensity != intensity else intensity,
+                "emotions": {emotions[e]: count for e, count in zip(labels[:k], counts[:k])}
+            })
+        return points
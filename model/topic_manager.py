@@ -0,0 +1,365 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from bertopic import BERTopic
+
+# Stable topic ids and centroids, saved next to the model
+TOPIC_IDS_FILE = "topic_ids.npz"
+# Names the version directory in model_dir holding the current save
+CURRENT_FILE = "CURRENT"
+
+def topic_centroids(topics, embeddings: np.ndarray) -> Dict[int, np.ndarray]:
+    """Mean embedding of each topic's documents; outliers (-1) are left out."""
+    topics = np.asarray(topics)
+    return {int(topic): embeddings[topics == topic].mean(axis=0)
+            for topic in np.unique(topics) if topic != -1}
+
+def match_topics(old: Dict[int, np.ndarray], new: Dict[int, np.ndarray],
+                 min_similarity: float = 0.5) -> Dict[int, int]:
+    """
+    Map new topics onto old topic ids by centroid cosine similarity.
+
+    Pairs are taken most similar first, each old id at most once. New topics
+    without an old topic at least min_similarity away get fresh ids.
+    """
+    mapping = {}
+    if old and new:
+        old_ids, new_ids = list(old), list(new)
+        a = np.vstack([old[t] for t in old_ids])
+        b = np.vstack([new[t] for t in new_ids])
+        a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+        b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+        similarity = b @ a.T
+        taken = set()
+        for flat in np.argsort(-similarity, axis=None):
+            i, j = divmod(int(flat), len(old_ids))
+            if similarity[i, j] < min_similarity:
+                break
+            if new_ids[i] in mapping or old_ids[j] in taken:
+                continue
+            mapping[new_ids[i]] = old_ids[j]
+            taken.add(old_ids[j])
+
+    next_id = max(list(old) + [-1]) + 1
+    for topic in sorted(new):
+        if topic not in mapping:
+            mapping[topic] = next_id
+            next_id += 1
+    return mapping
+
+class TopicModelManager:
+    """
+    Persisted BERTopic model with incremental assignment and background refits.
+
+    A full refit numbers its topics from scratch, so its topics are matched
+    to the previous ones by centroid similarity and reported under the old
+    ids (see match_topics); the mapping is saved with the model.
+    """
+
+    def __init__(self, sentence_model, model_dir: str = "topic_model",
+                 n_topics: int = 10, min_topic_size: int = 5,
+                 refit_threshold: int = 1000, refit_interval: Optional[float] = None,
+                 max_history: int = 50000, online: bool = False, embedding_store=None):
+        """
+        Initialize topic model manager.
+
+        Args:
+            sentence_model: SentenceTransformer used by BERTopic for representations
+            model_dir: Directory the fitted model is saved to and loaded from
+            n_topics: Number of topics to reduce to on a full fit
+            min_topic_size: Minimum cluster size on a full fit
+            refit_threshold: Number of new documents that triggers a background refit
+            refit_interval: Seconds after which a refit is scheduled (None to disable)
+            max_history: Maximum number of recent documents kept for refits
+            online: Use partial_fit with incremental clustering instead of full refits
+            embedding_store: Optional EmbeddingStore that refits read vectors from
+        """
+        self.sentence_model = sentence_model
+        self.model_dir = model_dir
+        self.n_topics = n_topics
+        self.min_topic_size = min_topic_size
+        self.refit_threshold = refit_threshold
+        self.refit_interval = refit_interval
+        self.max_history = max_history
+        self.online = online
+        self.embedding_store = embedding_store
+
+        self.model = None
+        self.topic_info = pd.DataFrame()
+        # Model topic -> reported topic id, and centroids under the reported ids
+        self._topic_ids: Dict[int, int] = {}
+        self._centroids: Dict[int, np.ndarray] = {}
+
+        self._lock = threading.Lock()
+        # Serializes the first fit or load, so concurrent jobs fit only once
+        self._fit_lock = threading.Lock()
+        self._refit_thread = None
+        self._history_texts = []
+        self._history_embeddings = []
+        self._history_ids = []
+        self._pending = 0
+        self._last_fit = time.time()
+
+    def _new_model(self) -> BERTopic:
+        """Create an unfitted BERTopic with batch or online sub-models."""
+        if not self.online:
+            return BERTopic(
+                embedding_model=self.sentence_model,
+                min_topic_size=self.min_topic_size,
+                nr_topics=self.n_topics
+            )
+
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.decomposition import IncrementalPCA
+        from bertopic.vectorizers import OnlineCountVectorizer
+
+        return BERTopic(
+            embedding_model=self.sentence_model,
+            umap_model=IncrementalPCA(n_components=5),
+            hdbscan_model=MiniBatchKMeans(n_clusters=self.n_topics, random_state=0),
+            vectorizer_model=OnlineCountVectorizer(stop_words="english", decay=.01)
+        )
+
+    def _topic_info(self, model: BERTopic, topic_ids: Dict[int, int]) -> pd.DataFrame:
+        info = model.get_topic_info().copy()
+        info['Topic'] = [topic_ids.get(t, t) for t in info['Topic'].tolist()]
+        return info
+
+    def _publish(self, model: BERTopic, topic_ids: Dict[int, int], centroids: Dict[int, np.ndarray]):
+        with self._lock:
+            self.model = model
+            self._topic_ids, self._centroids = topic_ids, centroids
+            self.topic_info = self._topic_info(model, topic_ids)
+            self._last_fit = time.time()
+
+    def _current_dir(self) -> str:
+        """Directory of the current save; older saves are model_dir itself."""
+        pointer = os.path.join(self.model_dir, CURRENT_FILE)
+        if os.path.exists(pointer):
+            with open(pointer, encoding="utf-8") as f:
+                return os.path.join(self.model_dir, f.read().strip())
+        return self.model_dir
+
+    def _load_model(self, version_dir: Optional[str] = None) -> BERTopic:
+        # Saves keep the model under model/; older saves are the directory itself
+        version_dir = version_dir or self._current_dir()
+        path = os.path.join(version_dir, 'model')
+        return BERTopic.load(path if os.path.exists(path) else version_dir,
+                             embedding_model=self.sentence_model)
+
+    def load(self) -> bool:
+        """Load a previously saved model from model_dir. Returns True if one was found."""
+        with self._fit_lock:
+            if not os.path.isdir(self.model_dir):
+                return False
+
+            version_dir = self._current_dir()
+            model = self._load_model(version_dir)
+            topic_ids, centroids = {}, {}
+            ids_path = os.path.join(version_dir, TOPIC_IDS_FILE)
+            if os.path.exists(ids_path):
+                with np.load(ids_path) as saved:
+                    topic_ids = dict(zip(saved['topics'].tolist(), saved['ids'].tolist()))
+                    centroids = dict(zip(saved['centroid_ids'].tolist(), saved['centroids']))
+
+            with self._lock:
+                self.model = model
+                self._topic_ids, self._centroids = topic_ids, centroids
+                self.topic_info = self._topic_info(model, topic_ids)
+                self._last_fit = os.path.getmtime(version_dir)
+
+        print(f"✓ Loaded topic model from {self.model_dir}")
+        return True
+
+    def save(self, model: BERTopic, topic_ids: Optional[Dict[int, int]] = None,
+             centroids: Optional[Dict[int, np.ndarray]] = None):
+        """
+        Save model to model_dir atomically.
+
+        Each save is written to its own directory inside model_dir, then the
+        CURRENT file naming it is swapped in with os.replace, so a reader or a
+        crash never sees a half-written model.
+        """
+        topic_ids, centroids = topic_ids or {}, centroids or {}
+        os.makedirs(self.model_dir, exist_ok=True)
+        version_dir = tempfile.mkdtemp(prefix="version-", dir=self.model_dir)
+
+        # Online sub-models are needed for further partial_fit calls, so pickle them;
+        # otherwise safetensors keeps only topic embeddings and c-TF-IDF, and transform
+        # assigns topics by cosine similarity against the topic embeddings
+        model_path = os.path.join(version_dir, 'model')
+        if self.online:
+            model.save(model_path, serialization="pickle")
+        else:
+            model.save(model_path, serialization="safetensors", save_ctfidf=True)
+        dim = len(next(iter(centroids.values()))) if centroids else 0
+        np.savez(
+            os.path.join(version_dir, TOPIC_IDS_FILE),
+            topics=np.array(list(topic_ids), dtype=np.int64),
+            ids=np.array(list(topic_ids.values()), dtype=np.int64),
+            centroid_ids=np.array(list(centroids), dtype=np.int64),
+            centroids=np.vstack(list(centroids.values())) if centroids else np.zeros((0, dim), dtype=np.float32)
+        )
+
+        pointer = os.path.join(self.model_dir, CURRENT_FILE)
+        with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+            f.write(os.path.basename(version_dir))
+        os.replace(f"{pointer}.tmp", pointer)
+
+        # Earlier versions, and the files of a save from before versioning
+        for entry in os.scandir(self.model_dir):
+            if entry.name in (CURRENT_FILE, os.path.basename(version_dir)):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+            except OSError:
+                # Still open in a reader (Windows); removed by a later save
+                pass
+
+    def assign(self, texts: List[str], embeddings: np.ndarray,
+               comment_ids: Optional[List[str]] = None) -> Dict:
+        """
+        Assign topics to new documents.
+
+        Fits and saves a model on first use, otherwise uses transform on the
+        given embeddings and schedules a background refit when due. With an
+        embedding store and comment_ids, only the ids are kept for refits.
+
+        Returns:
+            Dict with topics, probabilities and topic_info
+        """
+        with self._lock:
+            model, topic_ids = self.model, self._topic_ids
+
+        fitted = False
+        if model is None:
+            with self._fit_lock:
+                # Another job may have fitted or loaded it while we waited
+                with self._lock:
+                    model, topic_ids = self.model, self._topic_ids
+                if model is None:
+                    fitted = True
+                    model = self._new_model()
+                    if self.online:
+                        model.partial_fit(texts, embeddings)
+                        topics, probs = model.topics_, None
+                        centroids = {}
+                    else:
+                        topics, probs = model.fit_transform(texts, embeddings)
+                        centroids = topic_centroids(topics, np.asarray(embeddings))
+                    self.save(model, topic_ids, centroids)
+                    self._publish(model, topic_ids, centroids)
+        if not fitted:
+            topics, probs = model.transform(texts, embeddings)
+
+        # Documents the model was just fitted on don't count towards a refit
+        self._remember(texts, embeddings, comment_ids, pending=not fitted)
+        self.maybe_refit()
+
+        return {
+            'topics': [topic_ids.get(t, t) for t in np.asarray(topics).tolist()],
+            'probabilities': probs,
+            'topic_info': self.get_topic_info()
+        }
+
+    def _remember(self, texts: List[str], embeddings: np.ndarray,
+                  comment_ids: Optional[List[str]] = None, pending: bool = True):
+        """Keep recent documents for the next refit."""
+        use_store = self.embedding_store is not None and comment_ids is not None
+        with self._lock:
+            if use_store != bool(self._history_ids) and self._history_texts:
+                # Switching between id and array history, start over
+                self._history_texts, self._history_embeddings, self._history_ids = [], [], []
+
+            self._history_texts.extend(texts)
+            if use_store:
+                self._history_ids.extend(comment_ids)
+            else:
+                self._history_embeddings.append(np.asarray(embeddings))
+            if pending:
+                self._pending += len(texts)
+
+            overflow = len(self._history_texts) - self.max_history
+            if overflow > 0:
+                self._history_texts = self._history_texts[overflow:]
+                if use_store:
+                    self._history_ids = self._history_ids[overflow:]
+                else:
+                    stacked = np.vstack(self._history_embeddings)[overflow:]
+                    self._history_embeddings = [stacked]
+
+    def _history_matrix(self, start: int = 0) -> np.ndarray:
+        """Embeddings of the remembered documents from position start on."""
+        if self._history_ids:
+            return np.asarray(self.embedding_store.get(self._history_ids[start:]), dtype=np.float32)
+        return np.vstack(self._history_embeddings)[start:]
+
+    def refit_due(self) -> bool:
+        """Check whether the threshold or schedule calls for a refit."""
+        if self._pending == 0:
+            return False
+        if self._pending >= self.refit_threshold:
+            return True
+        return bool(self.refit_interval) and time.time() - self._last_fit >= self.refit_interval
+
+    def is_refitting(self) -> bool:
+        return self._refit_thread is not None and self._refit_thread.is_alive()
+
+    def maybe_refit(self) -> bool:
+        """Start a background refit if one is due and none is running."""
+        with self._lock:
+            if self.is_refitting() or not self.refit_due():
+                return False
+
+            # partial_fit only needs the documents the model hasn't seen yet
+            start = max(len(self._history_texts) - self._pending, 0) if self.online else 0
+            texts = self._history_texts[start:]
+            embeddings = self._history_matrix(start)
+            self._pending = 0
+
+            self._refit_thread = threading.Thread(
+                target=self._refit, args=(texts, embeddings), daemon=True
+            )
+            self._refit_thread.start()
+        return True
+
+    def _refit(self, texts: List[str], embeddings: np.ndarray):
+        """Fit a replacement model and swap it in. The current model keeps serving meanwhile."""
+        try:
+            if self.online:
+                # partial_fit mutates the model, so train a copy of the served one
+                with self._lock:
+                    model, topic_ids, centroids = self.model, self._topic_ids, self._centroids
+                if model is not None:
+                    model = self._load_model()
+                else:
+                    model = self._new_model()
+                # Incremental clusters keep their ids; texts are only the new documents
+                model.partial_fit(texts, embeddings)
+            else:
+                model = self._new_model()
+                model.fit(texts, embeddings)
+                with self._lock:
+                    previous = self._centroids
+                fitted = topic_centroids(model.topics_, embeddings)
+                topic_ids = match_topics(previous, fitted)
+                centroids = {topic_ids[t]: centroid for t, centroid in fitted.items()}
+
+            self.save(model, topic_ids, centroids)
+            self._publish(model, topic_ids, centroids)
+            print(f"✓ Refitted topic model on {len(texts)} documents")
+        except Exception as e:
+            print(f"✗ Topic model refit failed: {e}")
+
+    def get_topic_info(self) -> pd.DataFrame:
+        """Topic summary of the currently served model."""
+        with self._lock:
+            return self.topic_info